@@ -6,12 +6,17 @@ from docx import Document  # For handling Word documents
 import subprocess
 import qrcode
 import base64
-from firebase_config import db
+import time
+from firebase_config import FIREBASE_BACKEND, firebase_metrics
+from database_utils import add_job, repo
 
 # Flask application setup
 app = Flask(__name__)
 socketio = SocketIO(app)
 
+# PRINTECH_FIREBASE=fake runs the kiosk on the in-memory fake_rtdb instead of the live database
+app.config['FIREBASE_BACKEND'] = FIREBASE_BACKEND
+
 # Allowed file extensions
 ALLOWED_EXTENSIONS = {'doc', 'docx', 'pdf'}
 
@@ -61,18 +66,18 @@ def upload_file():
             return "Error processing the file.", 500
 
         try:
-            # Insert file info into Firebase with status 'pending'
-            ref = db.reference('print_jobs')
+            # Insert file info into the job store with status 'pending'
             with open(file_path, 'rb') as f:
                 file_data = base64.b64encode(f.read()).decode('utf-8')
-            new_job = ref.push({
+            job_data = {
                 'document_name': filename,
                 'document_size': file_size,
                 'file_data': file_data,
                 'status': 'pending',
-                'total_pages': total_pages
-            })
-            job_id = new_job.key
+                'total_pages': total_pages,
+                'created_at': time.time()
+            }
+            job_id = add_job(job_data)
 
             # Notify the kiosk in real-time about the status
             socketio.emit('file_uploaded', {
@@ -92,6 +97,13 @@ def upload_file():
 
     return "Invalid file type. Please upload a .doc, .docx, or .pdf file."
 
+@app.route('/metrics')
+def metrics():
+    # Firebase call metrics in Prometheus text format, for scrapers on the kiosk itself
+    if firebase_metrics is None or request.remote_addr not in ('127.0.0.1', '::1'):
+        return 'Not Found', 404
+    return firebase_metrics.render_metrics(), 200, {'Content-Type': 'text/plain; version=0.0.4'}
+
 @app.route('/generate_wifi_qr')
 def generate_wifi_qr():
     ssid = "YourSSID"
@@ -118,11 +130,10 @@ def update_status(data):
     status = data['status']
 
     # Find the job by document_name and update status
-    jobs_ref = db.reference('print_jobs')
-    jobs = jobs_ref.order_by_child('document_name').equal_to(document_name).get()
+    jobs = repo.find_jobs_by_document(document_name)
     if jobs:
         for job_id, job in jobs.items():
-            jobs_ref.child(job_id).update({'status': status})
+            repo.update_job(job_id, {'status': status})
             socketio.emit('status_update', {'document_name': document_name, 'status': status})
             break
 
@@ -1,8 +1,13 @@
-from firebase_config import db
+import firebase_config  # initializes Firebase and puts the admin app's modules on sys.path
+from repository import get_repository
+
+# The kiosk reads and writes through the same storage repository as the admin app
+# (PRINTECH_STORAGE: firebase, or sqlite for a kiosk running entirely on local disk)
+repo = get_repository()
 
 def update_job_status(job_id, status, details=None):
     """
-    Updates the status of a job in Firebase.
+    Updates the status of a job's print details.
     Args:
         job_id (int or str): The ID of the job to update.
         status (str): The new status for the job.
@@ -11,12 +16,22 @@ def update_job_status(job_id, status, details=None):
         bool: True if the update was successful, False otherwise.
     """
     try:
-        job_ref = db.reference(f'print_job_details/{job_id}')
         update_data = {'status': status}
         if details:
             update_data['details'] = str(details)
-        job_ref.update(update_data)
+        repo.update_job_details(job_id, update_data)
         return True
     except Exception as err:
-        print(f"Error updating job status in Firebase: {err}")
+        print(f"Error updating job status: {err}")
         return False
+
+
+def add_job(job):
+    """
+    Stores a new kiosk upload (with its day partition and counters on Firebase).
+    Args:
+        job (dict): The job; 'created_at' is epoch seconds.
+    Returns:
+        str: The new job id.
+    """
+    return repo.add_job(job)
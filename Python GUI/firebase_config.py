@@ -1,6 +1,7 @@
 import firebase_admin
 from firebase_admin import credentials, db
 import os
+import sys
 
 # Path to the service account key JSON file
 SERVICE_ACCOUNT_KEY = {
@@ -19,9 +20,45 @@ SERVICE_ACCOUNT_KEY = {
 
 DATABASE_URL = "https://printech-bd2ca-default-rtdb.asia-southeast1.firebasedatabase.app/"
 
+# The admin app's modules (instrumentation, repository, fake database) live at the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 'live' (the database above) or 'fake' (in-process, for running the kiosk offline; see fake_rtdb.py)
+FIREBASE_BACKEND = os.environ.get('PRINTECH_FIREBASE', 'live')
+
+if FIREBASE_BACKEND == 'fake':
+    import fake_rtdb
+    db = fake_rtdb.FakeDatabase(
+        latency=float(os.environ.get('PRINTECH_FAKE_DB_LATENCY', 0)),
+        jitter=float(os.environ.get('PRINTECH_FAKE_DB_JITTER', 0))
+    )
+    if os.environ.get('PRINTECH_FAKE_DB_SEED'):
+        db.load_file(os.environ['PRINTECH_FAKE_DB_SEED'])
 # Initialize Firebase app if not already initialized
-if not firebase_admin._apps:
+elif not firebase_admin._apps:
     cred = credentials.Certificate(SERVICE_ACCOUNT_KEY)
     firebase_admin.initialize_app(cred, {
         'databaseURL': DATABASE_URL
-    }) 
\ No newline at end of file
+    }) 
+
+# Size the connection pool, renew the token ahead of expiry and open the first connection in
+# the background (firebase_session.py, shared with the admin app; skipped without it)
+if FIREBASE_BACKEND != 'fake':
+    try:
+        import firebase_session
+        token_refresher = firebase_session.start(db, warm=True)
+    except ImportError:
+        token_refresher = None
+
+# Record every Firebase call (count, latency, bytes) with the instrumentation shared with
+# the admin app; without it the plain database object is used
+# (PRINTECH_QUERY_GUARD=1 also logs queries database.rules.json does not index)
+try:
+    import firebase_metrics
+    import index_rules
+    query_guard = os.environ.get('PRINTECH_QUERY_GUARD', '1' if FIREBASE_BACKEND == 'fake' else '0') == '1'
+    db = firebase_metrics.instrument(
+        db, default_route='kiosk', query_check=index_rules.check_query if query_guard else None
+    )
+except ImportError:
+    firebase_metrics = None
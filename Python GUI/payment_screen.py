@@ -7,7 +7,7 @@ import sys
 from PIL import Image, ImageTk
 from tkinter import messagebox  # Import messagebox for alert popups
 from tkinter import Button
-from firebase_config import db
+from database_utils import repo
 
 # Conditional import for RPi.GPIO - only on Raspberry Pi
 try:
@@ -104,8 +104,7 @@ def parse_pages_to_print(pages_to_print):
 def update_job_status(job_id, status):
     """Update the job status in Firebase."""
     try:
-        job_ref = db.reference(f'print_job_details/{job_id}')
-        job_ref.update({'status': status, 'updated_at': time.time()})
+        repo.update_job_details(job_id, {'status': status, 'updated_at': time.time()})
         print(f"[DEBUG] Job ID {job_id} marked as '{status}' in Firebase.")
     except Exception as e:
         print(f"[ERROR] Firebase error while updating job status: {e}")
@@ -134,31 +133,19 @@ def convert_docx_to_pdf(docx_file_path):
 def update_printer_status(pages_printed, job_id):
     """Insert a new row in the printer_status node to track paper usage."""
     try:
-        printer_status_ref = db.reference('printer_status')
-        all_status = printer_status_ref.order_by_key().limit_to_last(1).get()
-        latest = None
-        if isinstance(all_status, dict):
-            latest = list(all_status.values())[-1]
-        elif isinstance(all_status, list):
-            latest = all_status[-1]
-        if latest and 'remaining_paper' in latest:
-            remaining_paper = latest['remaining_paper']
-            print(f"[DEBUG] Latest Remaining Paper: {remaining_paper}")
-            if remaining_paper < pages_printed:
-                print("[ERROR] Not enough paper. Please reload.")
-                update_job_status(job_id, "failed")
-                return False
-            new_remaining_paper = remaining_paper - pages_printed
-            # Insert a new record instead of updating
-            printer_status_ref.push(str({
-                'remaining_paper': new_remaining_paper,
-                'updated_at': time.time()
-            }))
-            print(f"[DEBUG] Inserted new printer status entry with Remaining Paper: {new_remaining_paper}")
-            return True
-        else:
+        # Decremented atomically: a cached read written back could undo an admin refill
+        paper = repo.use_paper(pages_printed, time.time())
+        if paper is None:
             print("[ERROR] No entries found in printer_status node.")
             return False
+        remaining_paper, new_remaining_paper = paper
+        print(f"[DEBUG] Latest Remaining Paper: {remaining_paper}")
+        if new_remaining_paper is None:
+            print("[ERROR] Not enough paper. Please reload.")
+            update_job_status(job_id, "failed")
+            return False
+        print(f"[DEBUG] Inserted new printer status entry with Remaining Paper: {new_remaining_paper}")
+        return True
     except Exception as e:
         print(f"[ERROR] Firebase error while updating printer status: {e}")
         return False
@@ -169,8 +156,7 @@ def print_file(job_id):
     """Fetch file data, verify, and send it to the printer."""
     try:
         # Fetch job details
-        job_ref = db.reference(f'print_jobs/{job_id}')
-        job_data = job_ref.get()
+        job_data = repo.get_job(job_id)
         if job_data and isinstance(job_data, dict):
             document_name = job_data.get('document_name')
             file_data = job_data.get('file_data')
@@ -322,8 +308,7 @@ def show_payment_screen(total_price, job_id, existing_root=None):
         def background_cleanup():
             try:
                 # Update the database status to 'cancelled'
-                job_ref = db.reference(f'print_job_details/{job_id}')
-                job_ref.update({'status': 'cancelled', 'updated_at': time.time()})
+                repo.update_job_details(job_id, {'status': 'cancelled', 'updated_at': time.time()})
             except Exception as e:
                 print(f"[ERROR] Firebase error while updating cancellation status: {e}")
             finally:
@@ -405,8 +390,7 @@ def show_payment_screen(total_price, job_id, existing_root=None):
     
         try:
             # Verify `job_id` exists in the database
-            job_ref = db.reference(f'print_job_details/{job_id}')
-            if not job_ref.get():
+            if not repo.get_job_details(job_id):
                 print(f"[ERROR] Job ID {job_id} does not exist in the database!")
                 return
 
@@ -420,7 +404,7 @@ def show_payment_screen(total_price, job_id, existing_root=None):
                 root.after(0, update_gui, f"Overpaid by {excess_amount} pesos. Thank you!", "blue")
 
             # Update the database with the actual inserted amount
-            job_ref.update({'inserted_amount': total_amount, 'updated_at': time.time()})
+            repo.update_job_details(job_id, {'inserted_amount': total_amount, 'updated_at': time.time()})
 
 
             # Debug: Confirm database update
@@ -10,7 +10,7 @@ from print_summary import show_print_summary  # type: ignore # Import the functi
 from print_summary import show_payment_screen
 import sqlite3
 import logging
-from firebase_config import db
+from database_utils import repo
 import time
 import requests
 
@@ -25,30 +25,22 @@ def log_error(message):
 
 # Firebase: Fetch latest prices
 def fetch_latest_prices():
-    prices_ref = db.reference('print_prices')
-    prices = prices_ref.order_by_child('updated_at').limit_to_last(1).get()
-    latest = None
-    if isinstance(prices, dict):
-        latest = list(prices.values())[-1]
-    elif isinstance(prices, list):
-        latest = prices[-1]
+    latest = repo.latest_prices()
     if latest:
         return latest.get('black_price'), latest.get('color_price')
     return None, None
 
 # Firebase: Update job status
 def update_job_status(job_id, new_status, details=None):
-    job_ref = db.reference(f'print_jobs/{job_id}')
     update_data = {'status': new_status}
     if details:
         update_data['details'] = str(details)
-    job_ref.update(update_data)
+    repo.update_job(job_id, update_data)
     return True
 
 # Firebase: Save job details
 def save_print_job_details(job_id, file_name, total_pages, pages_to_print, color_mode, total_price):
-    details_ref = db.reference(f'print_job_details/{job_id}')
-    details_ref.set({
+    repo.set_job_details(job_id, {
         'file_name': file_name,
         'total_pages': total_pages,
         'pages_to_print': pages_to_print,
@@ -293,8 +285,7 @@ def start_printing_options(file_name, file_path, total_pages, job_id):
     # --- Update load_preview to use dynamic canvas size ---
     def load_preview(page_num=1):
         try:
-            job_ref = db.reference(f'print_jobs/{job_id}')
-            job_data = job_ref.get()
+            job_data = repo.get_job(job_id)
             preview_canvas.delete("all")
             if not job_data or not isinstance(job_data, dict):
                 preview_canvas.create_text(
@@ -361,8 +352,7 @@ def start_printing_options(file_name, file_path, total_pages, job_id):
     preview_page = {"num": 1, "max": 1}
     def update_preview_page(delta):
         try:
-            job_ref = db.reference(f'print_jobs/{job_id}')
-            job_data = job_ref.get()
+            job_data = repo.get_job(job_id)
             if not job_data or not isinstance(job_data, dict) or 'file_data' not in job_data:
                 return
             file_data = job_data['file_data']
@@ -0,0 +1,172 @@
+"""
+Columnar job analytics with NumPy.
+
+``JobColumns.from_jobs(jobs)`` makes a single pass over job dicts and keeps
+one row per print detail in parallel arrays:
+
+    day     int64    the job's creation day, as days since 1970-01-01 (NO_DAY if unknown or invalid)
+    status  int8     STATUS_CODES value of the detail's status (0 for anything else)
+    color   int8     COLOR_CODES value of its color mode (0 for anything else)
+    price   float64  total_price
+    pages   int64    pages_to_print
+
+plus ``job_day`` with the creation day of every job (jobs without details
+still count as jobs). ``counters()`` computes the rollup counters
+(rollups.COUNTER_FIELDS, with the same rules as rollups.job_contribution)
+with a few array reductions, and ``by_day()``/``by_month()`` group them with
+one ``bincount`` per counter instead of a Python loop per job and counter.
+"""
+import numpy as np
+
+from rollups import COUNTER_FIELDS, MONEY_FIELDS, job_day
+
+STATUS_CODES = {'complete': 1, 'cancelled': 2, 'pending': 3}
+COLOR_CODES = {'colored': 1, 'bw': 2}
+
+# day value of jobs whose creation day is unknown (NaT as an integer)
+NO_DAY = np.iinfo(np.int64).min
+
+
+def _number(value):
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _epoch_day(day):
+    try:
+        value = np.datetime64(day, 'D')
+    except (TypeError, ValueError):
+        return NO_DAY
+    # datetime64 also accepts '2024' or '2024-05'; only full dates round-trip
+    return int(value.astype(np.int64)) if str(value) == day else NO_DAY
+
+
+def _epoch_days(days):
+    """
+    'YYYY-MM-DD' strings -> int64 days since 1970-01-01. '' and anything else that is not
+    such a date (e.g. a created_at of 'N/A') give NO_DAY: counted in the totals, in no day or month.
+    """
+    codes = {day: _epoch_day(day) for day in set(days)}
+    return np.fromiter((codes[day] for day in days), dtype=np.int64, count=len(days))
+
+
+class JobColumns:
+    """Print details (and the jobs they belong to) as parallel NumPy arrays."""
+
+    def __init__(self, job_day, day, status, color, price, pages):
+        self.job_day = job_day
+        self.day = day
+        self.status = status
+        self.color = color
+        self.price = price
+        self.pages = pages
+
+    @classmethod
+    def from_jobs(cls, jobs):
+        """
+        Builds the columns from job dicts (as stored under print_jobs).
+        Args:
+            jobs (iterable): Job dicts; falsy entries are skipped.
+        """
+        job_days, days, statuses, colors, prices, pages = [], [], [], [], [], []
+        for job in jobs:
+            if not job:
+                continue
+            day = job_day(job)
+            job_days.append(day)
+            details = job.get('details', [])
+            if not isinstance(details, list):
+                continue
+            for detail in details:
+                if not isinstance(detail, dict):
+                    continue
+                days.append(day)
+                statuses.append(STATUS_CODES.get(detail.get('status'), 0))
+                colors.append(COLOR_CODES.get(detail.get('color_mode'), 0))
+                prices.append(_number(detail.get('total_price')))
+                pages.append(int(_number(detail.get('pages_to_print'))))
+        return cls(
+            _epoch_days(job_days),
+            _epoch_days(days),
+            np.array(statuses, dtype=np.int8),
+            np.array(colors, dtype=np.int8),
+            np.array(prices, dtype=np.float64),
+            np.array(pages, dtype=np.int64),
+        )
+
+    @classmethod
+    def from_details(cls, details, status=None):
+        """
+        Builds the columns from loose detail dicts (no jobs are counted), e.g. report rows.
+        Args:
+            details (iterable): Detail dicts.
+            status (str, optional): Status of every detail, for rows that do not carry theirs.
+        """
+        columns = cls.from_jobs([{'details': list(details)}])
+        columns.job_day = columns.job_day[:0]
+        if status is not None:
+            columns.status = np.full(len(columns), STATUS_CODES.get(status, 0), dtype=np.int8)
+        return columns
+
+    def __len__(self):
+        return len(self.status)
+
+    def weights(self):
+        """{counter: per-detail array} for every detail counter; summed up they give the counters."""
+        complete = self.status == STATUS_CODES['complete']
+        completed_price = np.where(complete, self.price, 0.0)
+        return {
+            'details': np.ones(len(self), dtype=np.int64),
+            'completed': complete,
+            'cancelled': self.status == STATUS_CODES['cancelled'],
+            'revenue': completed_price,
+            'color_revenue': np.where(self.color == COLOR_CODES['colored'], completed_price, 0.0),
+            'bw_revenue': np.where(self.color == COLOR_CODES['bw'], completed_price, 0.0),
+            'pages': np.where(complete, self.pages, 0),
+        }
+
+
+def _counter_value(field, value):
+    return round(float(value), 2) if field in MONEY_FIELDS else int(value)
+
+
+def counters(columns):
+    """Returns the rollup counters of everything in ``columns``."""
+    totals = {field: weights.sum() for field, weights in columns.weights().items()}
+    totals['jobs'] = len(columns.job_day)
+    return {field: _counter_value(field, totals[field]) for field in COUNTER_FIELDS}
+
+
+def _group(columns, job_keys, detail_keys, label):
+    """Counters per key; rows whose key is NO_DAY are left out. Returns {label(key): counters} by key."""
+    job_keys = job_keys[columns.job_day != NO_DAY]
+    has_day = columns.day != NO_DAY
+    keys, inverse = np.unique(np.concatenate([job_keys, detail_keys[has_day]]), return_inverse=True)
+    job_index, detail_index = inverse[:len(job_keys)], inverse[len(job_keys):]
+    grouped = {'jobs': np.bincount(job_index, minlength=len(keys))}
+    for field, weights in columns.weights().items():
+        grouped[field] = np.bincount(detail_index, weights=weights[has_day], minlength=len(keys))
+    return {
+        label(key): {field: _counter_value(field, grouped[field][index]) for field in COUNTER_FIELDS}
+        for index, key in enumerate(keys)
+    }
+
+
+def by_day(columns):
+    """Returns {YYYY-MM-DD: counters} for every day with a job."""
+    def label(key):
+        return str(np.datetime64(int(key), 'D'))
+    return _group(columns, columns.job_day, columns.day, label)
+
+
+def by_month(columns):
+    """Returns {YYYY-MM: counters} for every month with a job."""
+    def months(days):
+        # NO_DAY stays NaT, which stays NO_DAY
+        return days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+
+    def label(key):
+        return str(np.datetime64(int(key), 'M'))
+    return _group(columns, months(columns.job_day), months(columns.day), label)
@@ -0,0 +1,89 @@
+"""
+Response helpers for the read-only JSON API (the /api/... routes in app.py).
+
+``api_response(payload)`` serializes a payload as JSON, or as msgpack when the
+client asks for it (``Accept: application/msgpack`` or ``?format=msgpack``),
+and tags it with a strong ETag computed from the bytes sent. A request whose
+If-None-Match lists that ETag gets an empty 304 instead, so polling widgets
+and scripts only download data that changed.
+"""
+import hashlib
+import json
+
+import msgpack
+from flask import Response, request
+
+MSGPACK_TYPES = ('application/msgpack', 'application/x-msgpack')
+
+# Largest page of /api/jobs
+MAX_PAGE_SIZE = 100
+
+# Fields never sent by the API (kiosk uploads carry the whole file in file_data)
+HIDDEN_JOB_FIELDS = ('file_data',)
+
+
+def wants_msgpack():
+    """True if the current request asks for msgpack rather than JSON."""
+    if request.args.get('format') == 'msgpack':
+        return True
+    best = request.accept_mimetypes.best_match(('application/json',) + MSGPACK_TYPES)
+    return best in MSGPACK_TYPES
+
+
+def make_etag(body):
+    return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+
+def etag_matches(etag):
+    """True if the request's If-None-Match lists ``etag`` (or is '*')."""
+    header = request.headers.get('If-None-Match', '')
+    for candidate in header.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate in ('*', etag):
+            return True
+    return False
+
+
+def api_response(payload, status=200):
+    """
+    Serializes ``payload`` for the current request, with an ETag and 304 handling.
+    Args:
+        payload: JSON-serializable data.
+        status (int): Status of a full response (errors are never answered with 304).
+    Returns:
+        Response
+    """
+    if wants_msgpack():
+        body, mimetype = msgpack.packb(payload, use_bin_type=True, default=str), 'application/msgpack'
+    else:
+        body = json.dumps(payload, separators=(',', ':'), sort_keys=True, default=str).encode('utf-8')
+        mimetype = 'application/json'
+    etag = make_etag(body)
+    if status == 200 and etag_matches(etag):
+        response = Response(status=304)
+    else:
+        response = Response(body, status=status, mimetype=mimetype)
+    response.headers['ETag'] = etag
+    # Clients may keep the body but must revalidate it on every use
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.headers['Vary'] = 'Accept, Cookie'
+    return response
+
+
+def api_error(message, status):
+    return api_response({'error': str(message)}, status)
+
+
+def page_size(default=20):
+    """The ``limit`` query parameter, clamped to 1..MAX_PAGE_SIZE."""
+    limit = request.args.get('limit', default, type=int) or default
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def job_payload(job_id, job):
+    """A job as returned by /api/jobs: its fields without the file payload, plus its id."""
+    payload = {key: value for key, value in (job or {}).items() if key not in HIDDEN_JOB_FIELDS}
+    payload['id'] = job_id
+    return payload
@@ -1,29 +1,45 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash
+from flask import Flask, render_template, request, redirect, url_for, session, flash, g, jsonify, Response, stream_with_context
 from flask_bcrypt import Bcrypt
+from flask_socketio import SocketIO, join_room
+from jinja2 import FileSystemBytecodeCache
 from math import ceil
 from datetime import timedelta, datetime
 # import mysql.connector  # Commented out for Firebase migration
 import os
+import re
 from flask import make_response
 
-import firebase_admin
-from firebase_admin import credentials, db
+import firebase_config
 from werkzeug.utils import secure_filename
 # from firebase_admin import storage # Removed as per edit hint
 
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Image, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet
-from io import BytesIO
 from flask import send_file
-from reportlab.lib.colors import HexColor
-import json
+
+import api
+import data_access
+import exports
+import firebase_metrics
+import job_indexes
+import job_records
+import live
+import mirror
+import pagination
+import partitions
+import profiler
+import reports
+import repository
 
 
 # Initialize Flask app and Bcrypt for password hashing
 app = Flask(__name__)
+# Compiled templates are kept on disk, so a fresh process loads them instead of compiling them again
+# (in PRINTECH_TEMPLATE_CACHE_DIR, by default a per-user temporary directory)
+TEMPLATE_CACHE_DIR = os.environ.get('PRINTECH_TEMPLATE_CACHE_DIR') or None
+if TEMPLATE_CACHE_DIR:
+    os.makedirs(TEMPLATE_CACHE_DIR, exist_ok=True)
+app.jinja_options = {**app.jinja_options, 'bytecode_cache': FileSystemBytecodeCache(TEMPLATE_CACHE_DIR)}
 bcrypt = Bcrypt(app)
+socketio = SocketIO(app)
 
 
 # Secret key for session management
@@ -31,26 +47,33 @@ app.secret_key = 'your_secret_key_here'
 app.permanent_session_lifetime = timedelta(days=7)
 
 # --- Firebase Initialization ---
-FIREBASE_CRED_PATH = os.path.join(os.path.dirname(__file__), 'firebase_service_account.json')
-FIREBASE_DB_URL = 'https://printech-bd2ca-default-rtdb.asia-southeast1.firebasedatabase.app/'
-
-# Support loading service account from environment variable for deployment
-if os.environ.get('FIREBASE_SERVICE_ACCOUNT_JSON'):
-    service_account_info = json.loads(os.environ['FIREBASE_SERVICE_ACCOUNT_JSON'])
-    cred = credentials.Certificate(service_account_info)
-else:
-    cred = credentials.Certificate(FIREBASE_CRED_PATH)
-
-firebase_admin.initialize_app(cred, {
-    'databaseURL': FIREBASE_DB_URL
-})
+# (Moved to firebase_config.py, which also instruments every call for /metrics)
+# PRINTECH_FIREBASE=fake runs the app on the in-memory fake_rtdb instead of the live database
+app.config['FIREBASE_BACKEND'] = firebase_config.FIREBASE_BACKEND
 
 # --- Firebase Storage Initialization ---
 # (Removed: No Firebase Storage needed for local file saving)
 
+# --- Storage ---
+# Jobs, prices, printer status and admins go through the repository (PRINTECH_STORAGE: firebase or sqlite)
+repo = repository.get_repository()
+
+# --- Live dashboard ---
+# One change feed per process pushes dashboard updates to every connected admin (see live.py);
+# report worker processes import this module too, so it is created on first use by live.get_feed()
+
+# ?month= values (YYYY-MM)
+MONTH_PATTERN = re.compile(r'^\d{4}-(0[1-9]|1[0-2])$')
+
 # Allowed file extensions
 ALLOWED_EXTENSIONS = {'pdf', 'doc', 'docx'}
 
+def format_stale_since(reads):
+    """Time of the oldest snapshot a page was rendered from (for the staleness banner), or None."""
+    if reads.stale_since is None:
+        return None
+    return datetime.fromtimestamp(reads.stale_since).strftime('%B %d, %Y %I:%M:%S %p')
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
@@ -94,14 +117,15 @@ def upload_file():
                 os.remove(local_path)
                 flash('Error processing the file.', 'danger')
                 return redirect(request.url)
-            # Store metadata in Firebase Realtime Database
-            jobs_ref = db.reference('print_jobs')
+            # Store metadata in the job store
+            now = datetime.now()
             job_data = {
                 'file_name': filename,
                 'file_size': file_size,
                 'total_pages': total_pages,
                 'status': 'pending',
-                'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'created_at': now.strftime('%Y-%m-%d %H:%M:%S'),
+                'created_at_ts': now.timestamp(),
                 'local_path': local_path,
                 'details': [
                     {
@@ -116,7 +140,7 @@ def upload_file():
                     }
                 ]
             }
-            new_job = jobs_ref.push(job_data)
+            repo.add_job(job_data)
             return render_template('uploaded_file.html', filename=filename, file_size=file_size, total_pages=total_pages)
         else:
             flash('Invalid file type. Please upload a .doc, .docx, or .pdf file.', 'danger')
@@ -136,128 +160,66 @@ def generate_report():
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
 
-    # Firebase query to fetch report data
-    report_ref = db.reference('print_jobs')
-    report_data = report_ref.order_by_child('created_at').start_at(start_date).end_at(end_date).get()
-
-    # Transform report_data to a list of dictionaries
-    report_list = []
-    if report_data:
-        for job_id, job_details in report_data.items():
-            for detail in job_details.get('details', []):
-                if detail.get('status') == 'complete':
-                    report_list.append({
-                        'file_name': detail.get('file_name', ''),
-                        'color_mode': detail.get('color_mode', ''),
-                        'total_price': float(detail.get('total_price', 0)),
-                        'created_at': job_details.get('created_at', '')
-                    })
-
-    # Fetch summary metrics from the transformed report_list
-    total_jobs = len(report_list)
-    total_revenue = sum(item['total_price'] for item in report_list)
-    color_revenue = sum(item['total_price'] for item in report_list if item['color_mode'] == 'colored')
-    bw_revenue = sum(item['total_price'] for item in report_list if item['color_mode'] == 'bw')
-
-    summary = {
-        'total_jobs': total_jobs,
-        'total_revenue': total_revenue,
-        'color_revenue': color_revenue,
-        'bw_revenue': bw_revenue
-    }
+    try:
+        partitions.days_in_range(start_date, end_date)
+    except (TypeError, ValueError):
+        flash('Please select a valid start and end date.', 'danger')
+        return redirect(url_for('jobs'))
 
-    #pdf
-    pdf_buffer = BytesIO()
-    doc = SimpleDocTemplate(
-        pdf_buffer,
-        pagesize=letter,
-        topMargin=20,  # Reduce top margin
-        leftMargin=20,
-        rightMargin=20,
-        bottomMargin=20
-    )
-    elements = []
-
-    styles = getSampleStyleSheet()
-    normal_style = styles['Normal']
-
-    # Header Section with Logo and Title
+    # A report whose days have not changed since it was last built is sent straight from the cache
+    cached_path = reports.cached_report(start_date, end_date)
+    if cached_path:
+        return send_file(cached_path, as_attachment=True, download_name=f"Sales_Report_{start_date}_to_{end_date}.pdf")
+
+    # Otherwise the PDF is built in the background and the admin is sent to its status page at once
     logo_path = os.path.join(app.static_folder, "logo.jpg")
-    header_table_data = []
-    if os.path.exists(logo_path):
-        logo = Image(logo_path, width=80, height=80)
-        header_table_data.append([
-            logo,
-            Paragraph(
-                "<strong>Paperazzi: Coin Operated Printing Machine Sales Report</strong><br/>Cavite State University - Imus Campus",
-                normal_style
-            )
-        ])
-
-    header_table = Table(header_table_data, colWidths=[100, 400])
-    header_table.setStyle(TableStyle([
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('ALIGN', (1, 0), (-1, -1), 'LEFT'),
-    ]))
-    elements.append(header_table)
-    elements.append(Spacer(1, 10))  # Reduce spacer size here
-
-
-    # Summary Section
-    summary_data = [
-        ["Summary", ""],
-        ["Total Completed Jobs", summary["total_jobs"]],
-        ["Total Revenue (PHP)", f"{summary['total_revenue']:.2f}"],
-        ["Color Revenue (PHP)", f"{summary['color_revenue']:.2f}"],
-        ["Black & White Revenue (PHP)", f"{summary['bw_revenue']:.2f}"],
-    ]
-    summary_table = Table(summary_data, colWidths=[200, 200])
-    summary_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), HexColor('#ff294f')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
-    ]))
-    elements.append(summary_table)
-    elements.append(Spacer(1, 20))
-
-    # Detailed Table
-    table_data = [["Date", "File Name", "Color Mode", "Total Price (PHP)"]]
-    for row in report_list:
-        # If created_at is a string, just use it; otherwise, format as needed
-        created_at = row["created_at"]
-        if isinstance(created_at, datetime):
-            created_at_str = created_at.strftime("%Y-%m-%d")
-        else:
-            created_at_str = str(created_at)[:10]
-        table_data.append([
-            created_at_str,
-            row["file_name"],
-            row["color_mode"].capitalize(),
-            f"{row['total_price']:.2f}"
-        ])
-
-    detail_table = Table(table_data, colWidths=[100, 250, 100, 100])
-    detail_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), HexColor('#ff294f')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
-    ]))
-    elements.append(detail_table)
-
-    # Build PDF
-    doc.build(elements)
-    pdf_buffer.seek(0)
-    return send_file(pdf_buffer, as_attachment=True, download_name=f"Sales_Report_{start_date}_to_{end_date}.pdf")
+    report_id = reports.submit_report(start_date, end_date, logo_path, profile=bool(g.get('profile_sampler')))
+    return redirect(url_for('report_status', report_id=report_id))
+
+
+@app.route('/reports/<report_id>')
+def report_status(report_id):
+    report = reports.get_report(report_id)
+    if report is None:
+        flash('Report not found. It may have expired.', 'warning')
+        return redirect(url_for('jobs'))
+    if request.args.get('format') == 'json' or request.accept_mimetypes.best == 'application/json':
+        return jsonify(report)
+    return render_template('report_status.html', report_id=report_id, report=report)
+
+
+@app.route('/reports/<report_id>/download')
+def download_report(report_id):
+    report = reports.get_report(report_id)
+    if report is None or report.get('status') != 'done':
+        flash('Report is not ready yet.', 'warning')
+        return redirect(url_for('report_status', report_id=report_id) if report else url_for('jobs'))
+    return send_file(reports.report_path(report_id), as_attachment=True, download_name=report['download_name'])
+
+
+@app.route('/export/jobs.<fmt>')
+def export_jobs(fmt):
+    if fmt not in ('csv', 'ndjson'):
+        return "Unsupported export format.", 404
+    default_start, default_end = exports.default_range()
+    start_date = request.args.get('start_date') or default_start
+    end_date = request.args.get('end_date') or default_end
+    status = request.args.get('status')
+    status = status if status in exports.EXPORT_STATUSES else None
+    try:
+        partitions.days_in_range(start_date, end_date)
+    except ValueError:
+        return "Please select a valid start and end date.", 400
+
+    # Rows are streamed as they are read, so memory stays flat however long the range is
+    rows = exports.iter_job_rows(start_date, end_date, status)
+    if fmt == 'csv':
+        body, mimetype = exports.stream_csv(rows), 'text/csv'
+    else:
+        body, mimetype = exports.stream_ndjson(rows), 'application/x-ndjson'
+    response = Response(stream_with_context(body), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="Jobs_{start_date}_to_{end_date}.{fmt}"'
+    return response
 
 
 # Signup Page
@@ -284,18 +246,13 @@ def signup():
         # finally:
         #     cursor.close()
 
-        # --- Firebase version ---
-        admins_ref = db.reference('admins')
+        # --- Firebase / SQLite version ---
         # Check if email already exists
-        existing_admins = admins_ref.order_by_child('email').equal_to(email).get()
-        if existing_admins:
+        existing_id, _ = repo.find_admin(email)
+        if existing_id:
             flash('Email already registered.', 'danger')
             return render_template('signup.html')
-        new_admin = admins_ref.push({
-            'username': username,
-            'email': email,
-            'password_hash': hashed_password
-        })
+        repo.add_admin(username, email, hashed_password)
         flash('Account created successfully. Please log in.', 'success')
         return redirect(url_for('login'))
 
@@ -318,15 +275,8 @@ def login():
         # admin = cursor.fetchone()
         # cursor.close()
 
-        # --- Firebase version ---
-        admins_ref = db.reference('admins')
-        admins = admins_ref.order_by_child('email').equal_to(email).get()
-        admin = None
-        admin_id = None
-        for key, value in admins.items() if admins else []:
-            admin = value
-            admin_id = key
-            break
+        # --- Firebase / SQLite version ---
+        admin_id, admin = repo.find_admin(email)
 
         if admin and bcrypt.check_password_hash(admin['password_hash'], password):
             session.permanent = True
@@ -355,7 +305,7 @@ def dashboard():
         return redirect(url_for('login'))
 
     admin_username = session.get('username')
-    todays_page = int(request.args.get('todays_page', 1))  # Default to page 1
+    todays_cursor = pagination.decode_cursor(request.args.get('todays_cursor'))  # None for page 1
     jobs_per_page = 10
 
     # --- MySQL code commented out ---
@@ -367,75 +317,45 @@ def dashboard():
 
     # --- Firebase version ---
     try:
-        # Fetch all print jobs
-        jobs_ref = db.reference('print_jobs')
-        all_jobs = jobs_ref.get() or {}
-
-        # Total print jobs
-        total_jobs = len(all_jobs)
-
-        # Fetch remaining paper and last refilled time
-        printer_status_ref = db.reference('printer_status')
-        printer_statuses = printer_status_ref.order_by_child('updated_at').get()
-        printer_status_list = list(printer_statuses.values()) if printer_statuses else []
-        if printer_status_list:
-            latest_status = sorted(printer_status_list, key=lambda x: x.get('updated_at', ''), reverse=True)[0]
-            remaining_paper = latest_status.get('remaining_paper', 0)
-            last_refilled = latest_status.get('updated_at', 'N/A')
-            if isinstance(last_refilled, str) and last_refilled != 'N/A':
-                try:
-                    last_refilled = datetime.strptime(last_refilled, '%Y-%m-%d %H:%M:%S').strftime('%B %d, %Y')
-                except Exception:
-                    pass
-        else:
-            remaining_paper = 0
-            last_refilled = 'N/A'
+        # The dashboard's reads are independent, so they are started together
+        today_str = datetime.now().strftime('%Y-%m-%d')
+        reads = data_access.gather({
+            'totals': data_access.call(repo.totals, node='rollups'),
+            'paper': data_access.call(repo.latest_paper, node='current'),
+            'last_refill': data_access.call(repo.last_refill, node='current'),
+            'todays_rollup': data_access.call(repo.daily, today_str, node='rollups'),
+            'todays_page': data_access.call(
+                repo.jobs_page, jobs_per_page, todays_cursor, start=today_str, end=today_str,
+                node='print_jobs'
+            ),
+            'prices': data_access.call(repo.latest_prices, node='current'),
+        })
+
+        # Total print jobs (from the all-time rollup instead of a full scan)
+        total_jobs = reads['totals']['jobs']
+
+        # Remaining paper and last refilled time (current/ pointers, not the whole history)
+        remaining_paper, last_refilled = live.paper_summary(reads['paper'], reads['last_refill'])
 
         # Today's completed jobs and sales
-        today_str = datetime.now().strftime('%Y-%m-%d')
-        todays_completed_jobs = 0
-        todays_total_sales = 0.0
-        todays_jobs_count = 0
-        todays_jobs = []
+        todays_rollup = reads['todays_rollup']
+        todays_completed_jobs = todays_rollup['completed']
+        todays_total_sales = todays_rollup['revenue']
+        todays_jobs_count = todays_rollup['jobs']
 
-        for job_id, job in all_jobs.items():
-            created_at = job.get('created_at', '')
-            created_date = created_at[:10] if created_at else ''
-            if created_date == today_str:
-                todays_jobs_count += 1
-                for detail in job.get('details', []):
-                    if detail.get('status') == 'complete':
-                        todays_completed_jobs += 1
-                        todays_total_sales += float(detail.get('total_price', 0))
-                # For pagination
-                for detail in job.get('details', []):
-                    job_row = {
-                        'job_id': job_id,
-                        'file_name': detail.get('file_name', ''),
-                        'pages_to_print': detail.get('pages_to_print', 0),
-                        'color_mode': detail.get('color_mode', ''),
-                        'total_price': detail.get('total_price', 0),
-                        'inserted_amount': detail.get('inserted_amount', 0),
-                        'status': detail.get('status', ''),
-                        'created_at': created_at
-                    }
-                    todays_jobs.append(job_row)
+        # Only one page of today's jobs is downloaded for the table
+        todays_jobs = []
+        todays_data, todays_page, todays_next, todays_prev = reads['todays_page']
+        for job_id, job in todays_data:
+            todays_jobs.extend(job_records.job_rows(job_id, job))
 
         # Pagination
         todays_total_pages = (todays_jobs_count + jobs_per_page - 1) // jobs_per_page
-        offset = (todays_page - 1) * jobs_per_page
-        todays_jobs_paginated = todays_jobs[offset:offset + jobs_per_page]
-
-        # Fetch printing prices
-        prices_ref = db.reference('print_prices')
-        prices_data = prices_ref.order_by_child('updated_at').get()
-        prices_list = list(prices_data.values()) if prices_data else []
-        if prices_list:
-            latest_price = sorted(prices_list, key=lambda x: x.get('updated_at', ''), reverse=True)[0]
-            black_price = latest_price.get('black_price', 3)
-            color_price = latest_price.get('color_price', 5)
-        else:
-            black_price, color_price = 3, 5  # Default prices
+
+        # Printing prices
+        latest_price = reads['prices']
+        black_price = latest_price.get('black_price', 3)
+        color_price = latest_price.get('color_price', 5)
 
         # Render the dashboard template with all data
         return render_template(
@@ -446,14 +366,19 @@ def dashboard():
             last_refilled=last_refilled,
             todays_completed_jobs=todays_completed_jobs,
             todays_total_sales=todays_total_sales,
-            todays_jobs=todays_jobs_paginated,
+            todays_jobs=todays_jobs,
             todays_page=todays_page,
             todays_total_pages=todays_total_pages,
+            todays_next=todays_next,
+            todays_prev=todays_prev,
             black_price=black_price,
-            color_price=color_price
+            color_price=color_price,
+            stale_since=format_stale_since(reads)
         )
     except Exception as err:
-        return f"Error: {err}"
+        # No snapshot to fall back to (first load since start-up, or an error outside the reads)
+        print(f"Error loading dashboard: {err}")
+        return render_template('unavailable.html', page_title='Dashboard', error=err), 503
 
 @app.route('/update_prices', methods=['POST'])
 def update_prices():
@@ -479,12 +404,7 @@ def update_prices():
 
     # --- Firebase version ---
     try:
-        prices_ref = db.reference('print_prices')
-        prices_ref.push({
-            'black_price': black_price,
-            'color_price': color_price,
-            'updated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        })
+        repo.add_prices(black_price, color_price, datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
         flash('Prices updated successfully.', 'success')
     except Exception as err:
         flash(f"Error updating prices: {err}", 'danger')
@@ -501,76 +421,88 @@ def jobs():
 
     # --- Firebase version ---
     try:
-        # Get the month filter from query parameters
+        # Get the month, status and color mode filters from query parameters
+        # A month that is not YYYY-MM is ignored
         selected_month = request.args.get('month')
-        filter_month = selected_month if selected_month else None
-
-        # Fetch all print jobs
-        jobs_ref = db.reference('print_jobs')
-        all_jobs = jobs_ref.get() or {}
-
-        # Prepare job details
-        job_details = []
-        for job_id, job in all_jobs.items():
-            created_at = job.get('created_at', '')
-            created_month = created_at[:7] if created_at else ''
-            if filter_month and created_month != filter_month:
-                continue
-            for detail in job.get('details', []):
-                job_details.append({
-                    'id': detail.get('id', ''),
-                    'job_id': job_id,
-                    'file_name': detail.get('file_name', ''),
-                    'status': detail.get('status', ''),
-                    'created_at': created_at,
-                    'pages_to_print': detail.get('pages_to_print', 0),
-                    'color_mode': detail.get('color_mode', ''),
-                    'total_price': float(detail.get('total_price', 0)),
-                    'inserted_amount': float(detail.get('inserted_amount', 0)),
-                    'total_pages': detail.get('total_pages', 0)
-                })
+        filter_month = selected_month if selected_month and MONTH_PATTERN.match(selected_month) else None
+        filters = {
+            field: request.args.get(field) for field in job_indexes.FILTER_FIELDS if request.args.get(field)
+        }
+        filters.pop('month', None)
+        if filter_month:
+            filters['month'] = filter_month
+        search_query = request.args.get('q', '').strip()
+
+        # Summary metrics come from the rollup nodes instead of a pass over every job;
+        # they and one page of print jobs for the table are read concurrently
+        rows_per_page = 10
+        cursor = pagination.decode_cursor(request.args.get('cursor'))
+        if search_query:
+            # File name search (by name, through the prefix index in job_search.py); the other filters do not apply
+            page_call = data_access.call(repo.search_jobs, search_query, rows_per_page, cursor, node='print_jobs')
+            filters = {'month': filter_month} if filter_month else {}
+        elif filters.keys() - {'month'}:
+            # Status and color mode filters page through the secondary indexes (see job_indexes.py)
+            page_call = data_access.call(repo.jobs_page, rows_per_page, cursor, filters=filters, node='print_jobs')
+        elif filter_month:
+            page_call = data_access.call(
+                repo.jobs_page, rows_per_page, cursor, *partitions.month_days(filter_month), node='print_jobs'
+            )
+        else:
+            page_call = data_access.call(repo.jobs_page, rows_per_page, cursor, node='print_jobs')
+        if filter_month:
+            reads = data_access.gather({
+                'stats': data_access.call(repo.monthly, filter_month, node='rollups'),
+                'daily_rollups': data_access.call(
+                    repo.daily_range, f'{filter_month}-01', f'{filter_month}-31', node='rollups'
+                ),
+                'page': page_call,
+            })
+        else:
+            reads = data_access.gather({
+                'stats': data_access.call(repo.totals, node='rollups'),
+                'daily_rollups': data_access.call(repo.daily_range, node='rollups'),
+                'page': page_call,
+            })
+        stats = reads['stats']
+        daily_rollups = reads['daily_rollups']
 
         # Total jobs (regardless of status)
-        total_jobs = len(job_details)
+        total_jobs = stats['details']
 
         # Total sales (only for completed jobs)
-        total_sales = sum(j['total_price'] for j in job_details if j['status'] == 'complete')
+        total_sales = stats['revenue']
 
         # Completed and cancelled jobs
-        completed_jobs = sum(1 for j in job_details if j['status'] == 'complete')
-        cancelled_jobs = sum(1 for j in job_details if j['status'] == 'cancelled')
+        completed_jobs = stats['completed']
+        cancelled_jobs = stats['cancelled']
 
         # Revenue breakdown
-        color_revenue = sum(j['total_price'] for j in job_details if j['color_mode'] == 'colored' and j['status'] == 'complete')
-        bw_revenue = sum(j['total_price'] for j in job_details if j['color_mode'] == 'bw' and j['status'] == 'complete')
+        color_revenue = stats['color_revenue']
+        bw_revenue = stats['bw_revenue']
 
         total_revenue = color_revenue + bw_revenue
         color_percentage = (color_revenue / total_revenue * 100) if total_revenue > 0 else 0
         bw_percentage = (bw_revenue / total_revenue * 100) if total_revenue > 0 else 0
 
-        # Pagination
-        rows_per_page = 10
-        page = int(request.args.get('page', 1))
-        offset = (page - 1) * rows_per_page
-        total_records = total_jobs
-        total_pages = ceil(total_records / rows_per_page)
-        print_jobs = job_details[offset:offset + rows_per_page]
+        # One page of print jobs for the table
+        page_jobs, page, next_cursor, prev_cursor = reads['page']
+
+        # Prepare job details
+        def keep(detail):
+            return all(detail.get(field) == value for field, value in filters.items() if field != 'month')
+
+        print_jobs = []
+        for job_id, job in page_jobs:
+            print_jobs.extend(job_records.job_rows(job_id, job, keep))
+
+        # Pagination (the rollups do not count jobs by status or color mode, so those pages are not numbered)
+        total_records = stats['jobs']
+        total_pages = ceil(total_records / rows_per_page) if filters.keys() <= {'month'} and not search_query else None
 
         # Job trends (number of jobs by date)
-        job_trends_dict = {}
-        for j in job_details:
-            job_date = j['created_at'][:10] if j['created_at'] else ''
-            if job_date:
-                job_trends_dict[job_date] = job_trends_dict.get(job_date, 0) + 1
-        job_trend_dates = sorted(job_trends_dict.keys())
-        job_trend_counts = [job_trends_dict[date] for date in job_trend_dates]
-
-        # Pagination range logic
-        pagination_range = 5
-        start_page = max(1, page - pagination_range // 2)
-        end_page = min(total_pages, start_page + pagination_range - 1)
-        if end_page - start_page < pagination_range:
-            start_page = max(1, end_page - pagination_range + 1)
+        job_trend_dates = [day for day, counters in daily_rollups.items() if counters['details']]
+        job_trend_counts = [daily_rollups[day]['details'] for day in job_trend_dates]
 
         return render_template(
             'jobs.html',
@@ -585,15 +517,21 @@ def jobs():
             print_jobs=print_jobs,
             page=page,
             total_pages=total_pages,
-            start_page=start_page,
-            end_page=end_page,
+            next_cursor=next_cursor,
+            prev_cursor=prev_cursor,
             selected_month=selected_month,
+            selected_status=filters.get('status', ''),
+            selected_color_mode=filters.get('color_mode', ''),
+            search_query=search_query,
+            page_args=dict(filters, q=search_query) if search_query else filters,
             job_trend_dates=job_trend_dates,
-            job_trend_counts=job_trend_counts
+            job_trend_counts=job_trend_counts,
+            stale_since=format_stale_since(reads)
         )
 
     except Exception as err:
-        return f"Error: {err}"
+        print(f"Error loading print jobs: {err}")
+        return render_template('unavailable.html', page_title='Print Jobs', error=err), 503
 
 
 
@@ -632,41 +570,201 @@ def update_remaining_paper():
     try:
         new_remaining_paper = int(request.form['new_remaining_paper'])
         now_str = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        printer_status_ref = db.reference('printer_status')
-        printer_status_ref.push({
-            'remaining_paper': new_remaining_paper,
-            'updated_at': now_str,
-            'refill': True
-        })
+        repo.record_paper(new_remaining_paper, now_str, refill=True)
 
-        # Get last refilled time
-        statuses = printer_status_ref.order_by_child('updated_at').get()
-        last_refilled = 'N/A'
-        if statuses:
-            refill_statuses = [s for s in statuses.values() if s.get('refill')]
-            if refill_statuses:
-                last_refilled_time = sorted(refill_statuses, key=lambda x: x.get('updated_at', ''), reverse=True)[0].get('updated_at', '')
-                if last_refilled_time:
-                    try:
-                        last_refilled = datetime.strptime(last_refilled_time, '%Y-%m-%d %H:%M:%S').strftime('%B %d, %Y')
-                    except Exception:
-                        last_refilled = last_refilled_time
+        # This write is the last refill
+        last_refilled = datetime.strptime(now_str, '%Y-%m-%d %H:%M:%S').strftime('%B %d, %Y')
         flash(f"Paper count updated successfully. Last refilled: {last_refilled}", 'success')
         return redirect(url_for('dashboard'))
     except Exception as err:
         return f"Error: {err}"
 
 
+# --- Read API ---
+# JSON by default, msgpack with Accept: application/msgpack or ?format=msgpack; every
+# response carries a strong ETag and a matching If-None-Match gets a 304 (see api.py)
+@app.route('/api/get_remaining_paper')
+def api_remaining_paper():
+    try:
+        reads = data_access.gather({
+            'paper': data_access.call(repo.latest_paper, node='current'),
+            'last_refill': data_access.call(repo.last_refill, node='current'),
+        })
+    except Exception as err:
+        return api.api_error(err, 503)
+    paper = reads['paper'] or {}
+    return api.api_response({
+        'remaining_paper': paper.get('remaining_paper', 0),
+        'updated_at': paper.get('updated_at'),
+        'last_refilled': (reads['last_refill'] or {}).get('updated_at'),
+        'stale_since': reads.stale_since,
+    })
+
+
+@app.route('/api/prices')
+def api_prices():
+    try:
+        reads = data_access.gather({'prices': data_access.call(repo.latest_prices, node='current')})
+    except Exception as err:
+        return api.api_error(err, 503)
+    return api.api_response(dict(reads['prices'], stale_since=reads.stale_since))
+
+
+@app.route('/api/summary')
+def api_summary():
+    month = request.args.get('month')
+    if month and not MONTH_PATTERN.match(month):
+        return api.api_error('month must be YYYY-MM', 400)
+    today = datetime.now().strftime('%Y-%m-%d')
+    calls = {
+        'totals': data_access.call(repo.totals, node='rollups'),
+        'today': data_access.call(repo.daily, today, node='rollups'),
+    }
+    if month:
+        calls['month'] = data_access.call(repo.monthly, month, node='rollups')
+    try:
+        reads = data_access.gather(calls)
+    except Exception as err:
+        return api.api_error(err, 503)
+    summary = {name: dict(reads[name], **({'day': today} if name == 'today' else {})) for name in calls}
+    if month:
+        summary['month']['month'] = month
+    summary['stale_since'] = reads.stale_since
+    return api.api_response(summary)
+
+
+@app.route('/api/jobs')
+def api_jobs():
+    month = request.args.get('month')
+    if month and not MONTH_PATTERN.match(month):
+        return api.api_error('month must be YYYY-MM', 400)
+    token = request.args.get('cursor')
+    cursor = pagination.decode_cursor(token)
+    if token and cursor is None:
+        return api.api_error('Invalid cursor', 400)
+    bounds = dict(zip(('start', 'end'), partitions.month_days(month))) if month else {}
+    try:
+        reads = data_access.gather({
+            'page': data_access.call(repo.jobs_page, api.page_size(), cursor, node='print_jobs', **bounds),
+        })
+    except Exception as err:
+        return api.api_error(err, 503)
+    page_jobs, page, next_cursor, prev_cursor = reads['page']
+    return api.api_response({
+        'jobs': [api.job_payload(job_id, job) for job_id, job in page_jobs],
+        'page': page,
+        'next_cursor': next_cursor,
+        'prev_cursor': prev_cursor,
+        'stale_since': reads.stale_since,
+    })
+
+
+@app.route('/health/mirror')
+def mirror_health():
+    # Without the mirror (SQLite store or FIREBASE_MIRROR=0) reads go straight to the store, which is not an outage
+    in_use = mirror.MIRROR_ENABLED and repo.name == 'firebase'
+    report = mirror.health_report()
+    healthy = not in_use or (bool(report) and all(node['healthy'] for node in report.values()))
+    return jsonify({
+        'database': app.config['FIREBASE_BACKEND'], 'storage': repo.name, 'enabled': mirror.MIRROR_ENABLED,
+        'status': ('healthy' if healthy else 'unhealthy') if in_use else 'not_applicable',
+        'healthy': healthy, 'nodes': report,
+        'breakers': data_access.breaker_report(), 'live_feed': live.get_feed(socketio, repo).health(),
+        'firebase_session': firebase_config.session_health()
+    }), 200 if healthy else 503
+
+
+@socketio.on('connect')
+def live_connect():
+    # Only signed-in admins get dashboard events; the session cookie comes with the handshake
+    if 'admin_id' not in session:
+        return False
+    join_room(live.ROOM)
+    live.get_feed(socketio, repo).ensure_started()
+
+
+@app.route('/profiles')
+def profiles():
+    return render_template('profiles.html', profiles=profiler.list_profiles())
+
+
+@app.route('/profiles/<profile_id>')
+def profile_detail(profile_id):
+    profile = profiler.load_profile(profile_id)
+    if profile is None:
+        return 'Profile not found', 404
+    if request.args.get('format') == 'folded':
+        return Response(profiler.folded(profile), mimetype='text/plain')
+    return render_template('profiles.html', profile=profile, functions=profiler.top_functions(profile))
+
+
+@app.route('/metrics')
+def metrics():
+    # Admins (session) or a scraper presenting PRINTECH_METRICS_TOKEN as a bearer token
+    token = os.environ.get('PRINTECH_METRICS_TOKEN')
+    scraper = token and request.headers.get('Authorization') == f'Bearer {token}'
+    if 'admin_id' not in session and not scraper:
+        return 'Forbidden', 403
+    return Response(firebase_metrics.render_metrics(), mimetype='text/plain; version=0.0.4')
+
+
+@app.after_request
+def count_page_view(response):
+    if request.endpoint not in ('static', 'metrics'):
+        firebase_metrics.record_page_view(request.endpoint or 'unknown')
+    return response
+
+
+@app.before_request
+def start_read_model():
+    # The in-memory mirror only backs the Firebase store
+    if repo.name == 'firebase':
+        firebase_config.prewarm()
+        mirror.ensure_started()
+
+
 @app.before_request
 def require_login():
-    allowed_routes = ['login', 'signup', 'logout', 'static']
+    allowed_routes = ['login', 'signup', 'logout', 'static', 'metrics', 'mirror_health']
     if request.endpoint not in allowed_routes and 'admin_id' not in session:
+        if request.path.startswith('/api/'):
+            return api.api_error('Authentication required', 401)
         flash('You must log in to access this page.', 'danger')
         return redirect(url_for('login'))
 
 
+@app.before_request
+def start_profile():
+    # Admin-only and opt-in per request (?profile=1 or X-Profile: 1)
+    if 'admin_id' in session and profiler.requested(request):
+        g.profile_sampler = profiler.start(request.endpoint or 'unknown')
+
+
+@app.after_request
+def finish_profile(response):
+    sampler = g.pop('profile_sampler', None)
+    if sampler is not None:
+        profile_id = profiler.finish(
+            sampler, method=request.method, url=request.full_path, status=response.status_code
+        )
+        response.headers['X-Profile-Id'] = profile_id
+    return response
+
+
+@app.teardown_request
+def discard_profile(exception):
+    # A request that raised never reaches after_request; its capture is still saved
+    sampler = g.pop('profile_sampler', None)
+    if sampler is not None:
+        profiler.finish(sampler, method=request.method, url=request.full_path, status=500, error=str(exception))
+
+
 if __name__ == '__main__':
-    app.run(debug=True, host='127.0.0.1', port=5000)
+    # Fetch the database token and open the first connection now, instead of on the first page. Only here:
+    # report workers import this module, and the reloader's parent (no WERKZEUG_RUN_MAIN) serves nothing
+    if repo.name == 'firebase' and os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        firebase_config.prewarm()
+    socketio.run(app, debug=True, host='127.0.0.1', port=5000, allow_unsafe_werkzeug=True)
 
 # Install the required packages
 # pip install flask flask-bcrypt firebase-admin reportlab
@@ -0,0 +1,346 @@
+"""
+Cold archive of old print jobs.
+
+``compact()`` moves jobs older than ``ARCHIVE_AFTER_DAYS`` out of ``print_jobs``
+(and their ``print_jobs_by_day`` copies) into compressed segment files, one
+segment per month per compaction run, and records each segment in a small
+index keyed by date range. Rollups are left untouched, so all-time and
+monthly stats still include archived jobs.
+
+Segments are gzip-compressed msgpack streams of ``[job_id, job]`` pairs, or
+JSON lines when msgpack is not installed. ``fetch_range()`` reads only the
+segments whose date range overlaps the request, so report queries can span
+the hot store and the archive.
+
+Once a job is archived its segment file is the only copy, so ``compact()``
+refuses to run unless ``PRINTECH_ARCHIVE_DURABLE=1`` says ``ARCHIVE_DIR`` is
+durable storage (a mounted persistent disk or a synced bucket). On a host with
+an ephemeral filesystem, such as a Render web service without a disk, the
+segments and with them the archived jobs are lost on the next deploy.
+
+Run it from cron or by hand::
+
+    PRINTECH_ARCHIVE_DURABLE=1 python archive.py        # archive jobs older than ARCHIVE_AFTER_DAYS
+    PRINTECH_ARCHIVE_DURABLE=1 python archive.py 90     # ... older than 90 days
+"""
+import bisect
+import gzip
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from firebase_config import db
+
+import job_indexes
+import job_search
+import mirror
+import partitions
+from partitions import job_epoch
+from rollups import job_day
+
+try:
+    import msgpack
+except ImportError:  # JSONL segments are written instead
+    msgpack = None
+
+ARCHIVE_DIR = os.environ.get('PRINTECH_ARCHIVE_DIR', os.path.join(os.path.dirname(__file__), 'archive'))
+ARCHIVE_AFTER_DAYS = int(os.environ.get('PRINTECH_ARCHIVE_AFTER_DAYS', 180))
+INDEX_FILE = 'index.json'
+
+# Set PRINTECH_ARCHIVE_DURABLE=1 once ARCHIVE_DIR survives redeploys; compact() deletes nothing before that
+ARCHIVE_DURABLE = os.environ.get('PRINTECH_ARCHIVE_DURABLE', '0') == '1'
+
+# Jobs fetched from Firebase per compaction batch
+BATCH_SIZE = 500
+
+# Recently read segments are kept decoded in memory, up to this many uncompressed bytes
+SEGMENT_CACHE_BYTES = int(float(os.environ.get('PRINTECH_ARCHIVE_CACHE_MB', 64)) * 1024 * 1024)
+
+_index_lock = threading.Lock()
+_cache_lock = threading.Lock()
+_segment_cache = OrderedDict()  # file name -> (uncompressed bytes, jobs), least recently read first
+_segment_cache_bytes = 0
+
+# Sorted job_search keys of every archived job, rebuilt when the segment list changes
+_search_lock = threading.Lock()
+_search_index = {'files': None, 'keys': [], 'segments': []}
+
+
+def _index_path():
+    return os.path.join(ARCHIVE_DIR, INDEX_FILE)
+
+
+def load_index():
+    """Returns the list of segment entries ({file, start_day, end_day, jobs, bytes, created_at})."""
+    try:
+        with open(_index_path(), encoding='utf-8') as f:
+            return json.load(f).get('segments', [])
+    except FileNotFoundError:
+        return []
+
+
+def _write_atomically(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _save_index(segments):
+    payload = json.dumps({'segments': segments}, indent=2).encode('utf-8')
+    _write_atomically(_index_path(), payload)
+
+
+def write_segment(month, jobs):
+    """
+    Writes one compressed segment and adds it to the index.
+    Args:
+        month (str): YYYY-MM the jobs belong to (used in the file name).
+        jobs (list): (job_id, job) tuples.
+    Returns:
+        dict: The new index entry.
+    """
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    jobs = sorted(jobs, key=lambda item: (job_epoch(item[1]) or 0, item[0]))
+    if msgpack is not None:
+        extension = 'msgpack.gz'
+        raw = b''.join(msgpack.packb([job_id, job], use_bin_type=True) for job_id, job in jobs)
+    else:
+        extension = 'jsonl.gz'
+        raw = ''.join(json.dumps([job_id, job]) + '\n' for job_id, job in jobs).encode('utf-8')
+    file_name = f"jobs_{month}_{int(time.time() * 1000)}.{extension}"
+    data = gzip.compress(raw)
+    _write_atomically(os.path.join(ARCHIVE_DIR, file_name), data)
+    days = [job_day(job) for _, job in jobs]
+    entry = {
+        'file': file_name,
+        'start_day': min(days),
+        'end_day': max(days),
+        'jobs': len(jobs),
+        'bytes': len(data),
+        'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+    }
+    with _index_lock:
+        segments = load_index()
+        segments.append(entry)
+        segments.sort(key=lambda segment: (segment['start_day'], segment['file']))
+        _save_index(segments)
+    return entry
+
+
+def _decode_segment(file_name):
+    with open(os.path.join(ARCHIVE_DIR, file_name), 'rb') as f:
+        raw = gzip.decompress(f.read())
+    if file_name.endswith('.msgpack.gz'):
+        if msgpack is None:
+            raise RuntimeError(f"msgpack is required to read archive segment {file_name}")
+        unpacker = msgpack.Unpacker(raw=False)
+        unpacker.feed(raw)
+        return len(raw), tuple((job_id, job) for job_id, job in unpacker)
+    return len(raw), tuple(tuple(json.loads(line)) for line in raw.decode('utf-8').splitlines() if line)
+
+
+def read_segment(file_name):
+    """Returns the (job_id, job) tuples stored in a segment file."""
+    global _segment_cache_bytes
+    with _cache_lock:
+        cached = _segment_cache.get(file_name)
+        if cached is not None:
+            _segment_cache.move_to_end(file_name)
+            return cached[1]
+    size, jobs = _decode_segment(file_name)
+    with _cache_lock:
+        if file_name not in _segment_cache and size <= SEGMENT_CACHE_BYTES:
+            _segment_cache[file_name] = (size, jobs)
+            _segment_cache_bytes += size
+            while _segment_cache_bytes > SEGMENT_CACHE_BYTES:
+                _, (evicted_size, _) = _segment_cache.popitem(last=False)
+                _segment_cache_bytes -= evicted_size
+    return jobs
+
+
+def fetch_range(start_date, end_date):
+    """
+    Returns archived (job_id, job) tuples created between start_date and end_date
+    (inclusive, YYYY-MM-DD), reading only the segments that overlap the range.
+    """
+    jobs = {}
+    for segment in load_index():
+        if segment['end_day'] < start_date or segment['start_day'] > end_date:
+            continue
+        for job_id, job in read_segment(segment['file']):
+            if start_date <= job_day(job) <= end_date:
+                jobs[job_id] = job  # a re-archived job (interrupted compaction) keeps its latest copy
+    return sorted(jobs.items(), key=lambda item: (job_epoch(item[1]) or 0, item[0]))
+
+
+def archive_horizon():
+    """Returns the first day that is still entirely in the hot store, or None if nothing is archived."""
+    segments = load_index()
+    if not segments:
+        return None
+    last_day = max(segment['end_day'] for segment in segments)
+    return (datetime.strptime(last_day, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+
+
+def _epoch_day(epoch):
+    return datetime.fromtimestamp(epoch).strftime('%Y-%m-%d')
+
+
+def _row_key(item):
+    return mirror.sort_key(job_epoch(item[1]), item[0])
+
+
+def page_rows(page_size, cursor=None, start=None, end=None):
+    """
+    The archived side of a jobs table page: up to page_size + 1 (job_id, job) rows ordered by
+    (created_at_ts, job id), past the cursor in its direction, created between ``start`` and
+    ``end`` (inclusive epoch seconds, None for no bound). Segments are read in day order only
+    until the page is full.
+    """
+    backward = cursor is not None and cursor['d'] == 'before'
+    boundary = mirror.sort_key(cursor['c'], cursor['k']) if cursor else None
+    first_day = _epoch_day(start) if start is not None else ''
+    last_day = _epoch_day(end) if end is not None else '9999-12-31'
+    if boundary is not None and isinstance(cursor['c'], (int, float)):
+        if backward:
+            last_day = min(last_day, _epoch_day(cursor['c']))
+        else:
+            first_day = max(first_day, _epoch_day(cursor['c']))
+    segments = [
+        segment for segment in load_index()
+        if segment['end_day'] >= first_day and segment['start_day'] <= last_day
+    ]
+    if backward:
+        segments.sort(key=lambda segment: segment['end_day'], reverse=True)
+    rows = {}
+    page = []
+    for segment in segments:
+        if len(page) > page_size:
+            # Every later segment starts after (or, going back, ends before) the last row of a full page
+            edge_day = _epoch_day(job_epoch(page[-1][1]))
+            if (segment['end_day'] < edge_day) if backward else (segment['start_day'] > edge_day):
+                break
+        for job_id, job in read_segment(segment['file']):
+            epoch = job_epoch(job)
+            if epoch is None or (start is not None and epoch < start) or (end is not None and epoch > end):
+                continue
+            if boundary is not None:
+                key = mirror.sort_key(epoch, job_id)
+                if (key >= boundary) if backward else (key <= boundary):
+                    continue
+            rows[job_id] = job  # a re-archived job keeps its latest copy
+        page = sorted(rows.items(), key=_row_key, reverse=backward)[:page_size + 1]
+    if backward:
+        page.reverse()
+    return page
+
+
+def _search_entries():
+    """The sorted job_search keys of all archived jobs, and the segment file each one is in."""
+    files = tuple(segment['file'] for segment in load_index())
+    with _search_lock:
+        if _search_index['files'] != files:
+            entries = {}
+            for file_name in files:
+                for job_id, job in read_segment(file_name):
+                    key = job_search.search_key(job_id, job)
+                    if key:
+                        entries[key] = file_name
+            keys = sorted(entries)
+            _search_index.update(files=files, keys=keys, segments=[entries[key] for key in keys])
+        return _search_index['keys'], _search_index['segments']
+
+
+def search_rows(prefix, page_size, cursor=None):
+    """
+    The archived side of a file name search: up to page_size + 1 (key, job_id) rows whose
+    job_search key starts with the normalized ``prefix``, past the cursor in its direction.
+    """
+    keys, _ = _search_entries()
+    lo = bisect.bisect_left(keys, prefix)
+    hi = bisect.bisect_right(keys, prefix + '\uf8ff', lo)
+    if cursor is None:
+        selected = keys[lo:min(hi, lo + page_size + 1)]
+    elif cursor['d'] == 'after':
+        index = max(lo, bisect.bisect_right(keys, cursor['k'], lo, hi))
+        selected = keys[index:min(hi, index + page_size + 1)]
+    else:
+        index = min(hi, bisect.bisect_left(keys, cursor['k'], lo, hi))
+        selected = keys[max(lo, index - page_size - 1):index]
+    return [(key, job_search.key_job_id(key)) for key in selected]
+
+
+def find_jobs(keys):
+    """Returns {job_id: job} for the archived jobs listed under the given job_search keys."""
+    search_keys, segments = _search_entries()
+    wanted = {}
+    for key in keys:
+        index = bisect.bisect_left(search_keys, key)
+        if index < len(search_keys) and search_keys[index] == key:
+            wanted.setdefault(segments[index], set()).add(job_search.key_job_id(key))
+    jobs = {}
+    for file_name, job_ids in wanted.items():
+        for job_id, job in read_segment(file_name):
+            if job_id in job_ids:
+                jobs[job_id] = job
+    return jobs
+
+
+def compact(max_age_days=None):
+    """
+    Moves jobs older than ``max_age_days`` from Firebase into archive segments.
+    Segments are written (and fsynced) before the jobs are deleted, so an interrupted
+    run can only leave a job in both places, never in neither.
+    Raises:
+        RuntimeError: If ARCHIVE_DIR has not been declared durable with PRINTECH_ARCHIVE_DURABLE=1.
+    Returns:
+        int: Number of jobs archived.
+    """
+    if not ARCHIVE_DURABLE:
+        raise RuntimeError(
+            f"Refusing to delete jobs from Firebase: {ARCHIVE_DIR} is not declared durable. Point "
+            "PRINTECH_ARCHIVE_DIR at persistent storage and set PRINTECH_ARCHIVE_DURABLE=1."
+        )
+    max_age_days = ARCHIVE_AFTER_DAYS if max_age_days is None else max_age_days
+    cutoff = (datetime.now() - timedelta(days=max_age_days)).replace(hour=0, minute=0, second=0, microsecond=0)
+    jobs_ref = db.reference('print_jobs')
+    archived = 0
+    while True:
+        # start_at(0) skips jobs without a numeric created_at_ts; run partitions.py to backfill them
+        query = jobs_ref.order_by_child('created_at_ts').start_at(0).end_at(cutoff.timestamp())
+        batch = query.limit_to_first(BATCH_SIZE).get() or {}
+        if not batch:
+            return archived
+        by_month = {}
+        for job_id, job in batch.items():
+            by_month.setdefault(job_day(job)[:7], []).append((job_id, job))
+        for month, jobs in sorted(by_month.items()):
+            write_segment(month, jobs)
+        deletions = {}
+        for job_id, job in batch.items():
+            deletions[f'print_jobs/{job_id}'] = None
+            deletions.update(partitions.index_updates(job_id, job, None))
+            deletions.update(job_indexes.index_updates(job_id, job, None))
+            deletions.update(job_search.index_updates(job_id, job, None))
+        db.reference('/').update(deletions)
+        archived += len(batch)
+        if len(batch) < BATCH_SIZE:
+            return archived
+
+
+if __name__ == '__main__':
+    import sys
+
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else ARCHIVE_AFTER_DAYS
+    try:
+        archived = compact(days)
+    except RuntimeError as err:
+        print(err)
+        sys.exit(1)
+    print(f"Archived {archived} job(s) older than {days} day(s) into {ARCHIVE_DIR}")
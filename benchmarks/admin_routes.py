@@ -0,0 +1,288 @@
+"""
+Benchmark of the admin routes against growing print_jobs trees.
+
+For each dataset size the runner loads a synthetic tree (see dataset.py) into
+the in-process fake database, runs the usual backfills (day partitions, job and search indexes,
+rollups, current/ pointers), waits for the mirror, and drives the Flask test
+client through dashboard(), jobs(), jobs(month), generate_report() and login().
+Per route it reports p50/p95 latency, the peak Python memory allocated while
+serving one request (tracemalloc) and the database calls made per request
+(from the firebase_metrics route labels, including reads fanned out to pool
+threads and the background report build).
+
+Results are compared with the committed baseline (baseline.json next to this
+file) and the run exits with status 1 when a route regresses:
+
+    python benchmarks/admin_routes.py                     # 10k and 100k jobs
+    python benchmarks/admin_routes.py --sizes 1000000     # the 1M run (slow, several GB)
+    python benchmarks/admin_routes.py --update-baseline   # accept the current numbers
+    FIREBASE_MIRROR=0 python benchmarks/admin_routes.py   # every read goes to the (fake) network
+"""
+import argparse
+import gc
+import json
+import os
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# The app must come up on the fake database, with its file stores in a scratch directory
+# (report worker processes re-import this module, so they reuse the parent's directory)
+if 'PRINTECH_BENCH_SCRATCH' not in os.environ:
+    os.environ['PRINTECH_BENCH_SCRATCH'] = tempfile.mkdtemp(prefix='printech-bench-')
+SCRATCH_DIR = os.environ['PRINTECH_BENCH_SCRATCH']
+os.environ['PRINTECH_FIREBASE'] = 'fake'
+os.environ['PRINTECH_STORAGE'] = 'firebase'
+os.environ.setdefault('PRINTECH_REPORTS_DIR', os.path.join(SCRATCH_DIR, 'reports'))
+os.environ.setdefault('PRINTECH_ARCHIVE_DIR', os.path.join(SCRATCH_DIR, 'archive'))
+os.environ.setdefault('PRINTECH_PROFILES_DIR', os.path.join(SCRATCH_DIR, 'profiles'))
+
+import dataset  # noqa: E402
+import firebase_config  # noqa: E402
+import firebase_metrics  # noqa: E402
+import current_values  # noqa: E402
+import job_indexes  # noqa: E402
+import job_search  # noqa: E402
+import mirror  # noqa: E402
+import partitions  # noqa: E402
+import reports  # noqa: E402
+import rollups  # noqa: E402
+from app import app  # noqa: E402
+
+DEFAULT_SIZES = (10_000, 100_000)
+DEFAULT_ITERATIONS = 20
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+# A route regresses when p95 grows past baseline * (1 + tolerance) + slack, or it makes more calls
+LATENCY_TOLERANCE = 0.5
+LATENCY_SLACK_MS = 5.0
+MEMORY_TOLERANCE = 0.25
+MEMORY_SLACK_KB = 256
+REPORT_TIMEOUT = 600
+
+# Report builds take seconds each, so generate_report is sampled fewer times (one build at a time)
+REPORT_ITERATIONS = 5
+
+
+def _load(size, years):
+    started = time.perf_counter()
+    tree = dataset.generate(size, years=years)
+    firebase_config.fake_db.load(tree)
+    del tree
+    partitions.rebuild_partitions()
+    job_indexes.rebuild_indexes()
+    job_search.rebuild_search()
+    rollups.rebuild_rollups()
+    current_values.rebuild_current()
+    mirror.ensure_started()
+    # Wait for the mirror to be healthy and done applying the backfill writes
+    deadline = time.monotonic() + 300
+    events = None
+    while mirror.MIRROR_ENABLED:
+        report = mirror.health_report()
+        settled = [node['events'] for node in report.values()]
+        if all(node['healthy'] for node in report.values()) and settled == events:
+            break
+        if time.monotonic() > deadline:
+            raise RuntimeError('Mirror did not become healthy')
+        events = settled
+        time.sleep(0.5)
+    print(f"Loaded {size} jobs in {time.perf_counter() - started:.1f} s")
+
+
+def _busiest_month():
+    monthly = rollups.get_daily_range()
+    months = {}
+    for day, counters in monthly.items():
+        months[day[:7]] = months.get(day[:7], 0) + counters['jobs']
+    return max(months, key=months.get)
+
+
+def _logged_in_client():
+    client = app.test_client()
+    response = client.post('/login', data={'email': dataset.ADMIN_EMAIL, 'password': dataset.ADMIN_PASSWORD})
+    if response.status_code != 302:
+        raise RuntimeError(f'Benchmark login failed ({response.status_code})')
+    return client
+
+
+def _wait_for_reports(report_ids):
+    deadline = time.monotonic() + REPORT_TIMEOUT
+    builds = []
+    for report_id in report_ids:
+        while True:
+            report = reports.get_report(report_id) or {}
+            if report.get('status') in ('done', 'failed'):
+                builds.append(report.get('updated_at', 0) - report.get('created_at', 0))
+                break
+            if time.monotonic() > deadline:
+                raise RuntimeError(f'Report {report_id} did not finish')
+            time.sleep(0.05)
+    return builds
+
+
+def _routes(month):
+    """(name, endpoint, request kwargs for iteration i) for every benchmarked route."""
+    def report_range(i):
+        # About a year, a day longer every time, so each request misses the report cache and submits a build
+        start = date.today() - timedelta(days=365 + i)
+        return {'query_string': {'start_date': start.isoformat(), 'end_date': date.today().isoformat()}}
+
+    return [
+        ('dashboard', 'dashboard', lambda i: {'path': '/'}),
+        ('jobs', 'jobs', lambda i: {'path': '/jobs'}),
+        ('jobs_month', 'jobs', lambda i: {'path': '/jobs', 'query_string': {'month': month}}),
+        ('generate_report', 'generate_report', lambda i: dict(path='/generate_report', **report_range(i))),
+        ('login', 'login', lambda i: {
+            'path': '/login', 'method': 'POST',
+            'data': {'email': dataset.ADMIN_EMAIL, 'password': dataset.ADMIN_PASSWORD}
+        }),
+    ]
+
+
+def _request(client, kwargs):
+    kwargs = dict(kwargs)
+    path = kwargs.pop('path')
+    method = kwargs.pop('method', 'GET')
+    response = client.open(path, method=method, **kwargs)
+    if response.status_code >= 400:
+        raise RuntimeError(f'{method} {path} returned {response.status_code}')
+    return response
+
+
+def _report_ids(response):
+    # generate_report redirects to the status page of the build it submitted
+    location = response.headers.get('Location', '')
+    return [location.rstrip('/').split('/')[-1]] if '/reports/' in location else []
+
+
+def measure(iterations, month):
+    results = {}
+    for name, endpoint, make_kwargs in _routes(month):
+        # login() sends a signed-in admin straight to the dashboard, so it gets a fresh client every time
+        client_for = app.test_client if endpoint == 'login' else _logged_in_client
+        client = client_for()
+        _wait_for_reports(_report_ids(_request(client, make_kwargs(iterations))))  # warm-up
+
+        count = min(iterations, REPORT_ITERATIONS) if endpoint == 'generate_report' else iterations
+        gc.collect()
+        firebase_metrics.reset()
+        timings, builds = [], []
+        for i in range(count):
+            if endpoint == 'login':
+                client = client_for()
+            started = time.perf_counter()
+            response = _request(client, make_kwargs(i))
+            timings.append((time.perf_counter() - started) * 1000)
+            builds += _wait_for_reports(_report_ids(response))
+        calls = firebase_metrics.call_counts().get(endpoint, 0) / count
+
+        if endpoint == 'login':
+            client = client_for()
+        tracemalloc.start()
+        response = _request(client, make_kwargs(iterations + 1))
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        _wait_for_reports(_report_ids(response))
+
+        timings.sort()
+        results[name] = {
+            'p50_ms': round(statistics.median(timings), 2),
+            'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 2),
+            'peak_kb': round(peak / 1024),
+            'calls_per_request': round(calls, 2),
+        }
+        if builds:
+            results[name]['build_p50_s'] = round(statistics.median(builds), 2)
+    return results
+
+
+def compare(size, results, baseline):
+    """Returns the regressions of one size against the baseline, as readable strings."""
+    problems = []
+    for name, current in results.items():
+        previous = baseline.get(size, {}).get(name)
+        if previous is None:
+            continue
+        limit = previous['p95_ms'] * (1 + LATENCY_TOLERANCE) + LATENCY_SLACK_MS
+        if current['p95_ms'] > limit:
+            problems.append(f"{size} {name}: p95 {current['p95_ms']} ms > {limit:.1f} ms")
+        if current['calls_per_request'] > previous['calls_per_request']:
+            problems.append(f"{size} {name}: {current['calls_per_request']} calls/request "
+                            f"> {previous['calls_per_request']}")
+        limit = previous['peak_kb'] * (1 + MEMORY_TOLERANCE) + MEMORY_SLACK_KB
+        if current['peak_kb'] > limit:
+            problems.append(f"{size} {name}: peak {current['peak_kb']} KB > {limit:.0f} KB")
+    return problems
+
+
+def _print_table(size, results):
+    print(f"{'route':<16} {'p50 ms':>9} {'p95 ms':>9} {'peak KB':>9} {'calls/req':>10}")
+    for name, row in results.items():
+        extra = f"  (build p50 {row['build_p50_s']} s)" if 'build_p50_s' in row else ''
+        print(f"{name:<16} {row['p50_ms']:>9} {row['p95_ms']:>9} {row['peak_kb']:>9} "
+              f"{row['calls_per_request']:>10}{extra}")
+    print(f"peak RSS so far: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--iterations', type=int, default=DEFAULT_ITERATIONS)
+    parser.add_argument('--years', type=int, default=dataset.DEFAULT_YEARS)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every database call')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--update-baseline', action='store_true')
+    args = parser.parse_args()
+
+    try:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+    except FileNotFoundError:
+        baseline = {}
+
+    problems, measured = [], {}
+    try:
+        for size in args.sizes:
+            firebase_config.fake_db.latency = 0.0
+            _load(size, args.years)
+            firebase_config.fake_db.latency = args.latency
+            current_values.invalidate()
+            print(f"--- {size} jobs (latency {args.latency * 1000:g} ms/call) ---")
+            # Baselines are kept per size, injected latency and mirror setting (FIREBASE_MIRROR=0)
+            key = str(size) + (f'@{args.latency:g}s' if args.latency else '')
+            key += '' if mirror.MIRROR_ENABLED else '-nomirror'
+            measured[key] = results = measure(args.iterations, _busiest_month())
+            _print_table(size, results)
+            problems += compare(key, results, baseline)
+    finally:
+        reports._get_process_pool().shutdown()
+        shutil.rmtree(SCRATCH_DIR, ignore_errors=True)
+
+    if args.update_baseline:
+        baseline.update(measured)
+        with open(args.baseline, 'w') as baseline_file:
+            json.dump(baseline, baseline_file, indent=2, sort_keys=True)
+            baseline_file.write('\n')
+        print(f"Baseline written to {args.baseline}")
+        return 0
+    if problems:
+        print('Regressions against the baseline:')
+        for problem in problems:
+            print(f'  {problem}')
+        return 1
+    print('No regressions against the baseline.' if baseline else 'No baseline yet (run with --update-baseline).')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,187 @@
+"""
+Synthetic Realtime Database contents for benchmarks.
+
+``generate(jobs)`` builds the source nodes the admin app and the kiosk write
+(print_jobs, print_job_details, print_prices, printer_status, admins) with
+realistic variety: admin uploads and kiosk uploads mixed, one to three
+details per job, completed/cancelled/pending statuses, colored and
+black-and-white prints, and creation times spread over several years up to
+today. Push keys are backdated to each job's creation time, as on the server.
+Derived nodes (day partitions, rollups, current/ pointers) are not included;
+load the tree and run the usual backfills, as the benchmark runner does.
+
+Usage: python benchmarks/dataset.py JOBS [OUT.json]   (for PRINTECH_FAKE_DB_SEED)
+"""
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+import bcrypt
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_rtdb import PushIdGenerator  # noqa: E402
+
+# Login used by the benchmark runner
+ADMIN_EMAIL = 'bench@printech.local'
+ADMIN_PASSWORD = 'benchmark'
+
+DEFAULT_YEARS = 3
+
+# Share of jobs uploaded from the kiosk (the rest come from the admin upload page)
+KIOSK_SHARE = 0.3
+DETAIL_STATUSES = (('complete', 0.7), ('cancelled', 0.15), ('pending', 0.15))
+COLOR_SHARE = 0.35
+PRICE_CHANGES = 4
+FILE_DATA_BYTES = 256
+
+
+def _pick(rng, weighted):
+    roll, total = rng.random(), 0.0
+    for value, weight in weighted:
+        total += weight
+        if roll < total:
+            return value
+    return weighted[-1][0]
+
+
+def _creation_times(rng, jobs, years, now):
+    """Creation times (epoch seconds, ascending) between ``years`` ago and now, during opening hours."""
+    first_day = (now - timedelta(days=365 * years)).date()
+    days = (now.date() - first_day).days + 1
+    times = []
+    for _ in range(jobs):
+        day = first_day + timedelta(days=rng.randrange(days))
+        moment = datetime(day.year, day.month, day.day, rng.randint(8, 19), rng.randrange(60), rng.randrange(60))
+        times.append(min(moment, now).timestamp())
+    times.sort()
+    return times
+
+
+def _details(rng, file_name, total_pages, prices, created_at):
+    details = []
+    for _ in range(rng.choice((1, 1, 1, 2, 2, 3))):
+        color_mode = 'colored' if rng.random() < COLOR_SHARE else 'bw'
+        pages = rng.randint(1, total_pages)
+        price = pages * prices['color_price' if color_mode == 'colored' else 'black_price']
+        status = _pick(rng, DETAIL_STATUSES)
+        details.append({
+            'file_name': file_name,
+            'pages_to_print': pages,
+            'color_mode': color_mode,
+            'total_price': price,
+            'inserted_amount': price + rng.choice((0, 0, 0, 1, 5)) if status == 'complete' else 0,
+            'status': status,
+            'created_at': created_at,
+        })
+    return details
+
+
+def generate(jobs, years=DEFAULT_YEARS, seed=17, now=None, file_data_bytes=FILE_DATA_BYTES):
+    """
+    Builds a database tree with ``jobs`` print jobs.
+    Args:
+        jobs (int): Number of print_jobs entries.
+        years (int): How far back creation times go.
+        seed (int): Random seed; the same arguments give the same tree (apart from ``now``).
+        now (datetime, optional): The newest possible creation time (defaults to now).
+        file_data_bytes (int): Size of the stand-in base64 payload of kiosk uploads.
+    Returns:
+        dict: {'print_jobs', 'print_job_details', 'print_prices', 'printer_status', 'admins'}.
+    """
+    rng = random.Random(seed)
+    now = now or datetime.now()
+    keys = PushIdGenerator()
+    times = _creation_times(rng, jobs, years, now)
+
+    # Prices change a few times over the period; each job is charged the prices of its time
+    start = times[0] if times else now.timestamp()
+    price_times = sorted(rng.uniform(start, now.timestamp()) for _ in range(PRICE_CHANGES - 1))
+    price_history = [(start - 1, {'black_price': 2, 'color_price': 4})]
+    for index, changed_at in enumerate(price_times):
+        price_history.append((changed_at, {'black_price': 2 + (index + 1) // 2, 'color_price': 4 + index + 1}))
+    print_prices = {
+        keys.next(at): dict(prices, updated_at=datetime.fromtimestamp(at).strftime('%Y-%m-%d %H:%M:%S'))
+        for at, prices in price_history
+    }
+
+    file_data = 'J' * file_data_bytes
+    print_jobs, print_job_details, printer_status = {}, {}, {}
+    price_index, remaining_paper, last_status_day = 0, 500, None
+    for index, created_at in enumerate(times):
+        while price_index + 1 < len(price_history) and price_history[price_index + 1][0] <= created_at:
+            price_index += 1
+        prices = price_history[price_index][1]
+        job_id = keys.next(created_at)
+        total_pages = rng.randint(1, 40)
+        stamp = datetime.fromtimestamp(created_at).strftime('%Y-%m-%d %H:%M:%S')
+        if rng.random() < KIOSK_SHARE:
+            file_name = f'scan_{index:07d}.pdf'
+            details = _details(rng, file_name, total_pages, prices, stamp)
+            print_jobs[job_id] = {
+                'document_name': file_name,
+                'document_size': 20_000 + total_pages * 35_000,
+                'file_data': file_data,
+                'status': details[0]['status'],
+                'total_pages': total_pages,
+                'created_at': created_at,
+            }
+            detail = details[0]
+            print_job_details[job_id] = {
+                'file_name': file_name,
+                'total_pages': total_pages,
+                'pages_to_print': detail['pages_to_print'],
+                'color_mode': detail['color_mode'],
+                'total_price': detail['total_price'],
+                'inserted_amount': detail['inserted_amount'],
+                'status': detail['status'],
+                'created_at': created_at,
+                'updated_at': created_at + rng.randint(30, 600),
+            }
+        else:
+            file_name = f'document_{index:07d}.{rng.choice(("pdf", "pdf", "docx"))}'
+            print_jobs[job_id] = {
+                'file_name': file_name,
+                'file_size': 20_000 + total_pages * 35_000,
+                'total_pages': total_pages,
+                'status': 'pending',
+                'created_at': stamp,
+                'created_at_ts': created_at,
+                'local_path': f'uploads/{file_name}',
+                'details': _details(rng, file_name, total_pages, prices, stamp),
+            }
+
+        # One paper count per day with jobs; refilled whenever it runs low
+        day = stamp[:10]
+        used = sum(detail['pages_to_print'] for detail in print_jobs[job_id].get('details', []))
+        remaining_paper -= used or total_pages
+        if remaining_paper < 50:
+            remaining_paper = 500
+            printer_status[keys.next(created_at)] = {'remaining_paper': 500, 'updated_at': stamp, 'refill': True}
+        elif day != last_status_day:
+            printer_status[keys.next(created_at)] = {'remaining_paper': remaining_paper, 'updated_at': stamp}
+        last_status_day = day
+
+    password_hash = bcrypt.hashpw(ADMIN_PASSWORD.encode('utf-8'), bcrypt.gensalt(12)).decode('utf-8')
+    admins = {keys.next(start - 2): {'username': 'bench', 'email': ADMIN_EMAIL, 'password_hash': password_hash}}
+    return {
+        'print_jobs': print_jobs,
+        'print_job_details': print_job_details,
+        'print_prices': print_prices,
+        'printer_status': printer_status,
+        'admins': admins,
+    }
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        sys.exit(__doc__.strip().splitlines()[-1])
+    started = time.perf_counter()
+    tree = generate(int(sys.argv[1]))
+    out_path = sys.argv[2] if len(sys.argv) > 2 else f'printech_{sys.argv[1]}.json'
+    with open(out_path, 'w') as out_file:
+        json.dump(tree, out_file)
+    print(f"Wrote {len(tree['print_jobs'])} jobs to {out_path} in {time.perf_counter() - started:.1f} s")
@@ -0,0 +1,78 @@
+"""
+Memory held per job table row: plain dicts against job_records.JobRow.
+
+Generates JOBS synthetic jobs, round-trips them through JSON as the Firebase
+client decodes them (so every string is its own object), builds the table
+rows the way the dashboard and /jobs used to (one ten-key dict per detail)
+and with JobRow, drops the source jobs, as the live feed does, and reports
+the bytes still allocated per row (tracemalloc):
+
+    python benchmarks/job_rows_memory.py            # 100,000 jobs
+    python benchmarks/job_rows_memory.py --jobs 20000
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import dataset  # noqa: E402
+import job_records  # noqa: E402
+
+
+def dict_rows(job_id, job):
+    # The row dicts app.jobs() and the live feed built before JobRow
+    created_at = job.get('created_at', '')
+    return [
+        {
+            'id': detail.get('id', ''),
+            'job_id': job_id,
+            'file_name': detail.get('file_name', ''),
+            'status': detail.get('status', ''),
+            'created_at': created_at,
+            'pages_to_print': detail.get('pages_to_print', 0),
+            'color_mode': detail.get('color_mode', ''),
+            'total_price': float(detail.get('total_price', 0)),
+            'inserted_amount': float(detail.get('inserted_amount', 0)),
+            'total_pages': detail.get('total_pages', 0)
+        }
+        for detail in job.get('details', [])
+    ]
+
+
+def retained(encoded_jobs, build):
+    """Returns (rows, bytes still allocated once the decoded jobs are gone)."""
+    gc.collect()
+    tracemalloc.start()
+    jobs = json.loads(encoded_jobs)
+    rows = [row for job_id, job in jobs.items() for row in build(job_id, job)]
+    del jobs
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return len(rows), size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--jobs', type=int, default=100_000)
+    args = parser.parse_args()
+
+    print_jobs = dataset.generate(args.jobs, file_data_bytes=0)['print_jobs']
+    encoded_jobs = json.dumps(print_jobs)
+    del print_jobs
+
+    results = {}
+    for name, build in (('dict', dict_rows), ('JobRow', job_records.job_rows)):
+        count, size = retained(encoded_jobs, build)
+        results[name] = size / count
+        print(f"{name:<8} {count} rows  {size / 1024 / 1024:8.1f} MB  {size / count:7.1f} bytes per row")
+    print(f"JobRow holds {1 - results['JobRow'] / results['dict']:.0%} less per row")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark for the sales report PDF builder.
+
+Renders synthetic reports of 10k and 100k completed rows through
+reports.render_report() and prints build time, page count and peak RSS
+of the coordinator and of the worker processes. No Firebase access is needed.
+
+Usage: python benchmarks/report_builder.py [rows ...]
+"""
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import reports  # noqa: E402
+
+DEFAULT_SIZES = (10_000, 100_000)
+
+# Synthetic jobs are spread over this many days, so 100k rows cover about 12 monthly sections
+SPAN_DAYS = 365
+
+
+def synthetic_sections(total_rows, seed=7):
+    """Yields (YYYY-MM, rows) sections like reports.iter_report_sections(), one month at a time."""
+    rng = random.Random(seed)
+    first_day = date(2025, 1, 1)
+    per_day = max(total_rows // SPAN_DAYS, 1)
+    month, rows, produced = None, [], 0
+    for offset in range(SPAN_DAYS):
+        day = (first_day + timedelta(days=offset)).isoformat()
+        if month is not None and day[:7] != month and rows:
+            yield month, rows
+            rows = []
+        month = day[:7]
+        count = per_day if offset < SPAN_DAYS - 1 else total_rows - produced
+        for index in range(count):
+            rows.append({
+                'file_name': f'document_{offset:03d}_{index:04d}.pdf',
+                'color_mode': rng.choice(('colored', 'bw')),
+                'total_price': float(rng.randint(1, 40)),
+                'created_at': day
+            })
+        produced += count
+    if rows:
+        yield month, rows
+
+
+def _peak_rss_mb(who):
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(who).ru_maxrss / 1024
+
+
+def reports_logo():
+    return os.path.join(os.path.dirname(os.path.abspath(reports.__file__)), 'static', 'logo.jpg')
+
+
+def run(total_rows, out_dir):
+    out_path = os.path.join(out_dir, f'report_{total_rows}.pdf')
+    started = time.perf_counter()
+    summary = reports.render_report(synthetic_sections(total_rows), reports_logo(), out_path)
+    elapsed = time.perf_counter() - started
+
+    import pymupdf
+    with pymupdf.open(out_path) as doc:
+        pages = doc.page_count
+    print(f"{total_rows:>8} rows  {elapsed:7.2f} s  {pages:>5} pages  "
+          f"{os.path.getsize(out_path) / 1024 / 1024:6.1f} MB  (summary rows: {summary['total_jobs']})")
+
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES
+    with tempfile.TemporaryDirectory() as out_dir:
+        for size in sizes:
+            run(size, out_dir)
+        # Worker peak RSS is only reported for children that have exited
+        reports._get_process_pool().shutdown()
+    print(f"peak RSS: coordinator {_peak_rss_mb(resource.RUSAGE_SELF):.0f} MB, "
+          f"largest worker {_peak_rss_mb(resource.RUSAGE_CHILDREN):.0f} MB")
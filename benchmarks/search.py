@@ -0,0 +1,125 @@
+"""
+Benchmark of the file-name prefix search at a million jobs.
+
+Loads JOBS minimal jobs (file name and creation time) with realistic names
+into the in-process fake database, with the job_search index, and into a
+scratch SQLite file, then times first pages and next pages of searches for
+random prefixes of one to eight characters taken from the stored names:
+
+    python benchmarks/search.py                 # 1,000,000 jobs
+    python benchmarks/search.py --jobs 100000 --iterations 500
+
+The fake answers key range queries from a sorted key list, as the server
+does, so the numbers are the cost of the index and of this code, without the
+network round trip of the live database.
+"""
+import argparse
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SCRATCH_DIR = tempfile.mkdtemp(prefix='printech-search-')
+os.environ['PRINTECH_FIREBASE'] = 'fake'
+os.environ['FIREBASE_MIRROR'] = '0'
+
+import firebase_config  # noqa: E402
+import job_search  # noqa: E402
+import pagination  # noqa: E402
+import repository  # noqa: E402
+from fake_rtdb import PushIdGenerator  # noqa: E402
+
+WORDS = (
+    'invoice', 'report', 'thesis', 'resume', 'letter', 'receipt', 'module', 'chapter', 'final', 'draft',
+    'scan', 'form', 'application', 'certificate', 'memo', 'syllabus', 'reviewer', 'lab', 'activity', 'quiz',
+)
+EXTENSIONS = ('pdf', 'pdf', 'pdf', 'docx', 'doc')
+PAGE_SIZE = 10
+
+
+def file_names(rng, count):
+    for index in range(count):
+        words = rng.sample(WORDS, rng.randint(1, 3))
+        if rng.random() < 0.5:
+            words.append(str(rng.randint(1, 2025)))
+        separator = rng.choice(('_', ' ', '-'))
+        yield f"{separator.join(word.title() if rng.random() < 0.3 else word for word in words)}_{index}." \
+              f"{rng.choice(EXTENSIONS)}"
+
+
+def load(jobs, seed=3):
+    rng = random.Random(seed)
+    keys = PushIdGenerator()
+    now = time.time()
+    started = time.perf_counter()
+    print_jobs, search_index, names = {}, {}, []
+    for index, name in enumerate(file_names(rng, jobs)):
+        created_at = now - (jobs - index) * 60
+        job_id = keys.next(created_at)
+        job = {'file_name': name, 'created_at_ts': created_at, 'status': 'pending'}
+        print_jobs[job_id] = job
+        search_index[job_search.search_key(job_id, job)] = created_at
+        names.append(name)
+    firebase_config.fake_db.load({'print_jobs': print_jobs, job_search.SEARCH_PATH: search_index})
+    print(f"Loaded {jobs} jobs into the fake database in {time.perf_counter() - started:.1f} s")
+
+    started = time.perf_counter()
+    sqlite_repo = repository.SQLiteRepository(os.path.join(SCRATCH_DIR, 'search.db'))
+    with sqlite_repo._connect() as conn:
+        for job_id, job in print_jobs.items():
+            sqlite_repo._store_job(conn, job_id, job, version=1)
+    print(f"Loaded {jobs} jobs into SQLite in {time.perf_counter() - started:.1f} s")
+    return names, sqlite_repo
+
+
+def measure(search, prefixes):
+    firsts, nexts, hits = [], [], 0
+    for prefix in prefixes:
+        started = time.perf_counter()
+        rows, _, next_token, _ = search(prefix, PAGE_SIZE, None)
+        firsts.append((time.perf_counter() - started) * 1000)
+        hits += len(rows)
+        if next_token:
+            started = time.perf_counter()
+            search(prefix, PAGE_SIZE, pagination.decode_cursor(next_token))
+            nexts.append((time.perf_counter() - started) * 1000)
+    return firsts, nexts, hits / len(prefixes)
+
+
+def _percentiles(timings):
+    timings = sorted(timings)
+    if not timings:
+        return 'n/a'
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    return f"p50 {statistics.median(timings):6.2f} ms  p95 {p95:6.2f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--jobs', type=int, default=1_000_000)
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+
+    try:
+        names, sqlite_repo = load(args.jobs)
+        rng = random.Random(11)
+        prefixes = [name[:rng.randint(1, 8)] for name in rng.sample(names, args.iterations)]
+        # The fake builds its sorted key list on the first query after a write, as a server keeps its index
+        job_search.search('warm up', PAGE_SIZE)
+
+        for backend, search in (('firebase (fake)', job_search.search), ('sqlite', sqlite_repo.search_jobs)):
+            firsts, nexts, hits = measure(search, prefixes)
+            print(f"{backend:<16} first page {_percentiles(firsts)}   next page {_percentiles(nexts)}   "
+                  f"({hits:.1f} jobs per first page)")
+    finally:
+        shutil.rmtree(SCRATCH_DIR, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
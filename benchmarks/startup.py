@@ -0,0 +1,134 @@
+"""
+Cold-start budget of the admin app.
+
+Starts RUNS fresh Python processes on the fake database; each one imports
+app.py and serves its first request (the login page, which is what a user
+waits on after the host starts the app). Reports the median import time and
+first-request time, and the heavy modules already loaded after the import
+(ReportLab, NumPy, PyMuPDF, python-docx, the Firebase SDK), which only the
+routes that need them should load.
+
+The run exits with status 1 when a heavy module is loaded at import or a
+median goes over the committed budget (startup_baseline.json next to this
+file) by more than the tolerance:
+
+    python benchmarks/startup.py
+    python benchmarks/startup.py --update-baseline   # accept the current numbers
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'startup_baseline.json')
+
+DEFAULT_RUNS = 7
+
+# Allowed growth over the baseline: relative, plus an absolute slack for timer noise on small numbers
+TOLERANCE = 0.25
+SLACK_MS = 30
+
+# Top-level packages that must not be loaded by importing the app
+HEAVY_MODULES = ('reportlab', 'numpy', 'fitz', 'pymupdf', 'docx', 'pypandoc', 'firebase_admin', 'google.auth')
+
+# Runs in the child process; prints one JSON line
+_CHILD = """
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+heavy = sorted(name for name in HEAVY_MODULES if name in sys.modules)
+response = app.app.test_client().get('/login')
+served = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'first_request_ms': (served - imported) * 1000,
+    'status': response.status_code,
+    'heavy': heavy,
+}))
+"""
+
+
+def run_once(scratch_dir):
+    env = dict(
+        os.environ,
+        PRINTECH_FIREBASE='fake',
+        PRINTECH_STORAGE='firebase',
+        PRINTECH_REPORTS_DIR=os.path.join(scratch_dir, 'reports'),
+        PRINTECH_ARCHIVE_DIR=os.path.join(scratch_dir, 'archive'),
+        PRINTECH_PROFILES_DIR=os.path.join(scratch_dir, 'profiles'),
+        PRINTECH_TEMPLATE_CACHE_DIR=os.path.join(scratch_dir, 'templates'),
+    )
+    code = f"HEAVY_MODULES = {HEAVY_MODULES!r}\n{_CHILD}"
+    output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env, check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=DEFAULT_RUNS)
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--update-baseline', action='store_true')
+    args = parser.parse_args()
+
+    scratch_dir = tempfile.mkdtemp(prefix='printech-startup-')
+    try:
+        # The first run compiles the templates into the cache; later runs start like a restarted host
+        cold = run_once(scratch_dir)
+        runs = [run_once(scratch_dir) for _ in range(args.runs)]
+    finally:
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+
+    results = {
+        'import_ms': round(statistics.median(run['import_ms'] for run in runs), 1),
+        'first_request_ms': round(statistics.median(run['first_request_ms'] for run in runs), 1),
+    }
+    print(f"import app       {results['import_ms']:8.1f} ms (median of {args.runs})")
+    print(f"first request    {results['first_request_ms']:8.1f} ms "
+          f"(first run, templates not yet compiled: {cold['first_request_ms']:.1f} ms)")
+
+    problems = []
+    heavy = sorted({name for run in [cold] + runs for name in run['heavy']})
+    if heavy:
+        problems.append(f"loaded at import: {', '.join(heavy)}")
+    if any(run['status'] != 200 for run in runs):
+        problems.append('the login page did not answer 200')
+
+    if args.update_baseline:
+        if problems:
+            print('Not writing a baseline:', '; '.join(problems))
+            return 1
+        with open(args.baseline, 'w') as baseline_file:
+            json.dump(results, baseline_file, indent=2, sort_keys=True)
+            baseline_file.write('\n')
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    try:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+    except FileNotFoundError:
+        baseline = {}
+    for name, value in results.items():
+        if name in baseline:
+            limit = baseline[name] * (1 + TOLERANCE) + SLACK_MS
+            if value > limit:
+                problems.append(f"{name}: {value} ms > {limit:.1f} ms")
+
+    if problems:
+        print('Startup over budget:')
+        for problem in problems:
+            print(f'  {problem}')
+        return 1
+    print('Startup within budget.' if baseline else 'No baseline yet (run with --update-baseline).')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
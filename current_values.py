@@ -0,0 +1,176 @@
+"""
+Current-value pointer nodes for prices and paper level.
+
+``print_prices`` and ``printer_status`` are append-only histories. Every write
+through this module also stores the newest row under ``current/``:
+
+    current/prices       {black_price, color_price, updated_at}
+    current/paper        {remaining_paper, updated_at}
+    current/last_refill  {remaining_paper, updated_at}
+
+so the dashboard reads three small nodes instead of downloading and sorting
+the histories. Reads go through a short TTL cache that is dropped on every
+local write; writes made by another process (e.g. the kiosk) show up once
+the TTL has passed. That is fine for display, but the kiosk's paper count
+must not go stale: ``use_paper()`` decrements current/paper in a
+transaction instead of writing back a cached read.
+"""
+import os
+import threading
+import time
+
+from firebase_config import db
+
+CURRENT_PATH = 'current'
+
+# How long a pointer read is served from memory
+CURRENT_CACHE_TTL = float(os.environ.get('PRINTECH_CURRENT_CACHE_TTL', 10))
+
+DEFAULT_PRICES = {'black_price': 3, 'color_price': 5}
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def invalidate(name=None):
+    """Drops one cached pointer (or all of them) so the next read goes to Firebase."""
+    with _cache_lock:
+        if name is None:
+            _cache.clear()
+        else:
+            _cache.pop(name, None)
+
+
+def _latest(history_path, child, where=None):
+    """Newest row of a history node, for pointers that have not been written yet."""
+    rows = db.reference(history_path).order_by_child(child).limit_to_last(25 if where else 1).get() or {}
+    rows = list(rows.values()) if isinstance(rows, dict) else [row for row in rows if row]
+    rows = [row for row in rows if isinstance(row, dict) and (where is None or where(row))]
+    return rows[-1] if rows else None
+
+
+def _fallback(name):
+    if name == 'prices':
+        return _latest('print_prices', 'updated_at')
+    if name == 'paper':
+        return _latest('printer_status', 'updated_at')
+    return _latest('printer_status', 'updated_at', where=lambda row: row.get('refill'))
+
+
+def _read(name):
+    now = time.monotonic()
+    with _cache_lock:
+        cached = _cache.get(name)
+        if cached and cached[0] > now:
+            return cached[1]
+    value = db.reference(f'{CURRENT_PATH}/{name}').get()
+    if value is None:
+        value = _fallback(name)
+    with _cache_lock:
+        _cache[name] = (now + CURRENT_CACHE_TTL, value)
+    return value
+
+
+def get_prices():
+    """Returns {'black_price', 'color_price', 'updated_at'} for the newest price row (defaults if none)."""
+    prices = dict(DEFAULT_PRICES)
+    prices.update(_read('prices') or {})
+    return prices
+
+
+def get_paper():
+    """Returns {'remaining_paper', 'updated_at'} for the newest printer status row, or None."""
+    return _read('paper')
+
+
+def get_last_refill():
+    """Returns {'remaining_paper', 'updated_at'} for the newest refill, or None."""
+    return _read('last_refill')
+
+
+def set_prices(black_price, color_price, updated_at):
+    """Appends a price row to print_prices and points current/prices at it."""
+    row = {'black_price': black_price, 'color_price': color_price, 'updated_at': updated_at}
+    db.reference('print_prices').push(row)
+    db.reference(f'{CURRENT_PATH}/prices').set(row)
+    invalidate('prices')
+    return row
+
+
+def record_paper(remaining_paper, updated_at, refill=False):
+    """
+    Appends a printer status row and updates current/paper (and current/last_refill for a refill).
+    Args:
+        remaining_paper (int): Sheets left in the printer.
+        updated_at (str or float): When the count was taken.
+        refill (bool): True when the count comes from an admin refill.
+    """
+    row = {'remaining_paper': remaining_paper, 'updated_at': updated_at}
+    if refill:
+        row['refill'] = True
+    db.reference('printer_status').push(row)
+
+    pointers = {'paper': {'remaining_paper': remaining_paper, 'updated_at': updated_at}}
+    if refill:
+        pointers['last_refill'] = {'remaining_paper': remaining_paper, 'updated_at': updated_at}
+    db.reference(CURRENT_PATH).update(pointers)
+    for name in pointers:
+        invalidate(name)
+    return row
+
+
+def use_paper(pages, updated_at):
+    """
+    Takes ``pages`` sheets off current/paper in one transaction, so a refill or another print
+    made meanwhile is never overwritten, and appends the new count to printer_status.
+    Args:
+        pages (int): Sheets about to be printed.
+        updated_at (str or float): When the pages are printed.
+    Returns:
+        tuple: (sheets before, sheets after), with None after when fewer than ``pages`` sheets
+        are left (nothing is written then); None if there is no paper count at all.
+    """
+    seed = None
+    outcome = {}
+
+    def take(current):
+        current = current if current is not None else seed
+        before = (current or {}).get('remaining_paper')
+        outcome.update(before=before, after=None)
+        if before is None or before < pages:
+            return current
+        outcome['after'] = before - pages
+        return {'remaining_paper': outcome['after'], 'updated_at': updated_at}
+
+    ref = db.reference(f'{CURRENT_PATH}/paper')
+    ref.transaction(take)
+    if outcome['before'] is None:
+        # current/paper has not been written yet (see rebuild_current); start from the history
+        seed = _fallback('paper')
+        if seed is not None:
+            ref.transaction(take)
+    invalidate('paper')
+    if outcome['before'] is None:
+        return None
+    if outcome['after'] is not None:
+        db.reference('printer_status').push({'remaining_paper': outcome['after'], 'updated_at': updated_at})
+    return outcome['before'], outcome['after']
+
+
+def rebuild_current():
+    """Backfills the current/ pointers from the print_prices and printer_status histories."""
+    pointers = {}
+    for name in ('prices', 'paper', 'last_refill'):
+        value = _fallback(name)
+        if value is not None:
+            value = {key: item for key, item in value.items() if key != 'refill'}
+            pointers[name] = value
+    if pointers:
+        db.reference(CURRENT_PATH).update(pointers)
+    invalidate()
+    return pointers
+
+
+if __name__ == '__main__':
+    # Backfill: python current_values.py (the Firebase app is initialized by firebase_config)
+    print(f"Current pointers: {rebuild_current()}")
@@ -0,0 +1,355 @@
+"""
+Concurrent fan-out of independent Firebase reads.
+
+A page that needs several unrelated nodes (rollups, a page of jobs, the
+current price) hands them to ``gather()``, which starts them together on one
+bounded, process-wide thread pool and waits for all of them, so the page
+takes about as long as its slowest read instead of the sum of the round trips.
+
+    results = data_access.gather({
+        'totals': rollups.get_totals,
+        'prices': data_access.call(current_values.get_prices, timeout=2),
+    })
+
+Each read has its own timeout, counted from the moment a pool thread starts
+it (a read queued behind others gets as long again to start), so the reads
+of a long ``map_reads()`` do not share one budget. A read that misses it
+raises ReadTimeout. Any other exception of a read is re-raised unchanged by
+``gather()``, so callers keep their existing error handling.
+
+A read tagged with the node it reads (``call(fn, ..., node='rollups/totals')``)
+is also guarded by a circuit breaker for that node and remembered as the last
+good snapshot. When it cannot reach the database (it times out, or raises a
+connection or Firebase error) or its breaker is open, ``gather()`` returns
+that snapshot instead of raising and lists the read in ``results.stale``;
+other exceptions are re-raised and leave the breaker alone. A read that is
+still running keeps going in the background and refreshes the snapshot when
+it lands, and an open breaker is probed in the background once its cool-down
+has passed. Pages therefore stay as fast as the timeout during an upstream
+incident and show a staleness banner.
+"""
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import firebase_metrics
+import profiler
+
+# Threads shared by every request of the process
+MAX_READ_WORKERS = int(os.environ.get('PRINTECH_READ_WORKERS', 16))
+
+# Seconds a single read may take before the page gives up on it
+DEFAULT_READ_TIMEOUT = float(os.environ.get('PRINTECH_READ_TIMEOUT', 10))
+
+# A node's breaker opens after this many failures in a row and stays open this many seconds
+BREAKER_FAILURES = int(os.environ.get('PRINTECH_BREAKER_FAILURES', 3))
+BREAKER_RESET_SECONDS = float(os.environ.get('PRINTECH_BREAKER_RESET', 30))
+
+# Last good snapshots kept for stale-while-revalidate
+MAX_SNAPSHOTS = int(os.environ.get('PRINTECH_MAX_SNAPSHOTS', 256))
+
+_pool = ThreadPoolExecutor(max_workers=MAX_READ_WORKERS, thread_name_prefix='read')
+_local = threading.local()
+
+
+class ReadTimeout(TimeoutError):
+    """Raised when a read started by gather() does not finish within its timeout."""
+
+    def __init__(self, name, timeout):
+        super().__init__(f"Read '{name}' timed out after {timeout:g} s")
+        self.name = name
+        self.timeout = timeout
+
+
+class CircuitOpen(RuntimeError):
+    """Raised when a node's breaker is open and there is no snapshot to fall back to."""
+
+    def __init__(self, node):
+        super().__init__(f"Firebase reads of '{node}' are paused after repeated failures")
+        self.node = node
+
+
+class CircuitBreaker:
+    """Per-node breaker: closed -> open after BREAKER_FAILURES failures -> one probe after the cool-down."""
+
+    def __init__(self, node, failures=BREAKER_FAILURES, reset_seconds=BREAKER_RESET_SECONDS):
+        self.node = node
+        self.failure_threshold = failures
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        return 'half_open' if time.monotonic() - self.opened_at >= self.reset_seconds else 'open'
+
+    def allow(self):
+        """True if a read may go out now; while open, only one probe per cool-down is let through."""
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half_open' and not self.probing:
+                self.probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.probing or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self.probing = False
+
+    def release_probe(self):
+        """Lets the next read probe again, without counting the last one either way."""
+        with self._lock:
+            self.probing = False
+
+
+# Exceptions that mean the database could not be reached, by module; looked up only if already loaded
+_TRANSPORT_ERRORS = (
+    ('firebase_admin.exceptions', 'FirebaseError'),
+    ('requests.exceptions', 'ConnectionError'),
+    ('requests.exceptions', 'Timeout'),
+)
+
+
+def is_transport_failure(err):
+    """
+    True if a read failed because the database was slow or unreachable. Anything else (a bug, a bad
+    argument) says nothing about the node, so it neither trips the breaker nor falls back to a snapshot.
+    """
+    if isinstance(err, (FutureTimeout, TimeoutError, ConnectionError)):
+        return True
+    for module_name, name in _TRANSPORT_ERRORS:
+        module = sys.modules.get(module_name)
+        if module is not None and isinstance(err, getattr(module, name)):
+            return True
+    return False
+
+
+_breakers = {}
+_snapshots = OrderedDict()  # cache key -> (value, monotonic time, wall time)
+_state_lock = threading.Lock()
+
+
+def breaker(node):
+    """The circuit breaker of a node path (created on first use)."""
+    with _state_lock:
+        if node not in _breakers:
+            _breakers[node] = CircuitBreaker(node)
+        return _breakers[node]
+
+
+def breaker_report():
+    """{node: {'state', 'failures'}} for every node with a breaker."""
+    with _state_lock:
+        breakers = list(_breakers.values())
+    return {item.node: {'state': item.state, 'failures': item.failures} for item in breakers}
+
+
+def _remember(key, value):
+    with _state_lock:
+        _snapshots[key] = (value, time.monotonic(), time.time())
+        _snapshots.move_to_end(key)
+        while len(_snapshots) > MAX_SNAPSHOTS:
+            _snapshots.popitem(last=False)
+
+
+def _snapshot(key):
+    with _state_lock:
+        return _snapshots.get(key)
+
+
+class Results(dict):
+    """gather() results; ``stale`` maps the names served from a snapshot to the snapshot's wall time."""
+
+    def __init__(self):
+        super().__init__()
+        self.stale = {}
+
+    @property
+    def stale_since(self):
+        """Wall time of the oldest snapshot served, or None if every read is fresh."""
+        return min(self.stale.values()) if self.stale else None
+
+
+class Call:
+    """A read to run with gather(): a callable, its arguments and an optional timeout."""
+    __slots__ = ('fn', 'args', 'kwargs', 'timeout', 'node', 'route', 'sampler', 'submitted', 'started')
+
+    def __init__(self, fn, args=(), kwargs=None, timeout=None, node=None):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs or {}
+        self.timeout = timeout
+        self.node = node
+        # Pool threads have no request context, so the caller's route label is carried over
+        self.route = firebase_metrics.current_route()
+        # ...and so is the profiler of a request captured with ?profile=1 (None otherwise)
+        self.sampler = profiler.current()
+        self.submitted = self.started = None
+
+    def submit(self):
+        self.submitted = time.monotonic()
+        return _pool.submit(self.run)
+
+    def run(self):
+        self.started = time.monotonic()
+        _local.in_pool = True
+        try:
+            with firebase_metrics.route_label(self.route), profiler.attach(self.sampler):
+                return self.fn(*self.args, **self.kwargs)
+        finally:
+            _local.in_pool = False
+
+    @property
+    def cache_key(self):
+        return f"{self.fn.__module__}.{self.fn.__qualname__}{self.args!r}{sorted(self.kwargs.items())!r}"
+
+
+def call(fn, *args, timeout=None, node=None, **kwargs):
+    """
+    Wraps a read with its arguments for gather().
+    Args:
+        timeout (float, optional): Per-call timeout.
+        node (str, optional): Node path the read depends on; enables the breaker and snapshot fallback.
+    """
+    return Call(fn, args, kwargs, timeout, node)
+
+
+def _result(item, future, limit):
+    """
+    Waits for a read until ``limit`` seconds after a pool thread started it. A read that is
+    still queued when ``limit`` seconds have passed since it was submitted times out too.
+    """
+    while True:
+        started = item.started
+        deadline = (item.submitted if started is None else started) + limit
+        try:
+            return future.result(timeout=max(deadline - time.monotonic(), 0))
+        except FutureTimeout:
+            if item.started is started:
+                raise
+            # It started while we waited; its own budget starts now
+
+
+def _refresh_when_done(item, future, probe=False):
+    """
+    Lets a read the page did not wait for refresh the snapshot when it lands. Only a breaker
+    probe closes (or re-opens) the breaker: a read that lands after its timeout was still too slow.
+    """
+    key, node_breaker = item.cache_key, breaker(item.node)
+
+    def done(finished):
+        if finished.cancelled():
+            return
+        error = finished.exception()
+        if error is None:
+            _remember(key, finished.result())
+        if not probe:
+            return
+        if error is None:
+            node_breaker.record_success()
+        elif is_transport_failure(error):
+            node_breaker.record_failure()
+        else:
+            node_breaker.release_probe()
+
+    future.add_done_callback(done)
+
+
+def gather(calls, timeout=None):
+    """
+    Runs independent reads concurrently and joins their results.
+    Args:
+        calls (dict): Name -> callable or Call.
+        timeout (float, optional): Timeout for calls without their own (DEFAULT_READ_TIMEOUT if omitted).
+    Returns:
+        Results: Name -> result, in the order of ``calls``; ``.stale`` lists snapshot fallbacks.
+    Raises:
+        ReadTimeout: If a read takes longer than its timeout (and has no snapshot).
+        CircuitOpen: If a read's breaker is open (and it has no snapshot).
+    """
+    default_timeout = DEFAULT_READ_TIMEOUT if timeout is None else timeout
+    calls = {name: item if isinstance(item, Call) else Call(item) for name, item in calls.items()}
+    results = Results()
+
+    # A read that fans out again runs its reads inline, so nested batches cannot exhaust the pool
+    if getattr(_local, 'in_pool', False) or (len(calls) <= 1 and not any(item.node for item in calls.values())):
+        results.update({name: item.fn(*item.args, **item.kwargs) for name, item in calls.items()})
+        return results
+
+    futures = {}
+    for name, item in calls.items():
+        if item.node is None:
+            futures[name] = item.submit()
+            continue
+        snapshot = _snapshot(item.cache_key)
+        if not breaker(item.node).allow():
+            if snapshot is None:
+                raise CircuitOpen(item.node)
+            results[name], results.stale[name] = snapshot[0], snapshot[2]
+            continue
+        future = item.submit()
+        if breaker(item.node).state == 'half_open' and snapshot is not None:
+            # The probe runs in the background; this page is served from the snapshot right away
+            _refresh_when_done(item, future, probe=True)
+            results[name], results.stale[name] = snapshot[0], snapshot[2]
+            continue
+        futures[name] = future
+
+    try:
+        for name, future in futures.items():
+            item = calls[name]
+            limit = item.timeout if item.timeout is not None else default_timeout
+            try:
+                results[name] = _result(item, future, limit)
+            except Exception as err:
+                if item.node is None:
+                    if isinstance(err, FutureTimeout):
+                        raise ReadTimeout(name, limit) from None
+                    raise
+                if not is_transport_failure(err):
+                    breaker(item.node).release_probe()
+                    raise
+                breaker(item.node).record_failure()
+                snapshot = _snapshot(item.cache_key)
+                if isinstance(err, FutureTimeout):
+                    _refresh_when_done(item, future)
+                if snapshot is None:
+                    if isinstance(err, FutureTimeout):
+                        raise ReadTimeout(name, limit) from None
+                    raise
+                print(f"Serving stale '{name}' ({item.node}): {type(err).__name__}: {err}")
+                results[name], results.stale[name] = snapshot[0], snapshot[2]
+            else:
+                if item.node is not None:
+                    breaker(item.node).record_success()
+                    _remember(item.cache_key, results[name])
+    except Exception:
+        for future in futures.values():
+            future.cancel()
+        raise
+    return results
+
+
+def map_reads(fn, items, timeout=None):
+    """Runs ``fn(item)`` for every item concurrently; returns the results in item order."""
+    items = list(items)
+    results = gather({index: call(fn, item) for index, item in enumerate(items)}, timeout=timeout)
+    return [results[index] for index in range(len(items))]
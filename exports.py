@@ -0,0 +1,156 @@
+"""
+Streaming exports of job history.
+
+``iter_job_rows()`` walks a date range one month at a time (the month's
+archive segment and hot day partitions are read concurrently) and yields one
+flat row per job detail, so a CSV or NDJSON response can be streamed with
+memory that stays flat however long the range.
+"""
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+import archive
+import data_access
+import mirror
+import partitions
+from rollups import job_day
+
+EXPORT_FIELDS = [
+    'job_id', 'created_at', 'file_name', 'status', 'color_mode',
+    'pages_to_print', 'total_price', 'inserted_amount',
+]
+
+# Detail statuses accepted by the ``status`` filter ('all' or empty means no filter)
+EXPORT_STATUSES = ('complete', 'cancelled', 'pending')
+
+# Leading characters that make a CSV cell a formula (file names are user-supplied)
+CSV_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _months(days):
+    months = {}
+    for day in days:
+        months.setdefault(day[:7], []).append(day)
+    return months.items()
+
+
+def _hot_day(jobs_mirror, day):
+    if jobs_mirror is not None:
+        return partitions.mirror_range(jobs_mirror, day, day)
+    jobs = list(partitions.fetch_day(day).items())
+    jobs.sort(key=lambda item: (partitions.job_epoch(item[1]) or 0, item[0]))
+    return jobs
+
+
+def _read_month(jobs_mirror, month_days, horizon):
+    """Reads one month's archive segment and hot day partitions concurrently."""
+    calls = {day: data_access.call(_hot_day, jobs_mirror, day) for day in month_days}
+    if horizon and month_days[0] < horizon:
+        calls['archived'] = data_access.call(archive.fetch_range, month_days[0], month_days[-1])
+    results = data_access.gather(calls)
+    archived_by_day = {}
+    for job_id, job in results.pop('archived', []):
+        archived_by_day.setdefault(job_day(job), []).append((job_id, job))
+    return results, archived_by_day
+
+
+def iter_jobs(start_date, end_date):
+    """
+    Yields (job_id, job) for every job created between start_date and end_date (inclusive),
+    in creation order, from the configured storage backend.
+    Raises:
+        ValueError: If start_date or end_date is not a YYYY-MM-DD date.
+    """
+    import repository  # repository imports this module back for the Firebase walk
+    partitions.days_in_range(start_date, end_date)
+    return repository.get_repository().iter_jobs(start_date, end_date)
+
+
+def iter_firebase_jobs(start_date, end_date):
+    """
+    The Firebase walk behind iter_jobs(): day by day in creation order.
+    Archived and hot copies are merged per day; the hot copy wins.
+    Raises:
+        ValueError: If start_date or end_date is not a YYYY-MM-DD date.
+    """
+    days = partitions.days_in_range(start_date, end_date)
+    horizon = archive.archive_horizon()
+    jobs_mirror = mirror.get_mirror('print_jobs')
+    for _, month_days in _months(days):
+        hot_by_day, archived_by_day = _read_month(jobs_mirror, month_days, horizon)
+        for day in month_days:
+            hot = hot_by_day[day]
+            hot_ids = {job_id for job_id, _ in hot}
+            archived = [item for item in archived_by_day.pop(day, []) if item[0] not in hot_ids]
+            yield from sorted(archived + hot, key=lambda item: (partitions.job_epoch(item[1]) or 0, item[0]))
+
+
+def _format_created_at(job):
+    epoch = partitions.job_epoch(job)
+    if epoch is None:
+        return job_day(job)
+    return datetime.fromtimestamp(epoch).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def iter_job_rows(start_date, end_date, status=None):
+    """Yields one export row (dict with EXPORT_FIELDS) per job detail, optionally filtered by detail status."""
+    for job_id, job in iter_jobs(start_date, end_date):
+        created_at = _format_created_at(job)
+        details = job.get('details', [])
+        for detail in details if isinstance(details, list) else []:
+            if not isinstance(detail, dict):
+                continue
+            if status and detail.get('status') != status:
+                continue
+            yield {
+                'job_id': job_id,
+                'created_at': created_at,
+                'file_name': detail.get('file_name', ''),
+                'status': detail.get('status', ''),
+                'color_mode': detail.get('color_mode', ''),
+                'pages_to_print': detail.get('pages_to_print', 0),
+                'total_price': float(detail.get('total_price', 0) or 0),
+                'inserted_amount': float(detail.get('inserted_amount', 0) or 0),
+            }
+
+
+def _csv_cell(field, value):
+    # Spreadsheets run text starting with these as a formula; a leading quote keeps it text.
+    # Push ids start with '-' but are generated, so job_id is written as is.
+    if field != 'job_id' and isinstance(value, str) and value.startswith(CSV_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def stream_csv(rows, flush_every=500):
+    """Yields CSV text in chunks of ``flush_every`` rows."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    for count, row in enumerate(rows, 1):
+        writer.writerow({field: _csv_cell(field, value) for field, value in row.items()})
+        if count % flush_every == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def stream_ndjson(rows, flush_every=500):
+    """Yields newline-delimited JSON in chunks of ``flush_every`` rows."""
+    chunk = []
+    for row in rows:
+        chunk.append(json.dumps(row))
+        if len(chunk) >= flush_every:
+            yield '\n'.join(chunk) + '\n'
+            chunk = []
+    if chunk:
+        yield '\n'.join(chunk) + '\n'
+
+
+def default_range():
+    """The last 30 days, used when an export is requested without dates."""
+    today = datetime.now().date()
+    return (today - timedelta(days=29)).isoformat(), today.isoformat()
@@ -0,0 +1,445 @@
+"""
+In-process stand-in for the Firebase Realtime Database.
+
+``FakeDatabase`` implements the subset of ``firebase_admin.db`` this project
+uses (``reference``, ``child``, ``get``, ``set``, ``push``, ``update``,
+``delete``, ``transaction``, ``order_by_child``/``order_by_key``/``order_by_value``
+with ``start_at``/``end_at``/``equal_to``/``limit_to_first``/``limit_to_last``,
+and ``listen``) on a plain dict tree held in memory, so the admin app and the
+kiosk can run, be benchmarked and be exercised without the live database.
+
+Queries follow the server's ordering rules (null < false < true < numbers <
+strings < objects, ties broken by key), push keys are real Firebase push ids,
+and listeners get the same 'put'/'patch' events on their own thread as the
+SDK's streaming listener. Every network operation sleeps ``latency`` seconds
+(plus up to ``jitter``) so round-trip costs show up in measurements.
+
+Selected with PRINTECH_FIREBASE=fake (see firebase_config.py).
+"""
+import bisect
+import copy
+import json
+import queue
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+
+_PUSH_CHARS = '-0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz'
+_INT_KEY = re.compile(r'^-?\d{1,10}$')
+
+
+def _split(path):
+    return [part for part in str(path or '').split('/') if part]
+
+
+def _join(parts):
+    return '/' + '/'.join(parts)
+
+
+def _clean(value):
+    """Drops None values and empty containers, as the server does on write."""
+    if isinstance(value, dict):
+        cleaned = {str(key): _clean(item) for key, item in value.items()}
+        return {key: item for key, item in cleaned.items() if item is not None} or None
+    if isinstance(value, (list, tuple)):
+        cleaned = {str(index): _clean(item) for index, item in enumerate(value)}
+        cleaned = {key: item for key, item in cleaned.items() if item is not None}
+        return cleaned or None
+    return value
+
+
+def _export(value):
+    """A node as the SDK returns it: children keyed 0..n-1 (mostly filled) come back as a list."""
+    if not isinstance(value, dict):
+        return value
+    value = {key: _export(item) for key, item in value.items()}
+    if value and all(key.isdigit() and key == str(int(key)) for key in value):
+        indexes = [int(key) for key in value]
+        if max(indexes) < 2 * len(indexes):
+            return [value.get(str(index)) for index in range(max(indexes) + 1)]
+    return value
+
+
+def _value_rank(value):
+    """Sort key of a value under the server's ordering (null, false, true, numbers, strings, objects)."""
+    if value is None:
+        return (0, 0)
+    if isinstance(value, bool):
+        return (1, int(value))
+    if isinstance(value, (int, float)):
+        return (2, value)
+    if isinstance(value, str):
+        return (3, value)
+    return (4, 0)
+
+
+def _key_rank(key):
+    """Sort key of a child key: integer-like keys numerically first, then the rest as strings."""
+    if _INT_KEY.match(key):
+        return (0, int(key), '')
+    return (1, 0, key)
+
+
+class PushIdGenerator:
+    """Firebase push ids: 8 characters of millisecond time plus 12 increasing random characters."""
+
+    def __init__(self):
+        self._last_time = 0
+        self._last_random = [0] * 12
+        self._lock = threading.Lock()
+
+    def next(self, at=None):
+        """A new push id; ``at`` (epoch seconds) backdates it, e.g. for generated history."""
+        with self._lock:
+            now = int((time.time() if at is None else at) * 1000)
+            if now == self._last_time:
+                index = 11
+                while index >= 0 and self._last_random[index] == 63:
+                    self._last_random[index] = 0
+                    index -= 1
+                if index >= 0:
+                    self._last_random[index] += 1
+            else:
+                self._last_time = now
+                self._last_random = [random.randrange(64) for _ in range(12)]
+            stamp = []
+            for _ in range(8):
+                stamp.append(_PUSH_CHARS[now % 64])
+                now //= 64
+            return ''.join(reversed(stamp)) + ''.join(_PUSH_CHARS[index] for index in self._last_random)
+
+
+class Event:
+    """A listener event, shaped like ``firebase_admin.db.Event``."""
+
+    def __init__(self, event_type, path, data):
+        self.event_type = event_type
+        self.path = path
+        self.data = data
+
+
+class ListenerRegistration:
+    """Returned by ``Reference.listen()``; ``close()`` stops the listener thread."""
+
+    def __init__(self, database, path, callback):
+        self._database = database
+        self._path = path
+        self._callback = callback
+        self._events = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=f'fake-rtdb-listener{path}', daemon=True)
+
+    def _run(self):
+        while True:
+            event = self._events.get()
+            if event is None:
+                return
+            try:
+                self._callback(event)
+            except Exception as err:
+                print(f"Error in fake database listener for {self._path}: {err}")
+
+    def close(self):
+        self._database._remove_listener(self)
+        self._events.put(None)
+        if self._thread is not threading.current_thread():
+            self._thread.join()
+
+
+class Query:
+    """An ordered query on a reference; build it with the range/limit calls, then ``get()``."""
+
+    def __init__(self, reference, order_by):
+        self._reference = reference
+        self._order_by = order_by
+        self._start = self._end = self._equal = None
+        self._has_start = self._has_end = self._has_equal = False
+        self._limit_first = self._limit_last = None
+
+    def start_at(self, start):
+        if start is None:
+            raise ValueError('Start value must not be None.')
+        self._start, self._has_start = start, True
+        return self
+
+    def end_at(self, end):
+        if end is None:
+            raise ValueError('End value must not be None.')
+        self._end, self._has_end = end, True
+        return self
+
+    def equal_to(self, value):
+        if value is None:
+            raise ValueError('Equal to value must not be None.')
+        self._equal, self._has_equal = value, True
+        return self
+
+    def limit_to_first(self, limit):
+        if self._limit_last is not None:
+            raise ValueError('Cannot set both first and last limits.')
+        self._limit_first = int(limit)
+        return self
+
+    def limit_to_last(self, limit):
+        if self._limit_first is not None:
+            raise ValueError('Cannot set both first and last limits.')
+        self._limit_last = int(limit)
+        return self
+
+    def _sort_key(self, key, value):
+        if self._order_by == '$key':
+            return (_key_rank(key),)
+        if self._order_by == '$value':
+            return (_value_rank(value), _key_rank(key))
+        child = value
+        for part in _split(self._order_by):
+            child = child.get(part) if isinstance(child, dict) else None
+        return (_value_rank(child), _key_rank(key))
+
+    def _bound(self, value):
+        return _key_rank(str(value)) if self._order_by == '$key' else _value_rank(value)
+
+    def _ordered(self, database):
+        # Sorted children and their ranks are kept until the next write, as the server keeps an index
+        cache_key = (tuple(self._reference._parts), self._order_by)
+        cached = database._indexes.get(cache_key)
+        if cached is None:
+            node = database._node(self._reference._parts)
+            children = list(node.items()) if isinstance(node, dict) else []
+            rows = sorted(((self._sort_key(key, value), key, value) for key, value in children), key=lambda row: row[0])
+            cached = database._indexes[cache_key] = (rows, [row[0][0] for row in rows])
+        return cached
+
+    def get(self):
+        database = self._reference._database
+        database._wait()
+        with database._lock:
+            rows, ranks = self._ordered(database)
+            lo, hi = 0, len(rows)
+            if self._has_equal:
+                lo = max(lo, bisect.bisect_left(ranks, self._bound(self._equal)))
+                hi = min(hi, bisect.bisect_right(ranks, self._bound(self._equal)))
+            if self._has_start:
+                lo = max(lo, bisect.bisect_left(ranks, self._bound(self._start)))
+            if self._has_end:
+                hi = min(hi, bisect.bisect_right(ranks, self._bound(self._end)))
+            rows = rows[lo:max(lo, hi)]
+            if self._limit_first is not None:
+                rows = rows[:self._limit_first]
+            if self._limit_last is not None:
+                rows = rows[-self._limit_last:] if self._limit_last else []
+            result = OrderedDict((key, _export(copy.deepcopy(value))) for _, key, value in rows)
+        return result
+
+
+class Reference:
+    """A location in the fake database, with the ``firebase_admin.db.Reference`` methods used here."""
+
+    def __init__(self, database, path='/'):
+        self._database = database
+        self._parts = _split(path)
+
+    @property
+    def key(self):
+        return self._parts[-1] if self._parts else None
+
+    @property
+    def path(self):
+        return _join(self._parts)
+
+    @property
+    def parent(self):
+        return Reference(self._database, _join(self._parts[:-1])) if self._parts else None
+
+    def child(self, path):
+        if not path or not isinstance(path, str):
+            raise ValueError(f'Invalid path argument: "{path}".')
+        return Reference(self._database, _join(self._parts + _split(path)))
+
+    def get(self, etag=False, shallow=False):
+        self._database._wait()
+        with self._database._lock:
+            value = self._database._node(self._parts)
+            if shallow and isinstance(value, dict):
+                value = {key: True for key in value}
+            value = _export(copy.deepcopy(value))
+        if etag:
+            return value, self._database._etag(value)
+        return value
+
+    def set(self, value):
+        if value is None:
+            raise ValueError('Value must not be None.')
+        self._database._wait()
+        self._database._write(self._parts, value)
+
+    def push(self, value=''):
+        if value is None:
+            raise ValueError('Value must not be None.')
+        child = self.child(self._database.push_ids.next())
+        child.set(value)
+        return child
+
+    def update(self, value):
+        if not value or not isinstance(value, dict):
+            raise ValueError('Value argument must be a non-empty dictionary.')
+        if None in value.keys():
+            raise ValueError('Dictionary must not contain None keys.')
+        self._database._wait()
+        self._database._update(self._parts, value)
+
+    def delete(self):
+        self._database._wait()
+        self._database._write(self._parts, None)
+
+    def transaction(self, transaction_update):
+        if not callable(transaction_update):
+            raise ValueError('transaction_update must be a function.')
+        self._database._wait()
+        with self._database._lock:
+            current = _export(copy.deepcopy(self._database._node(self._parts)))
+            new_value = transaction_update(current)
+            self._database._write(self._parts, new_value)
+        return new_value
+
+    def listen(self, callback):
+        return self._database._add_listener(self._parts, callback)
+
+    def order_by_child(self, path):
+        if path in ('$key', '$value', '$priority') or not path:
+            raise ValueError(f'Illegal child path: {path}')
+        return Query(self, path)
+
+    def order_by_key(self):
+        return Query(self, '$key')
+
+    def order_by_value(self):
+        return Query(self, '$value')
+
+
+class FakeDatabase:
+    """
+    The whole fake database: a dict tree, its listeners and the injected latency.
+    Args:
+        latency (float): Seconds every network operation sleeps.
+        jitter (float): Extra random sleep of up to this many seconds.
+        data (dict, optional): Initial contents (e.g. a JSON export of the real database).
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, data=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.push_ids = PushIdGenerator()
+        self._root = _clean(data) or {}
+        self._listeners = []
+        self._lock = threading.RLock()
+        self._indexes = {}
+        self.calls = 0
+
+    # --- firebase_admin.db interface ---
+    def reference(self, path='/', app=None, url=None):
+        return Reference(self, path)
+
+    # --- Loading and saving ---
+    def load(self, data):
+        """Replaces the whole tree (listeners get a fresh snapshot)."""
+        self._write([], data)
+
+    def load_file(self, path):
+        with open(path) as data_file:
+            self.load(json.load(data_file))
+
+    def dump(self):
+        """The whole tree, as ``reference('/').get()`` would return it (no latency)."""
+        with self._lock:
+            return _export(copy.deepcopy(self._root))
+
+    # --- Internals ---
+    def _wait(self):
+        self.calls += 1
+        delay = self.latency + (random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+
+    @staticmethod
+    def _etag(value):
+        return str(hash(json.dumps(value, sort_keys=True, default=str)))
+
+    def _node(self, parts):
+        node = self._root
+        for part in parts:
+            if not isinstance(node, dict) or part not in node:
+                return None
+            node = node[part]
+        return node
+
+    def _store(self, parts, value):
+        if not parts:
+            self._root = value if isinstance(value, dict) else {}
+            return
+        parents = [self._root]
+        node = self._root
+        for part in parts[:-1]:
+            child = node.get(part)
+            if not isinstance(child, dict):
+                if value is None:
+                    return
+                child = node[part] = {}
+            parents.append(child)
+            node = child
+        if value is None:
+            node.pop(parts[-1], None)
+        else:
+            node[parts[-1]] = value
+        # Parents left without children disappear, as on the server
+        for depth in range(len(parts) - 1, 0, -1):
+            if parents[depth]:
+                break
+            parents[depth - 1].pop(parts[depth - 1], None)
+
+    def _write(self, parts, value):
+        value = _clean(copy.deepcopy(value))
+        with self._lock:
+            self._indexes.clear()
+            self._store(parts, value)
+            self._notify(parts, 'put', {(): value})
+
+    def _update(self, parts, values):
+        cleaned = {}
+        for child_path, value in values.items():
+            cleaned[tuple(_split(child_path))] = _clean(copy.deepcopy(value))
+        with self._lock:
+            self._indexes.clear()
+            for child_parts, value in cleaned.items():
+                self._store(parts + list(child_parts), value)
+            self._notify(parts, 'patch', cleaned)
+
+    def _notify(self, parts, event_type, changes):
+        for listened, registration in list(self._listeners):
+            depth = len(listened)
+            if parts[:depth] == listened:
+                # Written at or below the listened node: the event carries just the change
+                relative = _join(parts[depth:])
+                if event_type == 'patch':
+                    data = {'/'.join(key): _export(copy.deepcopy(value)) for key, value in changes.items()}
+                    registration._events.put(Event('patch', relative, data))
+                else:
+                    registration._events.put(Event('put', relative, _export(copy.deepcopy(changes[()]))))
+                continue
+            written = [parts + list(key) for key in changes]
+            if any(path[:depth] == listened or listened[:len(path)] == path for path in written):
+                # An update above the node reached into it: the listener gets the node's new value
+                registration._events.put(Event('put', '/', _export(copy.deepcopy(self._node(listened)))))
+
+    def _add_listener(self, parts, callback):
+        registration = ListenerRegistration(self, _join(parts), callback)
+        with self._lock:
+            registration._events.put(Event('put', '/', _export(copy.deepcopy(self._node(parts)))))
+            self._listeners.append((parts, registration))
+        registration._thread.start()
+        return registration
+
+    def _remove_listener(self, registration):
+        with self._lock:
+            self._listeners = [item for item in self._listeners if item[1] is not registration]
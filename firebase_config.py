@@ -0,0 +1,119 @@
+"""
+Firebase initialization for the admin app.
+
+Every module of the admin app reads and writes the Realtime Database through
+the ``db`` exported here. It stands in for ``firebase_admin.db`` and records
+each call for the /metrics endpoint (see firebase_metrics.py).
+
+With PRINTECH_FIREBASE=fake it is backed by the in-memory fake_rtdb instead
+of the live database (optionally preloaded from the JSON export named by
+PRINTECH_FAKE_DB_SEED, with PRINTECH_FAKE_DB_LATENCY seconds per call), so
+the app runs and can be measured offline.
+"""
+import json
+import os
+import threading
+
+import firebase_metrics
+import firebase_session
+import index_rules
+
+FIREBASE_CRED_PATH = os.path.join(os.path.dirname(__file__), 'firebase_service_account.json')
+FIREBASE_DB_URL = 'https://printech-bd2ca-default-rtdb.asia-southeast1.firebasedatabase.app/'
+
+# 'live' (the printech-bd2ca database) or 'fake' (in-process, see fake_rtdb.py)
+FIREBASE_BACKEND = os.environ.get('PRINTECH_FIREBASE', 'live')
+FAKE_DB_LATENCY = float(os.environ.get('PRINTECH_FAKE_DB_LATENCY', 0))
+FAKE_DB_JITTER = float(os.environ.get('PRINTECH_FAKE_DB_JITTER', 0))
+FAKE_DB_SEED = os.environ.get('PRINTECH_FAKE_DB_SEED')
+
+# Log ordered queries that database.rules.json does not index (on by default while running on the fake)
+QUERY_GUARD = os.environ.get('PRINTECH_QUERY_GUARD', '1' if FIREBASE_BACKEND == 'fake' else '0') == '1'
+QUERY_CHECK = index_rules.check_query if QUERY_GUARD else None
+
+# Seconds any single HTTP call to the database may take (the client's own default is 120)
+FIREBASE_HTTP_TIMEOUT = float(os.environ.get('PRINTECH_FIREBASE_HTTP_TIMEOUT', 10))
+
+_init_lock = threading.Lock()
+_token_refresher = None
+_prewarmed = False
+
+
+def initialize():
+    """Initializes the Firebase app if not already initialized. Called on the first db.reference()."""
+    import firebase_admin
+    from firebase_admin import credentials
+
+    with _init_lock:
+        if firebase_admin._apps:
+            return
+        # Support loading service account from environment variable for deployment
+        if os.environ.get('FIREBASE_SERVICE_ACCOUNT_JSON'):
+            service_account_info = json.loads(os.environ['FIREBASE_SERVICE_ACCOUNT_JSON'])
+            cred = credentials.Certificate(service_account_info)
+        else:
+            cred = credentials.Certificate(FIREBASE_CRED_PATH)
+
+        firebase_admin.initialize_app(cred, {
+            'databaseURL': FIREBASE_DB_URL,
+            'httpTimeout': FIREBASE_HTTP_TIMEOUT
+        })
+
+
+def prewarm():
+    """
+    Initializes the live database in the background, so the first page finds a token and an open
+    connection, and keeps the session warm from then on: a sized keep-alive connection pool and a
+    token renewed ahead of expiry (see firebase_session.py). Called by the serving process only,
+    so report workers and scripts never start a refresher; later calls do nothing.
+    """
+    global _prewarmed
+
+    def run():
+        global _token_refresher
+        try:
+            _token_refresher = firebase_session.start(db, warm=True)
+        except Exception as e:
+            print(f"Firebase prewarm failed: {e}")
+
+    with _init_lock:
+        if _prewarmed or FIREBASE_BACKEND != 'live':
+            return
+        _prewarmed = True
+    threading.Thread(target=run, name='firebase-prewarm', daemon=True).start()
+
+
+def session_health():
+    """Token and pool status of the live database session (None before it is initialized or on the fake)."""
+    return _token_refresher.health() if _token_refresher else None
+
+
+class _FirebaseDbModule:
+    """firebase_admin.db, imported on first use: it pulls in google-auth and its HTTP stack."""
+
+    def __getattr__(self, name):
+        from firebase_admin import db as firebase_db
+        return getattr(firebase_db, name)
+
+
+def create_fake_database():
+    """The in-memory database used when FIREBASE_BACKEND is 'fake' (the seed is loaded on first use)."""
+    import fake_rtdb
+    fake_db = fake_rtdb.FakeDatabase(latency=FAKE_DB_LATENCY, jitter=FAKE_DB_JITTER)
+
+    def load_seed():
+        if FAKE_DB_SEED:
+            fake_db.load_file(FAKE_DB_SEED)
+
+    return fake_db, load_seed
+
+
+# Report worker processes import this module too but never touch the database, so the
+# Firebase SDK (or the fake's seed) is only loaded when the first reference is made
+if FIREBASE_BACKEND == 'fake':
+    fake_db, load_seed = create_fake_database()
+    db = firebase_metrics.instrument(fake_db, default_route='background', setup=load_seed, query_check=QUERY_CHECK)
+elif FIREBASE_BACKEND == 'live':
+    db = firebase_metrics.instrument(_FirebaseDbModule(), default_route='background', setup=initialize, query_check=QUERY_CHECK)
+else:
+    raise ValueError(f"Unknown PRINTECH_FIREBASE backend: {FIREBASE_BACKEND!r}")
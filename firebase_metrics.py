@@ -0,0 +1,377 @@
+"""
+Instrumentation of Firebase Realtime Database calls.
+
+``instrument(db)`` returns a drop-in replacement for ``firebase_admin.db``
+whose references and queries time every network operation (get, set, push,
+update, delete, transaction, query gets, listen events) and record call
+count, latency histogram, approximate payload bytes and errors, labeled by
+route, node path and operation. ``render_metrics()`` returns everything in
+the Prometheus text exposition format.
+
+The route label is the Flask endpoint when a request is active, the label set
+with ``route_label()`` otherwise (reads fanned out to worker threads carry
+the route of the request that started them), or the process's default route.
+Push keys, ids and dates in paths are collapsed (``print_jobs/{id}``,
+``rollups/daily/{day}``) so the number of series stays small.
+"""
+import itertools
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+# Items of a dict or list measured for the payload size estimate; the rest are extrapolated
+PAYLOAD_SAMPLE_SIZE = 16
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Write the metrics to this file every METRICS_TEXTFILE_INTERVAL seconds (for processes without an HTTP endpoint)
+METRICS_TEXTFILE = os.environ.get('PRINTECH_METRICS_TEXTFILE')
+METRICS_TEXTFILE_INTERVAL = float(os.environ.get('PRINTECH_METRICS_TEXTFILE_INTERVAL', 15))
+
+_PATH_PATTERNS = (
+    (re.compile(r'^-[0-9A-Za-z_-]{19}$'), '{id}'),     # push keys
+    (re.compile(r'^\d{4}-\d{2}-\d{2}$'), '{day}'),
+    (re.compile(r'^\d{4}-\d{2}$'), '{month}'),
+    (re.compile(r'^\d+$'), '{n}'),
+    (re.compile(r'^[0-9a-f]{20,}$'), '{id}'),
+)
+
+_lock = threading.Lock()
+_series = {}  # (route, path, op) -> [count, errors, seconds, bytes, bucket counts]
+_page_views = {}  # route -> count
+_local = threading.local()
+_default_route = 'none'
+_textfile_started = False
+_query_check = None
+
+
+def normalize_path(path):
+    """Collapses ids and dates in a node path, e.g. 'print_jobs/-Nabc.../details/0' -> 'print_jobs/{id}/details/{n}'."""
+    parts = []
+    for part in str(path or '/').split('/'):
+        if not part:
+            continue
+        for pattern, placeholder in _PATH_PATTERNS:
+            if pattern.match(part):
+                part = placeholder
+                break
+        parts.append(part)
+    return '/'.join(parts) or '/'
+
+
+def current_route():
+    """The route label for calls made by this thread right now."""
+    route = getattr(_local, 'route', None)
+    if route:
+        return route
+    try:
+        from flask import has_request_context, request
+        if has_request_context():
+            return request.endpoint or 'unknown'
+    except ImportError:
+        pass
+    return _default_route
+
+
+@contextmanager
+def route_label(route):
+    """Labels the Firebase calls made by this thread inside the block with ``route``."""
+    previous = getattr(_local, 'route', None)
+    _local.route = route
+    try:
+        yield
+    finally:
+        _local.route = previous
+
+
+def _payload_bytes(value):
+    """
+    Approximate compact JSON size of a payload, without serializing it: dicts and lists with
+    more than PAYLOAD_SAMPLE_SIZE items are measured from their first items and scaled up.
+    """
+    if value is None:
+        return 0
+    if isinstance(value, (bytes, str)):
+        return len(value)
+    if isinstance(value, bool):
+        return 4 if value else 5
+    if isinstance(value, (int, float)):
+        return len(repr(value))
+    if isinstance(value, dict):
+        items = itertools.islice(value.items(), PAYLOAD_SAMPLE_SIZE)
+        # "key":value,
+        sampled = [len(str(key)) + 4 + _value_bytes(item) for key, item in items]
+    elif isinstance(value, (list, tuple)):
+        sampled = [1 + _value_bytes(item) for item in itertools.islice(value, PAYLOAD_SAMPLE_SIZE)]
+    else:
+        return len(str(value))
+    if not sampled:
+        return 2
+    return 1 + round(sum(sampled) * len(value) / len(sampled))
+
+
+def _value_bytes(value):
+    # Inside a container strings are quoted and None is written as null
+    if isinstance(value, str):
+        return len(value) + 2
+    return 4 if value is None else _payload_bytes(value)
+
+
+def record(path, op, seconds, payload=None, error=False, route=None):
+    """Adds one Firebase call to the metrics."""
+    key = (route or current_route(), normalize_path(path), op)
+    size = _payload_bytes(payload)
+    with _lock:
+        series = _series.get(key)
+        if series is None:
+            series = _series[key] = [0, 0, 0.0, 0, [0] * len(LATENCY_BUCKETS)]
+        series[0] += 1
+        series[1] += int(error)
+        series[2] += seconds
+        series[3] += size
+        buckets = series[4]
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                buckets[index] += 1
+
+
+def record_page_view(route):
+    """Counts one handled request, so Firebase calls and bytes can be divided per page view."""
+    with _lock:
+        _page_views[route] = _page_views.get(route, 0) + 1
+
+
+def _timed(path, op, fn, *args, payload=None, **kwargs):
+    started = time.perf_counter()
+    try:
+        result = fn(*args, **kwargs)
+    except Exception:
+        record(path, op, time.perf_counter() - started, payload, error=True)
+        raise
+    record(path, op, time.perf_counter() - started, result if payload is None else payload)
+    return result
+
+
+class InstrumentedQuery:
+    """Wraps a firebase_admin Query; builder calls return wrapped queries and get() is timed."""
+
+    def __init__(self, query, path):
+        self._query = query
+        self._path = path
+
+    def _wrap(self, method, *args):
+        return InstrumentedQuery(getattr(self._query, method)(*args), self._path)
+
+    def start_at(self, start):
+        return self._wrap('start_at', start)
+
+    def end_at(self, end):
+        return self._wrap('end_at', end)
+
+    def equal_to(self, value):
+        return self._wrap('equal_to', value)
+
+    def limit_to_first(self, limit):
+        return self._wrap('limit_to_first', limit)
+
+    def limit_to_last(self, limit):
+        return self._wrap('limit_to_last', limit)
+
+    def get(self):
+        return _timed(self._path, 'query', self._query.get)
+
+    def __getattr__(self, name):
+        return getattr(self._query, name)
+
+
+class InstrumentedReference:
+    """Wraps a firebase_admin Reference so every network operation is recorded."""
+
+    def __init__(self, ref):
+        self._ref = ref
+
+    @property
+    def key(self):
+        return self._ref.key
+
+    @property
+    def path(self):
+        return self._ref.path
+
+    @property
+    def parent(self):
+        parent = self._ref.parent
+        return InstrumentedReference(parent) if parent is not None else None
+
+    def child(self, path):
+        return InstrumentedReference(self._ref.child(path))
+
+    def get(self, etag=False, shallow=False):
+        return _timed(self._ref.path, 'get', self._ref.get, etag=etag, shallow=shallow)
+
+    def get_if_changed(self, etag):
+        return _timed(self._ref.path, 'get', self._ref.get_if_changed, etag)
+
+    def set(self, value):
+        return _timed(self._ref.path, 'set', self._ref.set, value, payload=value)
+
+    def set_if_unchanged(self, expected_etag, value):
+        return _timed(self._ref.path, 'set', self._ref.set_if_unchanged, expected_etag, value, payload=value)
+
+    def push(self, value=''):
+        return InstrumentedReference(_timed(self._ref.path, 'push', self._ref.push, value, payload=value))
+
+    def update(self, value):
+        return _timed(self._ref.path, 'update', self._ref.update, value, payload=value)
+
+    def delete(self):
+        return _timed(self._ref.path, 'delete', self._ref.delete, payload='')
+
+    def transaction(self, transaction_update):
+        return _timed(self._ref.path, 'transaction', self._ref.transaction, transaction_update)
+
+    def listen(self, callback):
+        path = self._ref.path
+        route = current_route()
+
+        def recorded_callback(event):
+            record(f'{path}/{event.path}', 'listen_event', 0.0, event.data, route=route)
+            return callback(event)
+
+        return _timed(path, 'listen', self._ref.listen, recorded_callback, payload='')
+
+    def order_by_child(self, path):
+        if _query_check is not None:
+            _query_check(self._ref.path, path)
+        return InstrumentedQuery(self._ref.order_by_child(path), self._ref.path)
+
+    def order_by_key(self):
+        return InstrumentedQuery(self._ref.order_by_key(), self._ref.path)
+
+    def order_by_value(self):
+        if _query_check is not None:
+            _query_check(self._ref.path, '.value')
+        return InstrumentedQuery(self._ref.order_by_value(), self._ref.path)
+
+    def __getattr__(self, name):
+        return getattr(self._ref, name)
+
+
+class InstrumentedDb:
+    """Stands in for the ``firebase_admin.db`` module: ``reference()`` returns instrumented references."""
+
+    def __init__(self, db_module, setup=None):
+        self._db = db_module
+        self._setup = setup
+        self._setup_lock = threading.Lock()
+
+    def reference(self, path='/', app=None, url=None):
+        if self._setup is not None:
+            # Concurrent first references (e.g. the read pool) must not run the setup twice
+            with self._setup_lock:
+                if self._setup is not None:
+                    self._setup()
+                    self._setup = None
+        return InstrumentedReference(self._db.reference(path, app=app, url=url))
+
+    def __getattr__(self, name):
+        return getattr(self._db, name)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_metrics():
+    """Returns all recorded metrics in the Prometheus text exposition format."""
+    with _lock:
+        series = {key: (count, errors, seconds, size, list(buckets))
+                  for key, (count, errors, seconds, size, buckets) in _series.items()}
+        page_views = dict(_page_views)
+
+    lines = [
+        '# HELP firebase_calls_total Firebase Realtime Database operations.',
+        '# TYPE firebase_calls_total counter',
+    ]
+    ordered = sorted(series.items())
+    labels = {key: f'route="{_escape(key[0])}",path="{_escape(key[1])}",op="{key[2]}"' for key, _ in ordered}
+    lines += [f'firebase_calls_total{{{labels[key]}}} {value[0]}' for key, value in ordered]
+    lines += [
+        '# HELP firebase_call_errors_total Firebase operations that raised.',
+        '# TYPE firebase_call_errors_total counter',
+    ]
+    lines += [f'firebase_call_errors_total{{{labels[key]}}} {value[1]}' for key, value in ordered]
+    lines += [
+        '# HELP firebase_payload_bytes_total Approximate JSON bytes sent or received.',
+        '# TYPE firebase_payload_bytes_total counter',
+    ]
+    lines += [f'firebase_payload_bytes_total{{{labels[key]}}} {value[3]}' for key, value in ordered]
+    lines += [
+        '# HELP firebase_call_duration_seconds Firebase operation latency.',
+        '# TYPE firebase_call_duration_seconds histogram',
+    ]
+    for key, (count, _, seconds, _, buckets) in ordered:
+        for bound, bucket_count in zip(LATENCY_BUCKETS, buckets):
+            lines.append(f'firebase_call_duration_seconds_bucket{{{labels[key]},le="{bound:g}"}} {bucket_count}')
+        lines.append(f'firebase_call_duration_seconds_bucket{{{labels[key]},le="+Inf"}} {count}')
+        lines.append(f'firebase_call_duration_seconds_sum{{{labels[key]}}} {seconds:.6f}')
+        lines.append(f'firebase_call_duration_seconds_count{{{labels[key]}}} {count}')
+    lines += [
+        '# HELP page_views_total Handled requests per route.',
+        '# TYPE page_views_total counter',
+    ]
+    lines += [f'page_views_total{{route="{_escape(route)}"}} {count}' for route, count in sorted(page_views.items())]
+    return '\n'.join(lines) + '\n'
+
+
+def call_counts():
+    """Returns {route: number of Firebase calls} over every path and operation."""
+    counts = {}
+    with _lock:
+        for (route, _, _), series in _series.items():
+            counts[route] = counts.get(route, 0) + series[0]
+    return counts
+
+
+def reset():
+    with _lock:
+        _series.clear()
+        _page_views.clear()
+
+
+def _write_textfile_forever(path, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            with open(f'{path}.tmp', 'w') as metrics_file:
+                metrics_file.write(render_metrics())
+            os.replace(f'{path}.tmp', path)
+        except OSError as err:
+            print(f"Error writing Firebase metrics to {path}: {err}")
+
+
+def instrument(db_module, default_route=None, setup=None, query_check=None):
+    """
+    Returns an instrumented stand-in for ``firebase_admin.db``.
+    Args:
+        db_module: The firebase_admin.db module.
+        default_route (str, optional): Route label for calls made outside a request (e.g. 'kiosk').
+        setup (callable, optional): Run once before the first reference is made (e.g. app initialization).
+        query_check (callable, optional): Called with (node path, child or '.value') for every ordered
+            query (e.g. index_rules.check_query).
+    """
+    global _default_route, _textfile_started, _query_check
+    if default_route:
+        _default_route = default_route
+    if query_check:
+        _query_check = query_check
+    if METRICS_TEXTFILE and not _textfile_started:
+        _textfile_started = True
+        threading.Thread(
+            target=_write_textfile_forever, args=(METRICS_TEXTFILE, METRICS_TEXTFILE_INTERVAL),
+            name='metrics-textfile', daemon=True
+        ).start()
+    return InstrumentedDb(db_module, setup)
@@ -0,0 +1,150 @@
+"""
+Warm, pooled HTTP access to the Realtime Database.
+
+firebase_admin.db sends every REST call through one requests session per
+database URL, authorized with the app's OAuth token. Left alone, two costs
+land on user requests: the token exchange, made by whichever call first
+finds the token expired (at startup and then once an hour), and new TLS
+connections whenever more calls run at once than the session's pool keeps
+open (ten by default, fewer than the read workers of data_access.py).
+
+``start()`` mounts a keep-alive adapter sized by PRINTECH_FIREBASE_POOL_SIZE
+on that session and starts a ``TokenRefresher``, which fetches the token
+right away and then renews it TOKEN_REFRESH_MARGIN seconds before it
+expires; with ``warm=True`` it also makes one shallow read, so the first
+connection is open before the first page is requested. Used by the admin
+app's and the kiosk's firebase_config.
+"""
+import os
+import threading
+from datetime import datetime, timezone
+
+# Keep-alive connections kept per database host; above the read concurrency so bursts reuse them
+POOL_SIZE = int(os.environ.get('PRINTECH_FIREBASE_POOL_SIZE', 32))
+
+# Tokens are renewed this long before they expire (service account tokens last an hour, and
+# google-auth itself only refreshes in a request once fewer than four minutes are left)
+TOKEN_REFRESH_MARGIN = float(os.environ.get('PRINTECH_TOKEN_REFRESH_MARGIN', 600))
+
+# Longest sleep between expiry checks (and the retry delay after a failed refresh)
+TOKEN_CHECK_INTERVAL = 60
+
+
+def database_session(db_module):
+    """The requests session behind ``db_module.reference()`` calls, or None if it has none (the fake)."""
+    client = getattr(db_module.reference('/'), '_client', None)
+    return getattr(client, 'session', None)
+
+
+def configure_pool(session, pool_size=POOL_SIZE):
+    """Replaces the session's adapters with keep-alive pools of ``pool_size`` connections (same retries)."""
+    from requests.adapters import HTTPAdapter
+
+    for prefix in ('https://', 'http://'):
+        retries = session.get_adapter(prefix).max_retries
+        session.mount(prefix, HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retries))
+
+
+def seconds_to_expiry(credentials):
+    """Seconds until the credentials' token expires (0 if there is none yet)."""
+    if not getattr(credentials, 'token', None) or credentials.expiry is None:
+        return 0.0
+    now = datetime.now(timezone.utc)
+    if credentials.expiry.tzinfo is None:
+        # google-auth keeps expiry as naive UTC
+        now = now.replace(tzinfo=None)
+    return (credentials.expiry - now).total_seconds()
+
+
+class TokenRefresher:
+    """Renews OAuth credentials in a daemon thread shortly before they expire."""
+
+    def __init__(self, credentials, margin=TOKEN_REFRESH_MARGIN, interval=TOKEN_CHECK_INTERVAL, on_ready=None):
+        """
+        Args:
+            credentials: google.auth credentials shared with the database session.
+            margin (float): Seconds before expiry at which the token is renewed.
+            interval (float): Longest sleep between checks.
+            on_ready (callable, optional): Run once in the thread after the first check (e.g. a warm-up read).
+        """
+        self.credentials = credentials
+        self.margin = margin
+        self.interval = interval
+        self.on_ready = on_ready
+        self.refreshes = 0
+        self.last_error = None
+        self._token_request = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def refresh_if_due(self):
+        """Renews the token if it expires within the margin. Returns True if it did."""
+        if seconds_to_expiry(self.credentials) > self.margin:
+            return False
+        if self._token_request is None:
+            # One session for the token endpoint too, so renewals reuse its connection
+            import google.auth.transport.requests
+            import requests
+            self._token_request = google.auth.transport.requests.Request(requests.Session())
+        self.credentials.refresh(self._token_request)
+        self.refreshes += 1
+        return True
+
+    def _check(self):
+        try:
+            self.refresh_if_due()
+            self.last_error = None
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"Token refresh failed: {e}")
+
+    def _run(self):
+        self._check()
+        if self.on_ready is not None:
+            try:
+                self.on_ready()
+            except Exception as e:
+                print(f"Database warm-up failed: {e}")
+        while True:
+            if self.last_error is None:
+                due_in = seconds_to_expiry(self.credentials) - self.margin
+            else:
+                due_in = self.interval
+            if self._stop.wait(min(self.interval, max(due_in, 1))):
+                return
+            self._check()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='token-refresher', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def health(self):
+        return {
+            'expires_in': round(seconds_to_expiry(self.credentials)),
+            'refreshes': self.refreshes,
+            'last_error': self.last_error,
+        }
+
+
+def start(db_module, warm=False, pool_size=POOL_SIZE):
+    """
+    Pools the database session's connections and keeps its token fresh.
+    Args:
+        db_module: firebase_admin.db, after the app is initialized.
+        warm (bool): Also make one shallow read once the token is there, to open the first connection.
+        pool_size (int): Keep-alive connections per host.
+    Returns:
+        TokenRefresher: The started refresher, or None if the database has no HTTP session (the fake).
+    """
+    session = database_session(db_module)
+    if session is None:
+        return None
+    configure_pool(session, pool_size)
+    on_ready = (lambda: db_module.reference('/').get(shallow=True)) if warm else None
+    # The session's own credentials, so requests see the renewed token
+    return TokenRefresher(session.credentials, on_ready=on_ready).start()
@@ -0,0 +1,76 @@
+"""
+The ``.indexOn`` rules of database.rules.json, and a dev-mode check of queries against them.
+
+database.rules.json is the versioned copy of the Realtime Database rules
+(deploy it with ``firebase deploy --only database`` or paste it into the
+console). Both apps only reach the database with the Admin SDK, which
+bypasses the read/write rules, so those stay closed; the file is mostly there
+for its ``.indexOn`` entries. A query ordered by a child (or value) the rules
+do not index is answered by sending the whole node and filtering it on the
+client.
+
+With the query guard on (PRINTECH_QUERY_GUARD=1, the default with the fake
+database), every such query is logged once per path and child, so a missing
+index shows up while developing instead of as a slow page in production.
+"""
+import json
+import os
+import threading
+
+RULES_PATH = os.path.join(os.path.dirname(__file__), 'database.rules.json')
+
+_reported = set()
+_reported_lock = threading.Lock()
+
+
+def load_index_rules(path=RULES_PATH):
+    """
+    Returns the ``.indexOn`` entries of a rules file.
+    Returns:
+        dict: {tuple of path segments ('$name' matches any key): set of indexed children ('.value' for values)}
+    """
+    with open(path) as rules_file:
+        rules = json.load(rules_file).get('rules', {})
+    indexes = {}
+
+    def walk(node, parts):
+        for key, value in node.items():
+            if key == '.indexOn':
+                indexes[parts] = {value} if isinstance(value, str) else set(value)
+            elif not key.startswith('.') and isinstance(value, dict):
+                walk(value, parts + (key,))
+
+    walk(rules, ())
+    return indexes
+
+
+_index_rules = None
+
+
+def is_indexed(path, order_by):
+    """True if ``order_by`` (a child path, '.value' or '.key') has an index rule at ``path``."""
+    global _index_rules
+    if order_by == '.key':
+        return True
+    if _index_rules is None:
+        _index_rules = load_index_rules()
+    parts = tuple(part for part in str(path).strip('/').split('/') if part)
+    for rule_parts, children in _index_rules.items():
+        if len(rule_parts) == len(parts) and order_by in children and all(
+            rule.startswith('$') or rule == part for rule, part in zip(rule_parts, parts)
+        ):
+            return True
+    return False
+
+
+def check_query(path, order_by):
+    """Logs (once per path and child) a query that would fall back to a full scan of its node."""
+    if is_indexed(path, order_by):
+        return
+    key = (str(path).strip('/'), order_by)
+    with _reported_lock:
+        if key in _reported:
+            return
+        _reported.add(key)
+    print(f"Unindexed query: /{key[0]} ordered by {order_by!r} reads and filters the whole node; "
+          f"add it to .indexOn in database.rules.json")
@@ -0,0 +1,168 @@
+"""
+Secondary indexes over print_jobs for the /jobs filters.
+
+Every job is listed under each value it can be filtered by, keyed by job id,
+with its creation time (epoch seconds) as the value:
+
+    job_indexes/status/{status}/{job_id}          one entry per distinct detail status
+    job_indexes/color_mode/{color_mode}/{job_id}  one entry per distinct detail color mode
+    job_indexes/month/{YYYY-MM}/{job_id}
+
+A filtered page is then an ``order_by_value()`` window of one index node
+(declared with ``.indexOn: .value`` in database.rules.json) plus one read per
+job on the page, instead of a query over the whole print_jobs collection.
+Kiosk jobs carry no details, so their job-level status is indexed instead.
+"""
+from firebase_config import db
+
+import data_access
+import mirror
+import pagination
+from job_records import job_details
+from partitions import job_epoch
+from rollups import job_day
+
+INDEXES_PATH = 'job_indexes'
+
+# Filters in the order tried as the index to page through: the first one present
+# is read, the others are checked on the jobs it returns
+FILTER_FIELDS = ('month', 'status', 'color_mode')
+
+# Characters Firebase does not allow in keys
+_KEY_FORBIDDEN = str.maketrans({char: '_' for char in '.#$[]/'})
+
+
+def _key(value):
+    return str(value).translate(_KEY_FORBIDDEN)
+
+
+def index_values(job):
+    """Returns {field: set of index keys} for the values a job can be filtered by."""
+    job = job or {}
+    details = job_details(job)
+    statuses = {detail.get('status') for detail in details} if details else {job.get('status')}
+    day = job_day(job)
+    values = {
+        'status': statuses,
+        'color_mode': {detail.get('color_mode') for detail in details},
+        'month': {day[:7]} if day else set(),
+    }
+    # Empty values are not indexed (and cannot be filtered on)
+    return {field: {_key(value) for value in found if value} for field, found in values.items()}
+
+
+def index_entries(job_id, job):
+    """Returns {path: created_at epoch} of every index entry a job should have."""
+    if not job:
+        return {}
+    epoch = job_epoch(job) or 0.0
+    return {
+        f'{INDEXES_PATH}/{field}/{value}/{job_id}': epoch
+        for field, values in index_values(job).items() for value in values
+    }
+
+
+def index_updates(job_id, before, after):
+    """
+    Returns the multi-location update that moves a job's index entries from ``before`` to ``after``.
+    Args:
+        job_id (str): The print_jobs key of the job.
+        before (dict): The job before the write, or None for a new job.
+        after (dict): The job after the write, or None if it was deleted.
+    """
+    old = index_entries(job_id, before)
+    new = index_entries(job_id, after)
+    updates = {path: None for path in old if path not in new}
+    updates.update({path: epoch for path, epoch in new.items() if old.get(path) != epoch})
+    return updates
+
+
+def index_job(job_id, before, after):
+    """Keeps the indexes in step with one write to a job. Call it after every write."""
+    updates = index_updates(job_id, before, after)
+    if updates:
+        db.reference('/').update(updates)
+
+
+def matches(job, filters):
+    """True if the job has every filtered value (filters: {field: value})."""
+    values = index_values(job)
+    return all(_key(value) in values[field] for field, value in filters.items())
+
+
+def _window(ref, direction, boundary, limit):
+    """
+    Up to ``limit`` raw (epoch, job_id) entries of an index node from the boundary on, in page direction.
+    Returns:
+        tuple: (entries strictly past the boundary, whether the node ran out)
+    """
+    query = ref.order_by_value()
+    if direction == 'after':
+        query = (query.start_at(boundary[0]) if boundary else query).limit_to_first(limit)
+    else:
+        query = (query.end_at(boundary[0]) if boundary else query).limit_to_last(limit)
+    raw = sorted(((epoch, job_id) for job_id, epoch in (query.get() or {}).items()),
+                 reverse=direction == 'before')
+    if boundary:
+        raw_count = len(raw)
+        raw = [entry for entry in raw if (entry > boundary if direction == 'after' else entry < boundary)]
+        return raw, raw_count < limit
+    return raw, len(raw) < limit
+
+
+def fetch_jobs(job_ids):
+    """The jobs with the given ids, in order (None for a missing one), from the mirror when it is healthy."""
+    jobs_mirror = mirror.get_mirror('print_jobs')
+    if jobs_mirror is not None:
+        return [jobs_mirror.read(job_id) for job_id in job_ids]
+    return data_access.map_reads(lambda job_id: db.reference(f'print_jobs/{job_id}').get(), job_ids)
+
+
+def fetch_page(page_size, cursor=None, filters=None):
+    """
+    Fetches one page of the jobs matching every filter, ordered by creation time.
+    Args:
+        page_size (int): Number of jobs per page.
+        cursor (dict, optional): Decoded cursor token; None for the first page.
+        filters (dict): {field: value} with fields from FILTER_FIELDS (at least one).
+    Returns:
+        tuple: (list of (job_id, job), page number, next token or None, prev token or None)
+    """
+    lead = next(field for field in FILTER_FIELDS if field in filters)
+    ref = db.reference(f'{INDEXES_PATH}/{lead}/{_key(filters[lead])}')
+    direction = cursor['d'] if cursor else 'after'
+    boundary = (cursor['c'], cursor['k']) if cursor and cursor.get('c') is not None else None
+
+    # Index entries whose job fails another filter (or was archived) are skipped, so the
+    # window grows until it yields a full page (plus one row, to know if there is a next page)
+    rows, limit = [], page_size + 1
+    while len(rows) <= page_size:
+        entries, exhausted = _window(ref, direction, boundary, limit)
+        jobs = fetch_jobs([job_id for _, job_id in entries])
+        rows += [(job_id, job) for (_, job_id), job in zip(entries, jobs) if job and matches(job, filters)]
+        if exhausted:
+            break
+        if entries:
+            boundary = entries[-1]
+        limit *= 2
+    rows = rows[:page_size + 1]
+    if direction == 'before':
+        rows.reverse()
+    return pagination.paginate(rows, page_size, cursor, lambda job: job_epoch(job) or 0.0)
+
+
+def rebuild_indexes():
+    """Backfills ``job_indexes`` from a full scan of print_jobs."""
+    all_jobs = db.reference('print_jobs').get() or {}
+    indexes = {}
+    for job_id, job in all_jobs.items():
+        for path, epoch in index_entries(job_id, job).items():
+            _, field, value, _ = path.split('/')
+            indexes.setdefault(field, {}).setdefault(value, {})[job_id] = epoch
+    db.reference(INDEXES_PATH).set(indexes)
+    return sum(len(jobs) for values in indexes.values() for jobs in values.values())
+
+
+if __name__ == '__main__':
+    # Backfill: python job_indexes.py (the Firebase app is initialized by firebase_config)
+    print(f"Wrote {rebuild_indexes()} index entries")
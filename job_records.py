@@ -0,0 +1,109 @@
+"""
+Compact rows for the job tables.
+
+The dashboard and /jobs tables show one row per print detail, and the live
+feed keeps today's rows in memory between refreshes. A ``JobRow`` holds a
+row in ``__slots__`` instead of a ten-key dict, and its status and color mode
+are interned, so every row shares the same few strings instead of carrying
+its own copies from the decoded JSON. Templates read the fields as
+attributes (``job.status``) either way; ``as_dict()`` gives the JSON form.
+"""
+import sys
+
+ROW_FIELDS = (
+    'id', 'job_id', 'file_name', 'status', 'created_at', 'pages_to_print',
+    'color_mode', 'total_price', 'inserted_amount', 'total_pages',
+)
+
+
+def _interned(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def _money(value):
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class JobRow:
+    """One print detail of a job, as shown in the job tables."""
+    __slots__ = ROW_FIELDS
+
+    def __init__(self, id='', job_id='', file_name='', status='', created_at='', pages_to_print=0,
+                 color_mode='', total_price=0.0, inserted_amount=0.0, total_pages=0):
+        self.id = id
+        self.job_id = job_id
+        self.file_name = file_name
+        self.status = _interned(status)
+        self.created_at = created_at
+        self.pages_to_print = pages_to_print
+        self.color_mode = _interned(color_mode)
+        self.total_price = total_price
+        self.inserted_amount = inserted_amount
+        self.total_pages = total_pages
+
+    @classmethod
+    def from_detail(cls, job_id, created_at, detail):
+        """
+        Builds the row of one entry of a job's ``details`` list.
+        Args:
+            job_id (str): The print_jobs key of the job.
+            created_at: The job's created_at, shared by all its rows.
+            detail (dict): The detail.
+        """
+        return cls(
+            id=detail.get('id', ''),
+            job_id=job_id,
+            file_name=detail.get('file_name', ''),
+            status=detail.get('status', ''),
+            created_at=created_at,
+            pages_to_print=detail.get('pages_to_print', 0),
+            color_mode=detail.get('color_mode', ''),
+            total_price=_money(detail.get('total_price')),
+            inserted_amount=_money(detail.get('inserted_amount')),
+            total_pages=detail.get('total_pages', 0),
+        )
+
+    def as_dict(self):
+        return {field: getattr(self, field) for field in ROW_FIELDS}
+
+    def __eq__(self, other):
+        if not isinstance(other, JobRow):
+            return NotImplemented
+        return all(getattr(self, field) == getattr(other, field) for field in ROW_FIELDS)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"JobRow(job_id={self.job_id!r}, id={self.id!r}, status={self.status!r})"
+
+
+def job_details(job):
+    """
+    The print details of a job as a list of dicts. Firebase returns a list with gaps as a
+    dict keyed by index, and entries that are not dicts are skipped.
+    """
+    details = (job or {}).get('details') or []
+    if isinstance(details, dict):
+        details = list(details.values())
+    if not isinstance(details, list):
+        return []
+    return [detail for detail in details if isinstance(detail, dict)]
+
+
+def job_rows(job_id, job, keep=None):
+    """
+    The table rows of a job: one per print detail.
+    Args:
+        job_id (str): The print_jobs key of the job.
+        job (dict): The job.
+        keep (callable, optional): Takes a detail dict; details it rejects get no row.
+    """
+    created_at = job.get('created_at', '')
+    return [
+        JobRow.from_detail(job_id, created_at, detail)
+        for detail in job_details(job)
+        if keep is None or keep(detail)
+    ]
@@ -0,0 +1,133 @@
+"""
+Prefix search over job file names.
+
+Every job is listed once under its normalized file name (lowercase ASCII
+words separated by single spaces, see ``normalize``) followed by its id:
+
+    job_search/{normalized file name}|{job_id}   -> created_at epoch
+
+The node is a sorted key list: a search is one ``order_by_key()`` range
+query from the normalized prefix to prefix + '\\uf8ff', which the database
+answers from its key order without an index rule or a scan, and the key of
+the last hit is the cursor of the next page. Pages list jobs by file name.
+Archived jobs leave this node; their keys are merged in from the archive
+segments (see archive.search_rows).
+"""
+import re
+import unicodedata
+
+from firebase_config import db
+
+import job_indexes
+import pagination
+from partitions import job_epoch
+
+SEARCH_PATH = 'job_search'
+
+# Separates the normalized name from the job id in a key (never produced by normalize())
+KEY_SEPARATOR = '|'
+
+# Keys are limited to 768 bytes; longer names are indexed by their start
+MAX_NAME_LENGTH = 200
+
+
+def normalize(name):
+    """'Résumé_Final (2).PDF' -> 'resume final 2 pdf'"""
+    text = unicodedata.normalize('NFKD', str(name or '')).encode('ascii', 'ignore').decode('ascii').lower()
+    return ' '.join(re.findall(r'[a-z0-9]+', text))[:MAX_NAME_LENGTH].rstrip()
+
+
+def job_file_name(job):
+    # Admin uploads store file_name, kiosk uploads document_name
+    job = job or {}
+    return job.get('file_name') or job.get('document_name') or ''
+
+
+def search_key(job_id, job):
+    """The job's key under job_search, or None if it has no file name to search."""
+    name = normalize(job_file_name(job))
+    return f'{name}{KEY_SEPARATOR}{job_id}' if name else None
+
+
+def key_job_id(key):
+    return key.rsplit(KEY_SEPARATOR, 1)[-1]
+
+
+def index_updates(job_id, before, after):
+    """Returns the multi-location update that moves a job's search entry from ``before`` to ``after``."""
+    old, new = search_key(job_id, before), search_key(job_id, after)
+    updates = {}
+    if old and old != new:
+        updates[f'{SEARCH_PATH}/{old}'] = None
+    if new and (new != old or job_epoch(before) != job_epoch(after)):
+        updates[f'{SEARCH_PATH}/{new}'] = job_epoch(after) or 0.0
+    return updates
+
+
+def index_job(job_id, before, after):
+    """Keeps the search index in step with one write to a job. Call it after every write."""
+    updates = index_updates(job_id, before, after)
+    if updates:
+        db.reference('/').update(updates)
+
+
+def _key_rows(prefix, page_size, cursor):
+    """Up to page_size + 1 (key, job_id) rows matching the prefix, from the cursor on, in its direction."""
+    query = db.reference(SEARCH_PATH).order_by_key()
+    start, end = prefix, prefix + '\uf8ff'
+    direction = cursor['d'] if cursor else 'after'
+    if cursor is None or direction == 'after':
+        # start_at() includes the cursor's own key, so one more is read and it is dropped
+        start = max(start, cursor['k']) if cursor else start
+        keys = list(query.start_at(start).end_at(end).limit_to_first(page_size + 2).get() or {})
+        keys = [key for key in sorted(keys) if cursor is None or key > cursor['k']][:page_size + 1]
+    else:
+        end = min(end, cursor['k'])
+        keys = list(query.start_at(start).end_at(end).limit_to_last(page_size + 2).get() or {})
+        keys = [key for key in sorted(keys) if key < cursor['k']][-(page_size + 1):]
+    return [(key, key_job_id(key)) for key in keys]
+
+
+def search(prefix, page_size, cursor=None):
+    """
+    Finds the jobs whose normalized file name starts with the normalized ``prefix``.
+    Args:
+        prefix (str): What the admin typed.
+        page_size (int): Number of jobs per page.
+        cursor (dict, optional): Decoded cursor token; None for the first page.
+    Returns:
+        tuple: (list of (job_id, job), page number, next token or None, prev token or None),
+        ordered by file name. Archived jobs are found too; jobs deleted since they were indexed are left out.
+    """
+    import archive  # archive imports this module
+
+    prefix = normalize(prefix)
+    if not prefix:
+        return [], 1, None, None
+    rows = _key_rows(prefix, page_size, cursor)
+    archived_rows = archive.search_rows(prefix, page_size, cursor)
+    if archived_rows:
+        rows = pagination.merge_rows(page_size, cursor, lambda row: row[0], rows, archived_rows)
+    rows, page, next_token, prev_token = pagination.paginate(rows, page_size, cursor, lambda job_id: None)
+    jobs = job_indexes.fetch_jobs([job_id for _, job_id in rows])
+    missing = [key for (key, _), job in zip(rows, jobs) if not job]
+    archived = archive.find_jobs(missing) if missing and archived_rows else {}
+    jobs = [job or archived.get(job_id) for (_, job_id), job in zip(rows, jobs)]
+    return [(job_id, job) for (_, job_id), job in zip(rows, jobs) if job], page, next_token, prev_token
+
+
+def rebuild_search():
+    """Backfills ``job_search`` from a full scan of print_jobs."""
+    all_jobs = db.reference('print_jobs').get() or {}
+    entries = {}
+    for job_id, job in all_jobs.items():
+        key = search_key(job_id, job)
+        if key:
+            entries[key] = job_epoch(job) or 0.0
+    db.reference(SEARCH_PATH).set(entries)
+    return len(entries)
+
+
+if __name__ == '__main__':
+    # Backfill: python job_search.py (the Firebase app is initialized by firebase_config)
+    print(f"Indexed {rebuild_search()} file names")
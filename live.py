@@ -0,0 +1,189 @@
+"""
+Live dashboard updates over Socket.IO.
+
+One ChangeFeed per process watches the data behind the dashboard and pushes
+small events to every signed-in dashboard (all joined to the 'dashboard' room):
+
+    job_added      {job_id, rows}      a job created today
+    job_status     {job_id, rows}      one of today's jobs changed (e.g. a detail's status)
+    paper          {remaining_paper, last_refilled}
+    prices         {black_price, color_price}
+    today_totals   {day, jobs, completed, revenue, total_jobs}
+
+With the Firebase backend the feed listens to ``rollups/daily`` (every job
+write bumps its day's version) and ``current`` (the price and paper pointers);
+with SQLite it polls the day's data_version. Either way a change wakes one
+background task that re-reads the dashboard state and emits only what differs
+from the last state sent, so any number of open dashboards costs one
+subscription and one read per change instead of a polling loop each.
+"""
+import os
+import threading
+import time
+from datetime import datetime
+
+import current_values
+import firebase_metrics
+import job_records
+from firebase_config import db
+
+ROOM = 'dashboard'
+
+# Nodes listened to with the Firebase backend
+WATCHED_PATHS = ('rollups/daily', 'current')
+
+# How often the feed re-reads without a change notification (SQLite has none, so this is its polling rate);
+# with Firebase it only catches changes lost while a stream was down
+POLL_INTERVAL = float(os.environ.get('PRINTECH_LIVE_POLL_INTERVAL', 5))
+RESYNC_INTERVAL = 60
+
+# Notifications arriving this close together are handled with one re-read
+# (it also gives the mirror time to apply the same change)
+DEBOUNCE_SECONDS = 0.5
+
+
+def _row_dicts(rows):
+    return [row.as_dict() for row in rows]
+
+
+def paper_summary(paper, last_refill):
+    """
+    The dashboard's paper card.
+    Args:
+        paper (dict): Newest printer status row, or None.
+        last_refill (dict): Newest refill row, or None.
+    Returns:
+        tuple: (remaining paper, last refilled date as 'Month DD, YYYY' or 'N/A')
+    """
+    if not paper:
+        return 0, 'N/A'
+    last_refilled = (last_refill or paper).get('updated_at', 'N/A')
+    if isinstance(last_refilled, str) and last_refilled != 'N/A':
+        try:
+            last_refilled = datetime.strptime(last_refilled, '%Y-%m-%d %H:%M:%S').strftime('%B %d, %Y')
+        except Exception:
+            pass
+    return paper.get('remaining_paper', 0), last_refilled
+
+
+class ChangeFeed:
+    """The process-wide source of dashboard events."""
+
+    def __init__(self, socketio, repo):
+        self.socketio = socketio
+        self.repo = repo
+        self.registrations = []
+        self.refreshes = 0
+        self.last_error = None
+        self._wake = threading.Event()
+        self._start_lock = threading.Lock()
+        self._started = False
+        self._day = None
+        self._version = None
+        self._jobs = None  # {job_id: rows} of today; None until the first read
+        self._sent = {}
+
+    def ensure_started(self):
+        """Subscribes and starts the background task once. Safe to call on every connect."""
+        if self._started:
+            return
+        with self._start_lock:
+            if self._started:
+                return
+            if self.repo.name == 'firebase':
+                for path in WATCHED_PATHS:
+                    self.registrations.append(db.reference(path).listen(self._listener(path)))
+            self.socketio.start_background_task(self._run)
+            self._started = True
+
+    def _listener(self, path):
+        def on_event(event):
+            if path == 'current':
+                # The pointers may have been written by another process (the kiosk)
+                current_values.invalidate()
+            elif event.path.strip('/').split('/')[0] not in ('', datetime.now().strftime('%Y-%m-%d')):
+                return  # another day's rollup
+            self._wake.set()
+        return on_event
+
+    def _run(self):
+        with firebase_metrics.route_label('live'):
+            while True:
+                self._wake.wait(RESYNC_INTERVAL if self.registrations else POLL_INTERVAL)
+                time.sleep(DEBOUNCE_SECONDS)
+                self._wake.clear()
+                try:
+                    for event, payload in self.refresh():
+                        self.socketio.emit(event, payload, to=ROOM)
+                    self.last_error = None
+                except Exception as err:
+                    self.last_error = f"{type(err).__name__}: {err}"
+                    print(f"Error refreshing live dashboard feed: {err}")
+
+    def refresh(self):
+        """
+        Re-reads the dashboard state and returns the changes since the last call.
+        Returns:
+            list: (event name, payload) pairs.
+        """
+        self.refreshes += 1
+        events = []
+        today = datetime.now().strftime('%Y-%m-%d')
+        if today != self._day:
+            # A new day starts with an empty table (and no job events for the very first read)
+            self._day, self._version = today, None
+            self._jobs = {} if self._jobs is not None else None
+
+        version = self.repo.data_version(today, today)
+        if version != self._version:
+            jobs = {job_id: job_records.job_rows(job_id, job) for job_id, job in self.repo.iter_jobs(today, today)}
+            if self._jobs is not None:
+                for job_id, rows in jobs.items():
+                    if job_id not in self._jobs:
+                        events.append(('job_added', {'job_id': job_id, 'rows': _row_dicts(rows)}))
+                    elif rows != self._jobs[job_id]:
+                        events.append(('job_status', {'job_id': job_id, 'rows': _row_dicts(rows)}))
+            self._jobs, self._version = jobs, version
+            todays_rollup = self.repo.daily(today)
+            self._queue(events, 'today_totals', {
+                'day': today,
+                'jobs': todays_rollup['jobs'],
+                'completed': todays_rollup['completed'],
+                'revenue': todays_rollup['revenue'],
+                'total_jobs': self.repo.totals()['jobs'],
+            })
+
+        remaining_paper, last_refilled = paper_summary(self.repo.latest_paper(), self.repo.last_refill())
+        self._queue(events, 'paper', {'remaining_paper': remaining_paper, 'last_refilled': last_refilled})
+        prices = self.repo.latest_prices()
+        self._queue(events, 'prices', {'black_price': prices.get('black_price'), 'color_price': prices.get('color_price')})
+        return events
+
+    def _queue(self, events, event, payload):
+        # The first value of each kind only primes the feed: open pages were rendered with it
+        previous = self._sent.get(event)
+        self._sent[event] = payload
+        if previous is not None and previous != payload:
+            events.append((event, payload))
+
+    def health(self):
+        return {
+            'started': self._started,
+            'subscriptions': len(self.registrations),
+            'refreshes': self.refreshes,
+            'last_error': self.last_error,
+        }
+
+
+_feed = None
+_feed_lock = threading.Lock()
+
+
+def get_feed(socketio, repo):
+    """The process-wide ChangeFeed, created on first use (not when a report worker imports the app)."""
+    global _feed
+    if _feed is None:
+        with _feed_lock:
+            if _feed is None:
+                _feed = ChangeFeed(socketio, repo)
+    return _feed
@@ -0,0 +1,406 @@
+"""
+Listener-backed in-memory mirror of frequently read Firebase nodes.
+
+Each mirrored node is subscribed to once per process with
+``db.reference(path).listen()``; the initial snapshot and every streamed
+put/patch delta are applied to a local copy. Route handlers read that copy
+through ``get_or_fetch``/``get_mirror`` and fall back to a network read
+whenever the mirror is not ready or not healthy, so a dropped stream only
+costs speed, never correctness.
+
+Snapshots are replaced copy-on-write (only the dicts along the changed path
+are copied), so readers can iterate a snapshot without holding a lock. Large
+fields such as a job's base64 ``file_data`` are dropped before they are stored;
+a read that needs them goes to the network.
+"""
+import bisect
+import os
+import threading
+import time
+
+import firebase_metrics
+from firebase_config import db
+
+# Nodes the admin app keeps in memory (prices and paper level are read from the
+# small current/ pointers instead, see current_values.py)
+MIRRORED_PATHS = ('print_jobs', 'rollups')
+
+# Fields of a mirrored node's children that are never kept in memory (file contents
+# are large and only the single-job download reads them, from the network)
+EXCLUDED_FIELDS = {'print_jobs': ('file_data',)}
+
+# An ordering with more changed children than this share of the node is re-sorted
+# from scratch instead of being patched entry by entry
+RESORT_SHARE = 0.25
+
+# Set FIREBASE_MIRROR=0 to always read from the network
+MIRROR_ENABLED = os.environ.get('FIREBASE_MIRROR', '1') != '0'
+
+# How often the watchdog checks the streams, and how long the newest key seen
+# by the server may be missing locally before the stream is considered lagging
+WATCHDOG_INTERVAL = float(os.environ.get('FIREBASE_MIRROR_WATCHDOG_INTERVAL', 30))
+MAX_LAG_SECONDS = float(os.environ.get('FIREBASE_MIRROR_MAX_LAG', 60))
+
+# Nodes whose children are push keys, so the newest key can be probed cheaply
+_PUSH_KEYED = {'print_jobs', 'printer_status', 'print_prices'}
+
+
+def _split(path):
+    return [part for part in str(path).strip('/').split('/') if part]
+
+
+def _with_value(node, parts, value):
+    """Returns a copy of ``node`` with ``value`` stored at ``parts``; only the spine is copied."""
+    if not parts:
+        return value
+    head, rest = parts[0], parts[1:]
+    if isinstance(node, list) and head.isdigit() and int(head) <= len(node):
+        base = list(node)
+        index = int(head)
+        child = _with_value(base[index] if index < len(base) else None, rest, value)
+        if index == len(base):
+            if child is not None:
+                base.append(child)
+        elif child is None and index == len(base) - 1:
+            base.pop()
+        else:
+            base[index] = child
+        return base or None
+    if isinstance(node, list):
+        node = {str(i): v for i, v in enumerate(node) if v is not None}
+    base = dict(node) if isinstance(node, dict) else {}
+    child = _with_value(base.get(head), rest, value)
+    if child is None:
+        base.pop(head, None)
+    else:
+        base[head] = child
+    return base or None
+
+
+def _with_patch(node, parts, changes):
+    """
+    Returns a copy of ``node`` with a patch event applied at ``parts``. The patched node is
+    copied once for all of its children, so a multi-path update of N children costs O(N).
+    """
+    target = _walk(node, parts)
+    if isinstance(target, list):
+        for child_path, value in changes.items():
+            node = _with_value(node, parts + _split(child_path), value)
+        return node
+    patched = dict(target) if isinstance(target, dict) else {}
+    for child_path, value in changes.items():
+        child_parts = _split(child_path)
+        if not child_parts:
+            continue
+        child = _with_value(patched.get(child_parts[0]), child_parts[1:], value)
+        if child is None:
+            patched.pop(child_parts[0], None)
+        else:
+            patched[child_parts[0]] = child
+    return _with_value(node, parts, patched or None)
+
+
+def _walk(node, parts):
+    for part in parts:
+        if isinstance(node, dict):
+            node = node.get(part)
+        elif isinstance(node, list) and part.isdigit() and int(part) < len(node):
+            node = node[int(part)]
+        else:
+            return None
+    return node
+
+
+def _without_fields(parts, data, fields):
+    """
+    Returns the data of a write at ``parts`` with ``fields`` of the node's children removed.
+    A write into one of those fields becomes a delete, which is a no-op locally.
+    """
+    if not fields:
+        return data
+    if len(parts) >= 2:
+        return None if parts[1] in fields else data
+    if len(parts) == 1:
+        if not isinstance(data, dict):
+            return data
+        return {key: value for key, value in data.items() if key not in fields}
+    if not isinstance(data, dict):
+        return data
+    return {key: _without_fields([key], value, fields) for key, value in data.items()}
+
+
+def _changed_children(parts, event):
+    """The children of the node touched by an event, or None when the whole node was replaced."""
+    if parts:
+        return {parts[0]}
+    if event.event_type == 'patch':
+        return {_split(child_path)[0] for child_path in (event.data or {}) if _split(child_path)}
+    return None
+
+
+def sort_key(value, key):
+    # Realtime Database ordering: null, false, true, numbers, strings, objects; then key
+    if value is None:
+        rank = (0, 0)
+    elif isinstance(value, bool):
+        rank = (1, int(value))
+    elif isinstance(value, (int, float)):
+        rank = (2, value)
+    elif isinstance(value, str):
+        rank = (3, value)
+    else:
+        rank = (4, 0)
+    return rank, key
+
+
+def _child_sort_key(value, child, key):
+    return sort_key(value.get(child) if isinstance(value, dict) else None, key)
+
+
+class _ChildOrder:
+    """The children of a snapshot ordered by one child field, patched lazily as children change."""
+
+    def __init__(self, child, snapshot):
+        self.child = child
+        self.pending = set()
+        self.rebuild(snapshot)
+
+    def rebuild(self, snapshot):
+        decorated = sorted(
+            (_child_sort_key(value, self.child, key), key, value) for key, value in (snapshot or {}).items()
+        )
+        self.items = [(key, value) for _, key, value in decorated]
+        self.sort_keys = [entry[0] for entry in decorated]
+        self.key_of = {key: entry_key for entry_key, key, _ in decorated}
+        self.pending = set()
+
+    def refresh(self, snapshot):
+        """Brings the order up to date with ``snapshot``; readers of the old lists are unaffected."""
+        if not self.pending:
+            return
+        if len(self.pending) > RESORT_SHARE * max(len(self.items), 1):
+            self.rebuild(snapshot)
+            return
+        items, sort_keys, key_of = list(self.items), list(self.sort_keys), dict(self.key_of)
+        snapshot = snapshot or {}
+        for key in self.pending:
+            old = key_of.pop(key, None)
+            if old is not None:
+                index = bisect.bisect_left(sort_keys, old)
+                del items[index], sort_keys[index]
+            value = snapshot.get(key)
+            if value is not None:
+                new = _child_sort_key(value, self.child, key)
+                index = bisect.bisect_left(sort_keys, new)
+                items.insert(index, (key, value))
+                sort_keys.insert(index, new)
+                key_of[key] = new
+        self.items, self.sort_keys, self.key_of = items, sort_keys, key_of
+        self.pending = set()
+
+
+class NodeMirror:
+    """In-memory copy of one Firebase node kept current by a streaming listener."""
+
+    def __init__(self, path):
+        self.path = path
+        self._snapshot = None
+        self._ordered = {}
+        self._order_lock = threading.Lock()
+        self._registration = None
+        self._lock = threading.Lock()
+        self.ready = False
+        self.started_at = None
+        self.last_event_at = None
+        self.events = 0
+        self.restarts = 0
+        self.last_error = None
+        self._lag_since = None
+
+    # --- Stream handling ---
+    def start(self):
+        with self._lock:
+            if self._registration is not None:
+                return
+            self.ready = False
+            self._lag_since = None
+            self.started_at = time.time()
+            try:
+                with firebase_metrics.route_label('mirror'):
+                    self._registration = db.reference(self.path).listen(self._on_event)
+            except Exception as err:
+                self.last_error = f"{type(err).__name__}: {err}"
+                self._registration = None
+
+    def stop(self):
+        with self._lock:
+            registration, self._registration = self._registration, None
+            self.ready = False
+        if registration is not None:
+            try:
+                registration.close()
+            except Exception as err:
+                self.last_error = f"{type(err).__name__}: {err}"
+
+    def restart(self):
+        self.stop()
+        self.restarts += 1
+        self.start()
+
+    def _on_event(self, event):
+        parts = _split(event.path)
+        fields = EXCLUDED_FIELDS.get(self.path)
+        if event.event_type == 'put':
+            snapshot = _with_value(self._snapshot, parts, _without_fields(parts, event.data, fields))
+        elif event.event_type == 'patch':
+            changes = {
+                child_path: _without_fields(parts + _split(child_path), value, fields)
+                for child_path, value in (event.data or {}).items()
+            }
+            snapshot = _with_patch(self._snapshot, parts, changes)
+        else:
+            return
+        changed = _changed_children(parts, event)
+        with self._order_lock:
+            self._snapshot = snapshot
+            if changed is None:
+                self._ordered = {}
+            else:
+                for order in self._ordered.values():
+                    order.pending.update(changed)
+        self.events += 1
+        self.last_event_at = time.time()
+        self.ready = True
+
+    def is_streaming(self):
+        registration = self._registration
+        if registration is None:
+            return False
+        thread = getattr(registration, '_thread', None)
+        return thread.is_alive() if thread is not None else True
+
+    # --- Health ---
+    def check_lag(self):
+        """Compares the newest key on the server with the local copy (push-keyed nodes only)."""
+        if self.path not in _PUSH_KEYED or not self.ready:
+            return
+        newest = db.reference(self.path).order_by_key().limit_to_last(1).get() or {}
+        missing = [key for key in newest if key not in (self._snapshot or {})]
+        if not missing:
+            self._lag_since = None
+        elif self._lag_since is None:
+            self._lag_since = time.time()
+
+    def lag_seconds(self):
+        return time.time() - self._lag_since if self._lag_since else 0.0
+
+    def is_healthy(self):
+        return self.ready and self.is_streaming() and self.lag_seconds() <= MAX_LAG_SECONDS
+
+    def health(self):
+        now = time.time()
+        return {
+            'path': self.path,
+            'ready': self.ready,
+            'streaming': self.is_streaming(),
+            'healthy': self.is_healthy(),
+            'events': self.events,
+            'restarts': self.restarts,
+            'last_event_age': round(now - self.last_event_at, 1) if self.last_event_at else None,
+            'lag_seconds': round(self.lag_seconds(), 1),
+            'last_error': self.last_error,
+        }
+
+    # --- Reads ---
+    def snapshot(self):
+        """Returns the current copy of the node. Treat it as read-only."""
+        return self._snapshot
+
+    def read(self, path=''):
+        return _walk(self._snapshot, _split(path))
+
+    def ordered_items(self, child):
+        """
+        Returns (items, sort_keys) ordered like ``order_by_child(child)``. The order is sorted on
+        first use and afterwards only the children changed since the last read are moved.
+        ``items`` is a list of (key, value) and ``sort_keys`` the matching list of ``sort_key`` tuples.
+        """
+        with self._order_lock:
+            order = self._ordered.get(child)
+            if order is None:
+                order = self._ordered[child] = _ChildOrder(child, self._snapshot)
+            else:
+                order.refresh(self._snapshot)
+            return order.items, order.sort_keys
+
+    def window(self, child, start=None, end=None):
+        """
+        Returns (items, sort_keys, lo, hi) where items[lo:hi] lie between start and end (inclusive).
+        """
+        items, sort_keys = self.ordered_items(child)
+        lo = bisect.bisect_left(sort_keys, (sort_key(start, '')[0], '')) if start is not None else 0
+        hi = bisect.bisect_right(sort_keys, (sort_key(end, '')[0], '\uffff')) if end is not None else len(items)
+        return items, sort_keys, lo, hi
+
+    def range(self, child, start=None, end=None):
+        """Local equivalent of ``order_by_child(child).start_at(start).end_at(end).get()``."""
+        items, _, lo, hi = self.window(child, start, end)
+        return items[lo:hi]
+
+
+_mirrors = {}
+_start_lock = threading.Lock()
+_watchdog = None
+
+
+def _watch():
+    with firebase_metrics.route_label('mirror'):
+        _watch_forever()
+
+
+def _watch_forever():
+    while True:
+        time.sleep(WATCHDOG_INTERVAL)
+        for node in list(_mirrors.values()):
+            try:
+                if not node.is_streaming() or node.lag_seconds() > MAX_LAG_SECONDS:
+                    print(f"Mirror of '{node.path}' dropped or lagging, resubscribing")
+                    node.restart()
+                else:
+                    node.check_lag()
+            except Exception as err:
+                node.last_error = f"{type(err).__name__}: {err}"
+
+
+def ensure_started(paths=MIRRORED_PATHS):
+    """Subscribes the process-wide mirrors once. Safe to call on every request."""
+    global _watchdog
+    if not MIRROR_ENABLED or _watchdog is not None:
+        return
+    with _start_lock:
+        if _watchdog is not None:
+            return
+        for path in paths:
+            node = _mirrors.setdefault(path, NodeMirror(path))
+            node.start()
+        _watchdog = threading.Thread(target=_watch, name='firebase-mirror-watchdog', daemon=True)
+        _watchdog.start()
+
+
+def get_mirror(path):
+    """Returns the healthy mirror for a top-level node, or None to read from the network."""
+    node = _mirrors.get(path)
+    return node if node is not None and node.is_healthy() else None
+
+
+def get_or_fetch(path, fetch):
+    """Reads ``path`` from the mirror covering it, or calls ``fetch()`` when there is none."""
+    parts = _split(path)
+    node = get_mirror(parts[0]) if parts else None
+    if node is None:
+        return fetch()
+    return node.read('/'.join(parts[1:]))
+
+
+def health_report():
+    return {path: node.health() for path, node in _mirrors.items()}
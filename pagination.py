@@ -0,0 +1,166 @@
+"""
+Keyset (cursor) pagination over print_jobs ordered by created_at_ts.
+
+The admin upload writes ``created_at`` as a formatted string and the kiosk as
+an epoch float, so pages are ordered by the numeric ``created_at_ts`` every
+job carries (set on write, backfilled by partitions.rebuild_partitions).
+A page is fetched with ``order_by_child('created_at_ts')`` plus ``start_at``/``end_at``
+and ``limit_to_first``/``limit_to_last``, so each page view downloads roughly
+one page of jobs instead of the whole tree. When the in-memory mirror of
+print_jobs is healthy the same page is cut from the local copy instead.
+The position between pages is carried in an opaque URL-safe token holding the
+(created_at_ts, key) of the boundary job and the page number for display.
+``merge_rows`` combines the rows of several stores (the hot store and the
+archive) into one page.
+"""
+import base64
+import bisect
+import json
+
+from firebase_config import db
+
+import mirror
+
+
+def encode_cursor(direction, created_at, key, page):
+    payload = json.dumps({'d': direction, 'c': created_at, 'k': key, 'p': page}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """Returns the cursor dict for a token, or None if the token is missing or malformed."""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        cursor = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(cursor, dict) or cursor.get('d') not in ('after', 'before') or 'k' not in cursor:
+        return None
+    # A hand-edited token falls back to the first page instead of failing the page
+    page = cursor.get('p', 1)
+    if isinstance(page, bool) or not isinstance(page, int) or page < 1:
+        return None
+    key, value = cursor['k'], cursor.get('c')
+    if not isinstance(key, str) or isinstance(value, bool) or not isinstance(value, (str, int, float, type(None))):
+        return None
+    return cursor
+
+
+def _query(order_by, start=None, end=None):
+    query = db.reference('print_jobs').order_by_child(order_by)
+    if start is not None:
+        query = query.start_at(start)
+    if end is not None:
+        query = query.end_at(end)
+    return query
+
+
+def _remote_rows(page_size, cursor, start, end, order_by):
+    direction = cursor['d'] if cursor else 'after'
+    limit = page_size + 1
+    while True:
+        if cursor is None:
+            query = _query(order_by, start, end).limit_to_first(limit)
+        elif direction == 'after':
+            query = _query(order_by, start if cursor['c'] is None else cursor['c'], end).limit_to_first(limit)
+        else:
+            query = _query(order_by, start, end if cursor['c'] is None else cursor['c']).limit_to_last(limit)
+        raw = list((query.get() or {}).items())
+        raw.sort(key=lambda item: mirror.sort_key(item[1].get(order_by), item[0]))
+        rows = raw
+        if cursor is not None:
+            boundary = mirror.sort_key(cursor['c'], cursor['k'])
+            if direction == 'after':
+                rows = [item for item in raw if mirror.sort_key(item[1].get(order_by), item[0]) > boundary]
+            else:
+                rows = [item for item in raw if mirror.sort_key(item[1].get(order_by), item[0]) < boundary]
+        # Jobs sharing the cursor's created_at_ts are dropped above; widen the window if that left us short
+        if len(rows) > page_size or len(raw) < limit:
+            return rows
+        limit += page_size
+
+
+def _local_rows(source, page_size, cursor, start, end, order_by):
+    items, sort_keys, lo, hi = source.window(order_by, start, end)
+    if cursor is None:
+        return items[lo:min(hi, lo + page_size + 1)]
+    boundary = mirror.sort_key(cursor['c'], cursor['k'])
+    if cursor['d'] == 'after':
+        index = max(lo, bisect.bisect_right(sort_keys, boundary, lo, hi))
+        return items[index:min(hi, index + page_size + 1)]
+    index = min(hi, bisect.bisect_left(sort_keys, boundary, lo, hi))
+    return items[max(lo, index - page_size - 1):index]
+
+
+def fetch_rows(page_size, cursor=None, start=None, end=None, order_by='created_at_ts'):
+    """
+    Fetches the rows behind one page of print_jobs ordered by ``order_by`` (created_at_ts, key):
+    up to page_size + 1 (job_id, job), past the cursor in its direction.
+    Args:
+        page_size (int): Number of jobs per page.
+        cursor (dict, optional): Decoded cursor token; None for the first page.
+        start, end (optional): Inclusive bounds on the ordering value (e.g. epoch seconds of a day).
+    """
+    source = mirror.get_mirror('print_jobs')
+    if source is not None:
+        return _local_rows(source, page_size, cursor, start, end, order_by)
+    return _remote_rows(page_size, cursor, start, end, order_by)
+
+
+def fetch_jobs_page(page_size, cursor=None, start=None, end=None, order_by='created_at_ts'):
+    """
+    Fetches one page of print_jobs ordered by ``order_by`` (created_at_ts, key).
+    Returns:
+        tuple: (list of (job_id, job), page number, next token or None, prev token or None)
+    """
+    rows = fetch_rows(page_size, cursor, start, end, order_by)
+    return paginate(rows, page_size, cursor, lambda job: job.get(order_by))
+
+
+def merge_rows(page_size, cursor, sort_key, *sources):
+    """
+    Merges the rows fetched for one page from several stores (each up to page_size + 1, in the
+    cursor's direction) into the page_size + 1 rows paginate() expects. A row listed by more
+    than one store keeps the first store's copy.
+    Args:
+        sort_key (callable): Returns the ordering key of a row.
+    """
+    merged = {}
+    for rows in sources:
+        for row in rows:
+            merged.setdefault(row[0], row)
+    rows = sorted(merged.values(), key=sort_key)
+    if cursor is not None and cursor['d'] == 'before':
+        return rows[-(page_size + 1):]
+    return rows[:page_size + 1]
+
+
+def paginate(rows, page_size, cursor, order_value):
+    """
+    Cuts the rows fetched for a page (up to page_size + 1, in the cursor's direction) into the
+    page and its next/prev tokens. Shared by every storage backend.
+    Args:
+        order_value (callable): Returns a job's ordering value, stored in the tokens.
+    Returns:
+        tuple: (list of (job_id, job), page number, next token or None, prev token or None)
+    """
+    direction = cursor['d'] if cursor else 'after'
+    page = int(cursor.get('p', 1)) if cursor else 1
+    has_more = len(rows) > page_size
+    if direction == 'after':
+        rows = rows[:page_size]
+        has_next, has_prev = has_more, page > 1
+    else:
+        rows = rows[-page_size:]
+        has_next, has_prev = True, has_more and page > 1
+
+    next_token = prev_token = None
+    if rows and has_next:
+        last_id, last_job = rows[-1]
+        next_token = encode_cursor('after', order_value(last_job), last_id, page + 1)
+    if rows and has_prev:
+        first_id, first_job = rows[0]
+        prev_token = encode_cursor('before', order_value(first_job), first_id, page - 1)
+    return rows, page, next_token, prev_token
@@ -0,0 +1,159 @@
+"""
+Day-partitioned copy of print_jobs for range reads.
+
+Every job is also written under ``print_jobs_by_day/YYYY-MM-DD/{job_id}`` with a
+numeric ``created_at_ts`` (epoch seconds). A report for a date range then reads
+only the day nodes in that range, in parallel, instead of querying the whole
+``print_jobs`` collection on a ``created_at`` field that is sometimes a
+formatted string (admin upload) and sometimes a ``time.time()`` float (kiosk).
+"""
+from datetime import datetime, timedelta
+
+from firebase_config import db
+
+import data_access
+from rollups import job_day
+
+PARTITIONS_PATH = 'print_jobs_by_day'
+
+# Fields that are never copied into a partition (file contents are large and not needed for reports)
+_EXCLUDED_FIELDS = ('file_data',)
+
+
+def job_epoch(job):
+    """Returns the job's creation time as epoch seconds, or None if it has none."""
+    created_at = (job or {}).get('created_at_ts', (job or {}).get('created_at'))
+    if isinstance(created_at, (int, float)):
+        return float(created_at)
+    if isinstance(created_at, str) and created_at:
+        for fmt in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d'):
+            try:
+                return datetime.strptime(created_at, fmt).timestamp()
+            except ValueError:
+                continue
+    return None
+
+
+def partition_entry(job):
+    entry = {key: value for key, value in job.items() if key not in _EXCLUDED_FIELDS}
+    epoch = job_epoch(job)
+    if epoch is not None:
+        entry['created_at_ts'] = epoch
+    return entry
+
+
+def index_updates(job_id, before, after):
+    """
+    Returns the multi-location update that moves a job's day-partition copy from ``before`` to ``after``.
+    Args:
+        job_id (str): The print_jobs key of the job.
+        before (dict): The job before the write, or None for a new job.
+        after (dict): The job after the write, or None if it was deleted.
+    """
+    old_day = job_day(before) if before else None
+    new_day = job_day(after) if after else None
+    updates = {}
+    if old_day and old_day != new_day:
+        updates[f'{PARTITIONS_PATH}/{old_day}/{job_id}'] = None
+    if new_day:
+        updates[f'{PARTITIONS_PATH}/{new_day}/{job_id}'] = partition_entry(after)
+    return updates
+
+
+def index_job(job_id, before, after):
+    """
+    Writes (or refreshes) the day-partition copy of a job, removing it from the day it
+    was under before if created_at changed. Call it after every write to the job.
+    Args:
+        job_id (str): The print_jobs key of the job.
+        before (dict): The job before the write, or None for a new job.
+        after (dict): The job as stored under print_jobs after the write.
+    """
+    updates = index_updates(job_id, before, after)
+    if updates:
+        db.reference('/').update(updates)
+
+
+def days_in_range(start_date, end_date):
+    """Returns every YYYY-MM-DD day between start_date and end_date (inclusive)."""
+    start = datetime.strptime(start_date, '%Y-%m-%d').date()
+    end = datetime.strptime(end_date, '%Y-%m-%d').date()
+    return [(start + timedelta(days=offset)).isoformat() for offset in range((end - start).days + 1)]
+
+
+def fetch_day(day):
+    """Returns {job_id: job} for one day partition."""
+    return db.reference(f'{PARTITIONS_PATH}/{day}').get() or {}
+
+
+def fetch_range(start_date, end_date):
+    """
+    Fetches every job created between start_date and end_date (inclusive, YYYY-MM-DD).
+    Only the day partitions in the range are read, concurrently on the shared read pool.
+    Returns:
+        list: (job_id, job) tuples ordered by created_at_ts.
+    """
+    days = days_in_range(start_date, end_date)
+    if not days:
+        return []
+    day_results = data_access.map_reads(fetch_day, days)
+    jobs = [(job_id, job) for result in day_results for job_id, job in result.items()]
+    jobs.sort(key=lambda item: (item[1].get('created_at_ts') or 0, item[0]))
+    return jobs
+
+
+def epoch_bounds(start_date=None, end_date=None):
+    """
+    Returns (start, end) epoch seconds of the days between start_date and end_date (inclusive, YYYY-MM-DD):
+    the start of the first day and the start of the day after the last one (None for an open end).
+    """
+    range_start = datetime.strptime(start_date, '%Y-%m-%d').timestamp() if start_date else None
+    range_end = (datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)).timestamp() if end_date else None
+    return range_start, range_end
+
+
+def month_days(month):
+    """'2024-02' -> ('2024-02-01', '2024-02-29')"""
+    first = datetime.strptime(month, '%Y-%m').date()
+    last = (first.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+    return first.isoformat(), last.isoformat()
+
+
+def mirror_range(jobs_mirror, start_date, end_date):
+    """
+    Returns the (job_id, job) tuples of a healthy print_jobs mirror created between
+    start_date and end_date (inclusive), ordered by creation time. Both forms of
+    created_at are covered: formatted strings (admin upload) and epoch floats (kiosk).
+    """
+    range_start, range_end = epoch_bounds(start_date, end_date)
+    jobs = jobs_mirror.range('created_at', start_date, end_date + '\uf8ff')
+    jobs += [
+        (job_id, job) for job_id, job in jobs_mirror.range('created_at', range_start, range_end)
+        if job.get('created_at') < range_end
+    ]
+    jobs.sort(key=lambda item: (job_epoch(item[1]) or 0, item[0]))
+    return jobs
+
+
+def rebuild_partitions():
+    """Backfills ``print_jobs_by_day`` (and ``created_at_ts``) from a full scan of print_jobs."""
+    all_jobs = db.reference('print_jobs').get() or {}
+    partitions = {}
+    timestamps = {}
+    for job_id, job in all_jobs.items():
+        day = job_day(job)
+        if not day:
+            continue
+        entry = partition_entry(job)
+        partitions.setdefault(day, {})[job_id] = entry
+        if 'created_at_ts' in entry and 'created_at_ts' not in job:
+            timestamps[f'{job_id}/created_at_ts'] = entry['created_at_ts']
+    db.reference(PARTITIONS_PATH).set(partitions)
+    if timestamps:
+        db.reference('print_jobs').update(timestamps)
+    return len(partitions)
+
+
+if __name__ == '__main__':
+    # Backfill: python partitions.py (the Firebase app is initialized by firebase_config)
+    print(f"Partitioned jobs into {rebuild_partitions()} day(s)")
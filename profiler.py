@@ -0,0 +1,244 @@
+"""
+On-demand sampling profiler for single requests.
+
+An admin adds ``?profile=1`` (or the ``X-Profile: 1`` header) to a request;
+``start()`` then samples the request thread's stack every SAMPLE_INTERVAL
+seconds from a helper thread, and ``finish()`` saves the folded stacks with
+the route, URL and timing as JSON under PROFILES_DIR. Reads that the request
+fans out to data_access pool threads are sampled too. Nothing is started
+(and no hook does more than a flag lookup) when the switch is off.
+
+``/profiles`` lists recent captures; each capture can be viewed as top
+functions or downloaded in the folded format used by flamegraph tools.
+"""
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+
+PROFILES_DIR = os.environ.get('PRINTECH_PROFILES_DIR', os.path.join(os.path.dirname(__file__), 'profiles'))
+
+# Seconds between two stack samples
+SAMPLE_INTERVAL = float(os.environ.get('PRINTECH_PROFILE_INTERVAL', 0.005))
+
+# Oldest captures are deleted beyond this many
+MAX_PROFILES = int(os.environ.get('PRINTECH_MAX_PROFILES', 200))
+
+PROFILE_PARAM = 'profile'
+PROFILE_HEADER = 'X-Profile'
+
+_PROFILE_ID = re.compile(r'^[0-9a-f]{32}$')
+_local = threading.local()
+
+
+def requested(request):
+    """True if the request asks to be profiled (query flag or header)."""
+    return request.args.get(PROFILE_PARAM) == '1' or request.headers.get(PROFILE_HEADER) == '1'
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class Sampler:
+    """Samples the stacks of a set of threads until stopped."""
+
+    def __init__(self, route, interval=SAMPLE_INTERVAL):
+        self.route = route
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._threads = set()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self.duration = None
+
+    def add_thread(self, thread_id):
+        self._threads.add(thread_id)
+
+    def remove_thread(self, thread_id):
+        self._threads.discard(thread_id)
+
+    def sample(self):
+        """Records the current stack of every attached thread once."""
+        frames = sys._current_frames()
+        for thread_id in list(self._threads):
+            frame = frames.get(thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+        self.samples += 1
+
+    def _run(self):
+        # The first sample is taken right away, so a request shorter than the interval still has one
+        while True:
+            self.sample()
+            if self._stop.wait(self.interval):
+                return
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        if not self.samples:
+            self.sample()
+        self.duration = time.perf_counter() - self._started
+        return self
+
+
+def current():
+    """The sampler profiling this thread, or None."""
+    return getattr(_local, 'sampler', None)
+
+
+@contextmanager
+def attach(sampler):
+    """Samples the current thread with ``sampler`` inside the block (no-op for None)."""
+    if sampler is None:
+        yield
+        return
+    thread_id = threading.get_ident()
+    previous = current()
+    _local.sampler = sampler
+    sampler.add_thread(thread_id)
+    try:
+        yield
+    finally:
+        sampler.remove_thread(thread_id)
+        _local.sampler = previous
+
+
+def start(route):
+    """Starts profiling the current thread; returns the Sampler to pass to finish()."""
+    sampler = Sampler(route)
+    sampler.add_thread(threading.get_ident())
+    _local.sampler = sampler
+    return sampler.start()
+
+
+def _profile_path(profile_id):
+    return os.path.join(PROFILES_DIR, f'{profile_id}.json')
+
+
+def finish(sampler, **details):
+    """
+    Stops a sampler and saves its capture.
+    Args:
+        sampler (Sampler): As returned by start().
+        **details: Extra fields stored with the capture (method, url, status...).
+    Returns:
+        str: The profile id.
+    """
+    sampler.stop()
+    if current() is sampler:
+        _local.sampler = None
+    profile_id = uuid.uuid4().hex
+    profile = {
+        'id': profile_id,
+        'route': sampler.route,
+        'created_at': sampler.started_at,
+        'duration_ms': round(sampler.duration * 1000, 2),
+        'interval_ms': sampler.interval * 1000,
+        'samples': sampler.samples,
+        'stacks': dict(sampler.stacks.most_common()),
+    }
+    profile.update(details)
+    os.makedirs(PROFILES_DIR, exist_ok=True)
+    tmp_path = _profile_path(profile_id) + '.tmp'
+    with open(tmp_path, 'w') as profile_file:
+        json.dump(profile, profile_file)
+    os.replace(tmp_path, _profile_path(profile_id))
+    prune_profiles()
+    return profile_id
+
+
+def _saved_files():
+    try:
+        names = [name for name in os.listdir(PROFILES_DIR) if _PROFILE_ID.match(name[:-5]) and name.endswith('.json')]
+    except FileNotFoundError:
+        return []
+    paths = [os.path.join(PROFILES_DIR, name) for name in names]
+    return sorted(paths, key=os.path.getmtime, reverse=True)
+
+
+def prune_profiles(keep=None):
+    for path in _saved_files()[MAX_PROFILES if keep is None else keep:]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def load_profile(profile_id):
+    """Returns a saved capture, or None for an unknown or malformed id."""
+    if not _PROFILE_ID.match(profile_id or ''):
+        return None
+    try:
+        with open(_profile_path(profile_id)) as profile_file:
+            return json.load(profile_file)
+    except (OSError, ValueError):
+        return None
+
+
+def list_profiles(limit=50):
+    """Returns the newest captures (without their stacks), newest first."""
+    profiles = []
+    for path in _saved_files()[:limit]:
+        try:
+            with open(path) as profile_file:
+                profile = json.load(profile_file)
+        except (OSError, ValueError):
+            continue
+        profile.pop('stacks', None)
+        profile['captured_at'] = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(profile['created_at']))
+        profiles.append(profile)
+    return profiles
+
+
+def top_functions(profile, limit=30):
+    """
+    Ranks the functions of a capture by samples spent in them (self) and under them (total).
+    Returns:
+        list: Dicts with function, self, total, self_pct and total_pct, by total descending.
+    """
+    self_counts, total_counts = Counter(), Counter()
+    for stack, count in profile.get('stacks', {}).items():
+        frames = stack.split(';')
+        self_counts[frames[-1]] += count
+        for frame in set(frames):
+            total_counts[frame] += count
+    samples = sum(profile.get('stacks', {}).values()) or 1
+    return [
+        {
+            'function': function,
+            'self': self_counts[function],
+            'total': total,
+            'self_pct': 100.0 * self_counts[function] / samples,
+            'total_pct': 100.0 * total / samples,
+        }
+        for function, total in total_counts.most_common(limit)
+    ]
+
+
+NO_SAMPLES = 'no samples captured'
+
+
+def folded(profile):
+    """The capture in folded-stack text ("frame;frame;frame count" per line)."""
+    stacks = profile.get('stacks', {})
+    if not stacks:
+        return NO_SAMPLES + '\n'
+    return ''.join(f'{stack} {count}\n' for stack, count in stacks.items())
@@ -0,0 +1,446 @@
+"""
+Background sales report generation.
+
+``submit_report()`` returns a report id immediately. A coordinator thread
+reads the report rows one month at a time (Firebase reads stay in this
+process, where the Firebase app is initialized) and hands each month to a
+process-pool worker that lays it out with ReportLab as chunked LongTables.
+The month parts and the summary page are merged with PyMuPDF, so request
+threads stay free and memory stays bounded while large reports render.
+Status is kept as a small JSON file next to the PDF, so any worker process
+of the app can answer status and download requests.
+
+Finished PDFs are also kept in a disk cache keyed on the date range, the
+layout version and the data version of the covered days (see
+``data_version`` of the storage repository), so a repeat request is a plain file send and any
+write to a job in the range makes the old entry unreachable. The cache is
+trimmed least-recently-used first to REPORT_CACHE_MAX_BYTES.
+"""
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+
+import exports
+import firebase_metrics
+import job_records
+import partitions
+import profiler
+import repository
+import rollups
+
+REPORTS_DIR = os.environ.get('PRINTECH_REPORTS_DIR', os.path.join(os.path.dirname(__file__), 'reports'))
+REPORT_WORKERS = int(os.environ.get('PRINTECH_REPORT_WORKERS', 2))
+
+# Finished (or failed) reports are deleted after this long
+REPORT_TTL_SECONDS = int(os.environ.get('PRINTECH_REPORT_TTL', 24 * 3600))
+
+# Bump whenever the build_*_pdf() functions change what a report looks like
+REPORT_LAYOUT_VERSION = 2
+REPORT_CACHE_DIR = os.path.join(REPORTS_DIR, 'cache')
+REPORT_CACHE_MAX_BYTES = int(os.environ.get('PRINTECH_REPORT_CACHE_MB', 200)) * 1024 * 1024
+
+_REPORT_ID = re.compile(r'^[0-9a-f]{32}$')
+
+_coordinator = ThreadPoolExecutor(max_workers=REPORT_WORKERS, thread_name_prefix='report')
+_process_pool = None
+_pool_lock = threading.Lock()
+
+# Detail rows per LongTable flowable; keeps ReportLab's split work per table small
+DETAIL_CHUNK_ROWS = 500
+
+# Month sections waiting for a worker at any one time, so queued rows stay bounded
+MAX_PENDING_SECTIONS = REPORT_WORKERS * 2
+
+_DETAIL_HEADER = ["Date", "File Name", "Color Mode", "Total Price (PHP)"]
+
+
+def _detail_style():
+    from reportlab.lib import colors
+    from reportlab.lib.colors import HexColor
+    from reportlab.platypus import TableStyle
+
+    return TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), HexColor('#ff294f')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+    ])
+
+
+def _is_complete(detail):
+    return detail.get('status') == 'complete'
+
+
+def iter_report_sections(start_date, end_date):
+    """
+    Yields (YYYY-MM, rows) for each month in the range that has completed jobs.
+    Rows are read one month at a time (see exports.iter_jobs), so only one month is held here.
+    """
+    month, rows = None, []
+    for job_id, job_details in exports.iter_jobs(start_date, end_date):
+        day = rollups.job_day(job_details)
+        if month is not None and day[:7] != month and rows:
+            yield month, rows
+            rows = []
+        month = day[:7]
+        for row in job_records.job_rows(job_id, job_details, keep=_is_complete):
+            rows.append({
+                'file_name': row.file_name,
+                'color_mode': row.color_mode,
+                'total_price': row.total_price,
+                'created_at': day
+            })
+    if rows:
+        yield month, rows
+
+
+def empty_summary():
+    return {'total_jobs': 0, 'total_revenue': 0.0, 'color_revenue': 0.0, 'bw_revenue': 0.0}
+
+
+def add_to_summary(summary, rows):
+    import analytics  # NumPy is only loaded once a report is generated
+
+    # Report rows are completed details only
+    counters = analytics.counters(analytics.JobColumns.from_details(rows, status='complete'))
+    summary['total_jobs'] += counters['completed']
+    summary['total_revenue'] += counters['revenue']
+    summary['color_revenue'] += counters['color_revenue']
+    summary['bw_revenue'] += counters['bw_revenue']
+    return summary
+
+
+def _new_document(out_path):
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import SimpleDocTemplate
+
+    return SimpleDocTemplate(
+        out_path,
+        pagesize=letter,
+        topMargin=20,  # Reduce top margin
+        leftMargin=20,
+        rightMargin=20,
+        bottomMargin=20
+    )
+
+
+def build_summary_pdf(summary, logo_path, out_path, empty_detail=False):
+    """
+    Lays out the report's first part: header, summary and (for an empty range) an empty detail table.
+    Runs in a worker process, so it only uses its arguments.
+    """
+    from reportlab.lib import colors
+    from reportlab.lib.colors import HexColor
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import Image, Paragraph, Spacer, Table, TableStyle
+
+    doc = _new_document(out_path)
+    elements = []
+
+    styles = getSampleStyleSheet()
+    normal_style = styles['Normal']
+
+    # Header Section with Logo and Title
+    header_table_data = []
+    if os.path.exists(logo_path):
+        logo = Image(logo_path, width=80, height=80)
+        header_table_data.append([
+            logo,
+            Paragraph(
+                "<strong>Paperazzi: Coin Operated Printing Machine Sales Report</strong><br/>Cavite State University - Imus Campus",
+                normal_style
+            )
+        ])
+
+    header_table = Table(header_table_data, colWidths=[100, 400])
+    header_table.setStyle(TableStyle([
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('ALIGN', (1, 0), (-1, -1), 'LEFT'),
+    ]))
+    elements.append(header_table)
+    elements.append(Spacer(1, 10))  # Reduce spacer size here
+
+    # Summary Section
+    summary_data = [
+        ["Summary", ""],
+        ["Total Completed Jobs", summary["total_jobs"]],
+        ["Total Revenue (PHP)", f"{summary['total_revenue']:.2f}"],
+        ["Color Revenue (PHP)", f"{summary['color_revenue']:.2f}"],
+        ["Black & White Revenue (PHP)", f"{summary['bw_revenue']:.2f}"],
+    ]
+    summary_table = Table(summary_data, colWidths=[200, 200])
+    summary_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), HexColor('#ff294f')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+    ]))
+    elements.append(summary_table)
+    elements.append(Spacer(1, 20))
+
+    if empty_detail:
+        detail_table = Table([_DETAIL_HEADER], colWidths=[100, 250, 100, 100])
+        detail_table.setStyle(_detail_style())
+        elements.append(detail_table)
+
+    doc.build(elements)
+    return out_path
+
+
+def build_section_pdf(month, rows, out_path):
+    """
+    Lays out one month of detail rows as LongTable chunks of DETAIL_CHUNK_ROWS rows,
+    each repeating the header row on every page. Runs in a worker process.
+    """
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import LongTable, Paragraph, Spacer
+
+    doc = _new_document(out_path)
+    styles = getSampleStyleSheet()
+    title = datetime.strptime(month, '%Y-%m').strftime('%B %Y') if month else 'Undated'
+    elements = [Paragraph(f"<strong>{title}</strong>", styles['Heading2']), Spacer(1, 10)]
+
+    for start in range(0, len(rows), DETAIL_CHUNK_ROWS):
+        table_data = [_DETAIL_HEADER]
+        for row in rows[start:start + DETAIL_CHUNK_ROWS]:
+            table_data.append([
+                str(row["created_at"])[:10],
+                row["file_name"],
+                row["color_mode"].capitalize(),
+                f"{row['total_price']:.2f}"
+            ])
+        detail_table = LongTable(table_data, colWidths=[100, 250, 100, 100], repeatRows=1)
+        detail_table.setStyle(_detail_style())
+        elements.append(detail_table)
+
+    doc.build(elements)
+    return out_path
+
+
+def merge_pdfs(part_paths, out_path):
+    """Concatenates the part PDFs into out_path with PyMuPDF and deletes the parts."""
+    import pymupdf
+
+    with pymupdf.open() as merged:
+        for part_path in part_paths:
+            with pymupdf.open(part_path) as part:
+                merged.insert_pdf(part)
+        merged.save(out_path, garbage=3, deflate=True)
+    for part_path in part_paths:
+        os.remove(part_path)
+    return out_path
+
+
+def render_report(sections, logo_path, out_path, on_progress=None):
+    """
+    Renders a report from (month, rows) sections: each month is laid out in a worker
+    process while the next one is read, then the parts are merged behind the summary.
+    Args:
+        sections (iterable): (YYYY-MM, rows) tuples, e.g. from iter_report_sections().
+        logo_path (str): Path of the logo shown in the header.
+        out_path (str): Where the finished PDF is written.
+        on_progress (callable, optional): Called with the number of sections rendered so far.
+    Returns:
+        dict: The report summary.
+    """
+    pool = _get_process_pool()
+    summary = empty_summary()
+    part_paths, pending = [], []
+    rendered = 0
+    for index, (month, rows) in enumerate(sections):
+        add_to_summary(summary, rows)
+        part_path = f"{out_path}.part{index + 1:04d}"
+        part_paths.append(part_path)
+        pending.append(pool.submit(build_section_pdf, month, rows, part_path))
+        del rows
+        while len(pending) >= MAX_PENDING_SECTIONS:
+            pending.pop(0).result()
+            rendered += 1
+            if on_progress:
+                on_progress(rendered)
+    for future in pending:
+        future.result()
+        rendered += 1
+        if on_progress:
+            on_progress(rendered)
+
+    summary_path = f"{out_path}.part0000"
+    pool.submit(build_summary_pdf, summary, logo_path, summary_path, not part_paths).result()
+    merge_pdfs([summary_path] + part_paths, out_path)
+    return summary
+
+
+def _status_path(report_id):
+    return os.path.join(REPORTS_DIR, f"{report_id}.json")
+
+
+def report_path(report_id):
+    return os.path.join(REPORTS_DIR, f"{report_id}.pdf")
+
+
+def _save_status(report_id, **fields):
+    status = get_report(report_id) or {}
+    status.update(fields, updated_at=time.time())
+    tmp_path = f"{_status_path(report_id)}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(status, f)
+    os.replace(tmp_path, _status_path(report_id))
+    return status
+
+
+def get_report(report_id):
+    """Returns the status dict of a report, or None for an unknown id."""
+    if not _REPORT_ID.match(report_id or ''):
+        return None
+    try:
+        with open(_status_path(report_id), encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _get_process_pool():
+    global _process_pool
+    with _pool_lock:
+        if _process_pool is None:
+            # spawn: never fork a process that is running Firebase listener threads
+            _process_pool = ProcessPoolExecutor(max_workers=REPORT_WORKERS, mp_context=get_context('spawn'))
+        return _process_pool
+
+
+def cache_key(start_date, end_date):
+    data_version = repository.get_repository().data_version(start_date, end_date)
+    raw = f"{REPORT_LAYOUT_VERSION}|{start_date}|{end_date}|{data_version}"
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def _cache_path(key):
+    return os.path.join(REPORT_CACHE_DIR, f"{key}.pdf")
+
+
+def cached_report(start_date, end_date):
+    """Returns the path of a cached PDF for the range if its data is unchanged, else None."""
+    path = _cache_path(cache_key(start_date, end_date))
+    try:
+        os.utime(path)  # mtime doubles as the LRU clock
+    except OSError:
+        return None
+    return path
+
+
+def _store_in_cache(key, pdf_path):
+    os.makedirs(REPORT_CACHE_DIR, exist_ok=True)
+    tmp_path = f"{_cache_path(key)}.tmp"
+    shutil.copyfile(pdf_path, tmp_path)
+    os.replace(tmp_path, _cache_path(key))
+    evict_cache()
+
+
+def evict_cache(max_bytes=None):
+    """Deletes least recently used cached PDFs until the cache fits in max_bytes."""
+    max_bytes = REPORT_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    entries = []
+    for name in os.listdir(REPORT_CACHE_DIR):
+        path = os.path.join(REPORT_CACHE_DIR, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+
+
+def _run_report(report_id, start_date, end_date, logo_path, key, profile=False):
+    with firebase_metrics.route_label('generate_report'):
+        if not profile:
+            _build_report(report_id, start_date, end_date, logo_path, key)
+            return
+        # Only this coordinator thread (and its fanned-out reads) is sampled, not the PDF worker processes
+        sampler = profiler.start('generate_report (background)')
+        started = time.perf_counter()
+        try:
+            _build_report(report_id, start_date, end_date, logo_path, key)
+        finally:
+            profile_id = profiler.finish(
+                sampler, report_id=report_id, start_date=start_date, end_date=end_date,
+                elapsed_ms=round((time.perf_counter() - started) * 1000, 2)
+            )
+            _save_status(report_id, profile_id=profile_id)
+
+
+def _build_report(report_id, start_date, end_date, logo_path, key):
+    try:
+        _save_status(report_id, status='rendering', progress=5)
+        months = len({day[:7] for day in partitions.days_in_range(start_date, end_date)})
+
+        def on_progress(rendered):
+            _save_status(report_id, progress=5 + int(85 * min(rendered, months) / max(months, 1)))
+
+        summary = render_report(iter_report_sections(start_date, end_date), logo_path, report_path(report_id), on_progress)
+        _store_in_cache(key, report_path(report_id))
+        _save_status(report_id, status='done', progress=100, rows=summary['total_jobs'])
+    except Exception as err:
+        print(f"Error generating report {report_id}: {err}")
+        _save_status(report_id, status='failed', error=str(err))
+
+
+def prune_reports():
+    """Deletes reports older than REPORT_TTL_SECONDS."""
+    cutoff = time.time() - REPORT_TTL_SECONDS
+    for name in os.listdir(REPORTS_DIR):
+        path = os.path.join(REPORTS_DIR, name)
+        try:
+            if os.path.isfile(path) and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def submit_report(start_date, end_date, logo_path, profile=False):
+    """
+    Queues a sales report and returns its id without waiting for it.
+    With ``profile`` the background generation is captured by the sampling profiler.
+    Raises:
+        ValueError: If start_date or end_date is not a YYYY-MM-DD date.
+    """
+    partitions.days_in_range(start_date, end_date)
+    os.makedirs(REPORTS_DIR, exist_ok=True)
+    prune_reports()
+    report_id = uuid.uuid4().hex
+    # Keyed before the rows are read: a write during generation leaves this entry stale, never wrong
+    key = cache_key(start_date, end_date)
+    _save_status(
+        report_id,
+        status='queued',
+        progress=0,
+        start_date=start_date,
+        end_date=end_date,
+        download_name=f"Sales_Report_{start_date}_to_{end_date}.pdf",
+        created_at=time.time()
+    )
+    _coordinator.submit(_run_report, report_id, start_date, end_date, logo_path, key, profile)
+    return report_id
@@ -0,0 +1,616 @@
+"""
+Storage repository for jobs, job details, prices, printer status and admins.
+
+The admin app and the kiosk read and write through ``get_repository()``
+instead of calling ``db.reference`` directly. Two backends are available,
+chosen with PRINTECH_STORAGE:
+
+* ``firebase`` (default): the Realtime Database layout used so far, with the
+  day partitions, rollups and current/ pointers kept up to date on writes.
+* ``sqlite``: one local database file (PRINTECH_SQLITE_PATH) in WAL mode with
+  real indexes; counters are computed with SQL aggregates instead of rollups.
+  A single-site kiosk can run on it entirely from local disk.
+
+Both backends take and return jobs as the same dicts (``details`` is a list),
+so callers do not care which one is active.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+import archive
+import current_values
+import job_indexes
+import job_search
+import mirror
+import pagination
+import partitions
+import rollups
+from firebase_config import db
+from rollups import COUNTER_FIELDS, MONEY_FIELDS, empty_rollup, job_day
+
+STORAGE_BACKEND = os.environ.get('PRINTECH_STORAGE', 'firebase')
+SQLITE_PATH = os.environ.get('PRINTECH_SQLITE_PATH', os.path.join(os.path.dirname(__file__), 'printech.db'))
+
+
+def _row_order(row):
+    job_id, job = row
+    return mirror.sort_key(job.get('created_at_ts'), job_id)
+
+
+class FirebaseRepository:
+    """The Realtime Database backend."""
+    name = 'firebase'
+
+    # --- Jobs ---
+    def add_job(self, job):
+        """Stores a new job and returns its id."""
+        epoch = partitions.job_epoch(job)
+        if epoch is not None and 'created_at_ts' not in job:
+            # Pages are ordered by created_at_ts, whichever form of created_at the writer used
+            job = dict(job, created_at_ts=epoch)
+        job_id = db.reference('print_jobs').push(job).key
+        partitions.index_job(job_id, None, job)
+        job_indexes.index_job(job_id, None, job)
+        job_search.index_job(job_id, None, job)
+        rollups.record_job_write(None, job)
+        return job_id
+
+    def get_job(self, job_id):
+        return db.reference(f'print_jobs/{job_id}').get()
+
+    def update_job(self, job_id, fields):
+        """Updates some fields of a job, keeping its day partition and the rollups in step."""
+        job_ref = db.reference(f'print_jobs/{job_id}')
+        before = job_ref.get()
+        job_ref.update(fields)
+        after = dict(before or {}, **fields)
+        partitions.index_job(job_id, before, after)
+        job_indexes.index_job(job_id, before, after)
+        job_search.index_job(job_id, before, after)
+        rollups.record_job_write(before, after)
+
+    def find_jobs_by_document(self, document_name):
+        """Returns {job_id: job} for the jobs uploaded from the kiosk under document_name."""
+        return db.reference('print_jobs').order_by_child('document_name').equal_to(document_name).get() or {}
+
+    def jobs_page(self, page_size, cursor=None, start=None, end=None, filters=None):
+        """
+        A page of jobs by creation time, created between the days ``start`` and ``end`` (inclusive, YYYY-MM-DD);
+        ``filters`` ({field: value}, see job_indexes) pages through an index instead.
+        Days before the archive horizon are paged from the archive segments too.
+        """
+        if filters:
+            return job_indexes.fetch_page(page_size, cursor, filters)
+        range_start, range_end = partitions.epoch_bounds(start, end)
+        if range_end is not None:
+            # end_at() is inclusive; the next day starts at range_end
+            range_end -= 1e-6
+        rows = pagination.fetch_rows(page_size, cursor, start=range_start, end=range_end)
+        horizon = archive.archive_horizon()
+        if horizon and (start is None or start < horizon):
+            archived = archive.page_rows(page_size, cursor, start=range_start, end=range_end)
+            rows = pagination.merge_rows(page_size, cursor, _row_order, rows, archived)
+        return pagination.paginate(rows, page_size, cursor, lambda job: job.get('created_at_ts'))
+
+    def search_jobs(self, prefix, page_size, cursor=None):
+        """A page of the jobs whose file name starts with ``prefix``, by file name (see job_search)."""
+        return job_search.search(prefix, page_size, cursor)
+
+    def iter_jobs(self, start_date, end_date):
+        import exports  # exports imports this module
+        return exports.iter_firebase_jobs(start_date, end_date)
+
+    # --- Job details (the kiosk's per-job print settings and status) ---
+    def get_job_details(self, job_id):
+        return db.reference(f'print_job_details/{job_id}').get()
+
+    def set_job_details(self, job_id, details):
+        db.reference(f'print_job_details/{job_id}').set(details)
+
+    def update_job_details(self, job_id, fields):
+        db.reference(f'print_job_details/{job_id}').update(fields)
+
+    # --- Counters ---
+    def totals(self):
+        return rollups.get_totals()
+
+    def daily(self, day):
+        return rollups.get_daily(day)
+
+    def monthly(self, month):
+        return rollups.get_monthly(month)
+
+    def daily_range(self, start_day=None, end_day=None):
+        return rollups.get_daily_range(start_day, end_day)
+
+    def data_version(self, start_day, end_day):
+        return rollups.data_version(start_day, end_day)
+
+    # --- Prices and printer status ---
+    def latest_prices(self):
+        return current_values.get_prices()
+
+    def add_prices(self, black_price, color_price, updated_at):
+        return current_values.set_prices(black_price, color_price, updated_at)
+
+    def latest_paper(self):
+        return current_values.get_paper()
+
+    def last_refill(self):
+        return current_values.get_last_refill()
+
+    def record_paper(self, remaining_paper, updated_at, refill=False):
+        return current_values.record_paper(remaining_paper, updated_at, refill)
+
+    def use_paper(self, pages, updated_at):
+        """Takes printed sheets off the paper count atomically; see current_values.use_paper()."""
+        return current_values.use_paper(pages, updated_at)
+
+    # --- Admins ---
+    def find_admin(self, email):
+        """Returns (admin_id, admin) for an email, or (None, None)."""
+        admins = db.reference('admins').order_by_child('email').equal_to(email).get() or {}
+        for admin_id, admin in admins.items():
+            return admin_id, admin
+        return None, None
+
+    def add_admin(self, username, email, password_hash):
+        return db.reference('admins').push({
+            'username': username,
+            'email': email,
+            'password_hash': password_hash
+        }).key
+
+
+# --- SQLite backend ---
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    day TEXT NOT NULL,
+    created_at_ts REAL NOT NULL,
+    document_name TEXT,
+    version INTEGER NOT NULL DEFAULT 1,
+    file_data TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_created ON jobs (created_at_ts, id);
+CREATE INDEX IF NOT EXISTS jobs_day ON jobs (day);
+CREATE INDEX IF NOT EXISTS jobs_document ON jobs (document_name);
+
+CREATE TABLE IF NOT EXISTS job_details (
+    job_id TEXT NOT NULL REFERENCES jobs (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    status TEXT,
+    color_mode TEXT,
+    total_price REAL NOT NULL DEFAULT 0,
+    pages_to_print INTEGER NOT NULL DEFAULT 0,
+    data TEXT NOT NULL,
+    PRIMARY KEY (job_id, position)
+);
+CREATE INDEX IF NOT EXISTS job_details_status ON job_details (status, color_mode);
+
+-- Normalized file name + '|' + job id (job_search.search_key), for prefix search
+CREATE TABLE IF NOT EXISTS job_search (
+    job_id TEXT PRIMARY KEY REFERENCES jobs (id) ON DELETE CASCADE,
+    search_key TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS job_search_key ON job_search (search_key);
+
+CREATE TABLE IF NOT EXISTS print_job_details (
+    job_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS print_prices (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    black_price REAL,
+    color_price REAL,
+    updated_at TEXT
+);
+
+CREATE TABLE IF NOT EXISTS printer_status (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    remaining_paper INTEGER,
+    updated_at TEXT,
+    refill INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS printer_status_refill ON printer_status (refill, id);
+
+CREATE TABLE IF NOT EXISTS admins (
+    id TEXT PRIMARY KEY,
+    username TEXT NOT NULL,
+    email TEXT NOT NULL UNIQUE,
+    password_hash TEXT NOT NULL
+);
+"""
+
+# Counters of rollups.job_contribution() as SQL over job_details (d)
+_DETAIL_COUNTERS = """
+    COUNT(d.job_id) AS details,
+    COALESCE(SUM(d.status = 'complete'), 0) AS completed,
+    COALESCE(SUM(d.status = 'cancelled'), 0) AS cancelled,
+    COALESCE(SUM(CASE WHEN d.status = 'complete' THEN d.total_price END), 0) AS revenue,
+    COALESCE(SUM(CASE WHEN d.status = 'complete' AND d.color_mode = 'colored' THEN d.total_price END), 0) AS color_revenue,
+    COALESCE(SUM(CASE WHEN d.status = 'complete' AND d.color_mode = 'bw' THEN d.total_price END), 0) AS bw_revenue,
+    COALESCE(SUM(CASE WHEN d.status = 'complete' THEN d.pages_to_print END), 0) AS pages
+"""
+
+
+# /jobs filters as SQL over jobs; a job without details is matched on its own status (kiosk uploads)
+_FILTERS = {
+    'month': lambda month: ('day BETWEEN ? AND ?', [f'{month}-01', f'{month}-31']),
+    'status': lambda status: (
+        '(EXISTS (SELECT 1 FROM job_details d WHERE d.job_id = jobs.id AND d.status = ?) OR '
+        "(NOT EXISTS (SELECT 1 FROM job_details d WHERE d.job_id = jobs.id) AND json_extract(jobs.data, '$.status') = ?))",
+        [status, status]
+    ),
+    'color_mode': lambda color_mode: (
+        'EXISTS (SELECT 1 FROM job_details d WHERE d.job_id = jobs.id AND d.color_mode = ?)', [color_mode]
+    ),
+}
+
+
+def _new_id():
+    # Sorts by creation time like a Firebase push key
+    return f'{int(time.time() * 1000):012x}{uuid.uuid4().hex[:8]}'
+
+
+def _as_float(value):
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class SQLiteRepository:
+    """The embedded SQLite backend (one connection per thread, WAL journal)."""
+    name = 'sqlite'
+
+    def __init__(self, path=SQLITE_PATH):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+            # Files created before the search table existed are indexed once
+            missing = conn.execute(
+                'SELECT id, data FROM jobs WHERE id NOT IN (SELECT job_id FROM job_search)'
+            ).fetchall()
+            for row in missing:
+                self._write_search_key(conn, row['id'], json.loads(row['data']))
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('PRAGMA synchronous = NORMAL')
+            conn.execute('PRAGMA foreign_keys = ON')
+            self._local.conn = conn
+        return conn
+
+    # --- Jobs ---
+    def _write_details(self, conn, job_id, details):
+        conn.execute('DELETE FROM job_details WHERE job_id = ?', (job_id,))
+        if not isinstance(details, list):
+            return
+        conn.executemany(
+            'INSERT INTO job_details (job_id, position, status, color_mode, total_price, pages_to_print, data) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            [
+                (
+                    job_id, position, detail.get('status'), detail.get('color_mode'),
+                    _as_float(detail.get('total_price')), int(_as_float(detail.get('pages_to_print'))),
+                    json.dumps(detail)
+                )
+                for position, detail in enumerate(details) if isinstance(detail, dict)
+            ]
+        )
+
+    def _write_search_key(self, conn, job_id, job):
+        key = job_search.search_key(job_id, job)
+        if key:
+            conn.execute('INSERT OR REPLACE INTO job_search (job_id, search_key) VALUES (?, ?)', (job_id, key))
+        else:
+            conn.execute('DELETE FROM job_search WHERE job_id = ?', (job_id,))
+
+    def _store_job(self, conn, job_id, job, version):
+        data = {key: value for key, value in job.items() if key not in ('details', 'file_data')}
+        if 'details' in job and not isinstance(job['details'], list):
+            data['details'] = job['details']
+        conn.execute(
+            'INSERT OR REPLACE INTO jobs (id, day, created_at_ts, document_name, version, file_data, data) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (
+                job_id, job_day(job), partitions.job_epoch(job) or 0.0, job.get('document_name'),
+                version, job.get('file_data'), json.dumps(data)
+            )
+        )
+        self._write_details(conn, job_id, job.get('details'))
+        self._write_search_key(conn, job_id, job)
+
+    def _details_of(self, conn, job_ids):
+        details = {job_id: [] for job_id in job_ids}
+        for start in range(0, len(job_ids), 500):
+            chunk = job_ids[start:start + 500]
+            rows = conn.execute(
+                f"SELECT job_id, data FROM job_details WHERE job_id IN ({','.join('?' * len(chunk))}) "
+                "ORDER BY job_id, position",
+                chunk
+            )
+            for row in rows:
+                details[row['job_id']].append(json.loads(row['data']))
+        return details
+
+    def _jobs_from_rows(self, conn, rows, with_file_data=False):
+        rows = list(rows)
+        details = self._details_of(conn, [row['id'] for row in rows])
+        jobs = []
+        for row in rows:
+            job = json.loads(row['data'])
+            if details[row['id']] or 'details' not in job:
+                job['details'] = details[row['id']]
+            if with_file_data and row['file_data'] is not None:
+                job['file_data'] = row['file_data']
+            jobs.append((row['id'], job))
+        return jobs
+
+    def add_job(self, job):
+        job_id = _new_id()
+        with self._connect() as conn:
+            self._store_job(conn, job_id, job, version=1)
+        return job_id
+
+    def get_job(self, job_id):
+        conn = self._connect()
+        rows = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchall()
+        jobs = self._jobs_from_rows(conn, rows, with_file_data=True)
+        return jobs[0][1] if jobs else None
+
+    def update_job(self, job_id, fields):
+        with self._connect() as conn:
+            row = conn.execute('SELECT version FROM jobs WHERE id = ?', (job_id,)).fetchone()
+            job = self.get_job(job_id) or {}
+            job.update(fields)
+            self._store_job(conn, job_id, job, version=(row['version'] + 1) if row else 1)
+
+    def find_jobs_by_document(self, document_name):
+        conn = self._connect()
+        rows = conn.execute('SELECT * FROM jobs WHERE document_name = ? ORDER BY created_at_ts, id', (document_name,))
+        return dict(self._jobs_from_rows(conn, rows))
+
+    def jobs_page(self, page_size, cursor=None, start=None, end=None, filters=None):
+        """
+        Keyset page over (created_at_ts, id); ``start``/``end`` bound the day (inclusive, YYYY-MM-DD)
+        and ``filters`` ({field: value}) match like job_indexes.matches().
+        """
+        where, params = [], []
+        if start is not None:
+            where.append('day >= ?')
+            params.append(start)
+        if end is not None:
+            where.append('day <= ?')
+            params.append(end)
+        for field, value in (filters or {}).items():
+            where_sql, where_params = _FILTERS[field](value)
+            where.append(where_sql)
+            params += where_params
+        descending = cursor is not None and cursor['d'] == 'before'
+        if cursor is not None and cursor.get('c') is not None:
+            where.append('(created_at_ts, id) < (?, ?)' if descending else '(created_at_ts, id) > (?, ?)')
+            params += [cursor['c'], cursor['k']]
+        order = 'DESC' if descending else 'ASC'
+        sql = (
+            f"SELECT * FROM jobs {'WHERE ' + ' AND '.join(where) if where else ''} "
+            f"ORDER BY created_at_ts {order}, id {order} LIMIT ?"
+        )
+        conn = self._connect()
+        rows = self._jobs_from_rows(conn, conn.execute(sql, params + [page_size + 1]))
+        if descending:
+            rows.reverse()
+        return pagination.paginate(rows, page_size, cursor, lambda job: partitions.job_epoch(job) or 0.0)
+
+    def search_jobs(self, prefix, page_size, cursor=None):
+        """Keyset page over job_search.search_key, like the Firebase key range of job_search.search()."""
+        prefix = job_search.normalize(prefix)
+        if not prefix:
+            return [], 1, None, None
+        where, params = ['s.search_key BETWEEN ? AND ?'], [prefix, prefix + '\uf8ff']
+        descending = cursor is not None and cursor['d'] == 'before'
+        if cursor is not None:
+            where.append('s.search_key < ?' if descending else 's.search_key > ?')
+            params.append(cursor['k'])
+        order = 'DESC' if descending else 'ASC'
+        conn = self._connect()
+        keys = conn.execute(
+            f"SELECT s.search_key, s.job_id FROM job_search s WHERE {' AND '.join(where)} "
+            f"ORDER BY s.search_key {order} LIMIT ?",
+            params + [page_size + 1]
+        ).fetchall()
+        if descending:
+            keys.reverse()
+        rows, page, next_token, prev_token = pagination.paginate(
+            [(row['search_key'], row['job_id']) for row in keys], page_size, cursor, lambda job_id: None
+        )
+        job_ids = [job_id for _, job_id in rows]
+        found = dict(self._jobs_from_rows(conn, conn.execute(
+            f"SELECT * FROM jobs WHERE id IN ({','.join('?' * len(job_ids))})", job_ids
+        ))) if job_ids else {}
+        return [(job_id, found[job_id]) for job_id in job_ids if job_id in found], page, next_token, prev_token
+
+    def iter_jobs(self, start_date, end_date, batch_size=500):
+        days = partitions.days_in_range(start_date, end_date)
+        if not days:
+            return
+        conn = self._connect()
+        last = (-1.0, '')
+        while True:
+            rows = conn.execute(
+                'SELECT * FROM jobs WHERE day BETWEEN ? AND ? AND (created_at_ts, id) > (?, ?) '
+                'ORDER BY created_at_ts, id LIMIT ?',
+                (days[0], days[-1], last[0], last[1], batch_size)
+            ).fetchall()
+            if not rows:
+                return
+            last = (rows[-1]['created_at_ts'], rows[-1]['id'])
+            yield from self._jobs_from_rows(conn, rows)
+
+    # --- Job details (the kiosk's per-job print settings and status) ---
+    def get_job_details(self, job_id):
+        row = self._connect().execute('SELECT data FROM print_job_details WHERE job_id = ?', (job_id,)).fetchone()
+        return json.loads(row['data']) if row else None
+
+    def set_job_details(self, job_id, details):
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO print_job_details (job_id, data) VALUES (?, ?)', (job_id, json.dumps(details))
+            )
+
+    def update_job_details(self, job_id, fields):
+        self.set_job_details(job_id, dict(self.get_job_details(job_id) or {}, **fields))
+
+    # --- Counters ---
+    def _counters(self, where='', params=()):
+        conn = self._connect()
+        jobs = conn.execute(f'SELECT COUNT(*) FROM jobs j {where}', params).fetchone()[0]
+        row = conn.execute(f'SELECT {_DETAIL_COUNTERS} FROM job_details d JOIN jobs j ON j.id = d.job_id {where}', params)
+        counters = dict(row.fetchone())
+        counters['jobs'] = jobs
+        return self._rounded(counters)
+
+    @staticmethod
+    def _rounded(counters):
+        result = empty_rollup()
+        for field in COUNTER_FIELDS:
+            value = counters.get(field) or 0
+            result[field] = round(value, 2) if field in MONEY_FIELDS else int(value)
+        return result
+
+    def totals(self):
+        return self._counters()
+
+    def daily(self, day):
+        return self._counters('WHERE j.day = ?', (day,))
+
+    def monthly(self, month):
+        return self._counters('WHERE j.day BETWEEN ? AND ?', (f'{month}-01', f'{month}-31'))
+
+    def daily_range(self, start_day=None, end_day=None):
+        where, params = ["j.day != ''"], []
+        if start_day:
+            where.append('j.day >= ?')
+            params.append(start_day)
+        if end_day:
+            where.append('j.day <= ?')
+            params.append(end_day)
+        where = 'WHERE ' + ' AND '.join(where)
+        conn = self._connect()
+        days = {}
+        for row in conn.execute(f'SELECT j.day, COUNT(*) AS jobs FROM jobs j {where} GROUP BY j.day', params):
+            days[row['day']] = {'jobs': row['jobs']}
+        detail_sql = f'SELECT j.day, {_DETAIL_COUNTERS} FROM job_details d JOIN jobs j ON j.id = d.job_id {where} GROUP BY j.day'
+        for row in conn.execute(detail_sql, params):
+            days.setdefault(row['day'], {}).update(dict(row))
+        return {day: self._rounded(counters) for day, counters in sorted(days.items())}
+
+    def data_version(self, start_day, end_day):
+        rows = self._connect().execute(
+            'SELECT day, COUNT(*), SUM(version) FROM jobs WHERE day BETWEEN ? AND ? GROUP BY day ORDER BY day',
+            (start_day, end_day)
+        ).fetchall()
+        return hashlib.sha1(json.dumps([tuple(row) for row in rows]).encode('utf-8')).hexdigest()
+
+    # --- Prices and printer status ---
+    def latest_prices(self):
+        row = self._connect().execute(
+            'SELECT black_price, color_price, updated_at FROM print_prices ORDER BY id DESC LIMIT 1'
+        ).fetchone()
+        return dict(current_values.DEFAULT_PRICES, **(dict(row) if row else {}))
+
+    def add_prices(self, black_price, color_price, updated_at):
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT INTO print_prices (black_price, color_price, updated_at) VALUES (?, ?, ?)',
+                (black_price, color_price, updated_at)
+            )
+        return {'black_price': black_price, 'color_price': color_price, 'updated_at': updated_at}
+
+    def latest_paper(self):
+        row = self._connect().execute(
+            'SELECT remaining_paper, updated_at FROM printer_status ORDER BY id DESC LIMIT 1'
+        ).fetchone()
+        return dict(row) if row else None
+
+    def last_refill(self):
+        row = self._connect().execute(
+            'SELECT remaining_paper, updated_at FROM printer_status WHERE refill = 1 ORDER BY id DESC LIMIT 1'
+        ).fetchone()
+        return dict(row) if row else None
+
+    def record_paper(self, remaining_paper, updated_at, refill=False):
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT INTO printer_status (remaining_paper, updated_at, refill) VALUES (?, ?, ?)',
+                (remaining_paper, updated_at, int(refill))
+            )
+        return {'remaining_paper': remaining_paper, 'updated_at': updated_at, 'refill': refill}
+
+    def use_paper(self, pages, updated_at):
+        conn = self._connect()
+        with conn:
+            # Take the write lock before reading, so two prints cannot both start from the same count
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute('SELECT remaining_paper FROM printer_status ORDER BY id DESC LIMIT 1').fetchone()
+            if row is None:
+                return None
+            before = row['remaining_paper']
+            if before < pages:
+                return before, None
+            conn.execute(
+                'INSERT INTO printer_status (remaining_paper, updated_at, refill) VALUES (?, ?, 0)',
+                (before - pages, updated_at)
+            )
+        return before, before - pages
+
+    # --- Admins ---
+    def find_admin(self, email):
+        row = self._connect().execute(
+            'SELECT id, username, email, password_hash FROM admins WHERE email = ?', (email,)
+        ).fetchone()
+        if row is None:
+            return None, None
+        admin = dict(row)
+        return admin.pop('id'), admin
+
+    def add_admin(self, username, email, password_hash):
+        admin_id = _new_id()
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT INTO admins (id, username, email, password_hash) VALUES (?, ?, ?, ?)',
+                (admin_id, username, email, password_hash)
+            )
+        return admin_id
+
+
+_repository = None
+_repository_lock = threading.Lock()
+
+
+def get_repository():
+    """The process-wide repository for the backend selected by PRINTECH_STORAGE."""
+    global _repository
+    if _repository is None:
+        with _repository_lock:
+            if _repository is None:
+                if STORAGE_BACKEND == 'sqlite':
+                    _repository = SQLiteRepository()
+                elif STORAGE_BACKEND == 'firebase':
+                    _repository = FirebaseRepository()
+                else:
+                    raise ValueError(f"Unknown PRINTECH_STORAGE backend: {STORAGE_BACKEND!r}")
+    return _repository
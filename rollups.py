@@ -0,0 +1,206 @@
+"""
+Incremental daily/monthly rollups of print job activity.
+
+The dashboard and jobs pages read these small nodes instead of walking every
+job under ``print_jobs``. Whoever writes a job (or changes the status of one of
+its details) calls ``record_job_write`` with the job before and after the write,
+and the affected day, month and all-time nodes are adjusted by the difference.
+
+Layout::
+
+    rollups/daily/YYYY-MM-DD   -> counters for jobs created that day, plus a ``version``
+                                  bumped on every write to one of those jobs
+    rollups/monthly/YYYY-MM    -> counters for jobs created that month
+    rollups/totals             -> counters for every job ever written
+"""
+import hashlib
+import json
+from datetime import datetime
+
+from firebase_config import db
+
+import mirror
+
+ROLLUPS_PATH = 'rollups'
+
+# Counters kept on every rollup node
+COUNTER_FIELDS = (
+    'jobs',            # print_jobs entries
+    'details',         # entries in the jobs' ``details`` lists
+    'completed',       # details with status 'complete'
+    'cancelled',       # details with status 'cancelled'
+    'revenue',         # total_price of completed details
+    'color_revenue',   # ... of which color_mode == 'colored'
+    'bw_revenue',      # ... of which color_mode == 'bw'
+    'pages',           # pages_to_print of completed details
+)
+MONEY_FIELDS = ('revenue', 'color_revenue', 'bw_revenue')
+
+
+def empty_rollup():
+    return {field: 0 for field in COUNTER_FIELDS}
+
+
+def job_day(job):
+    """
+    Returns the YYYY-MM-DD day a job belongs to.
+    The admin upload writes ``created_at`` as a formatted string while the kiosk
+    writes a ``time.time()`` float, so both are accepted.
+    """
+    created_at = (job or {}).get('created_at', '')
+    if isinstance(created_at, (int, float)):
+        return datetime.fromtimestamp(created_at).strftime('%Y-%m-%d')
+    return str(created_at)[:10] if created_at else ''
+
+
+def job_contribution(job):
+    """Returns the counters a single job adds to its rollup nodes."""
+    counters = empty_rollup()
+    if not job:
+        return counters
+    counters['jobs'] = 1
+    details = job.get('details', [])
+    if not isinstance(details, list):
+        details = []
+    for detail in details:
+        if not isinstance(detail, dict):
+            continue
+        counters['details'] += 1
+        status = detail.get('status')
+        if status == 'complete':
+            price = float(detail.get('total_price', 0) or 0)
+            counters['completed'] += 1
+            counters['revenue'] += price
+            counters['pages'] += int(detail.get('pages_to_print', 0) or 0)
+            if detail.get('color_mode') == 'colored':
+                counters['color_revenue'] += price
+            elif detail.get('color_mode') == 'bw':
+                counters['bw_revenue'] += price
+        elif status == 'cancelled':
+            counters['cancelled'] += 1
+    return counters
+
+
+def _bucket_paths(day):
+    paths = [f'{ROLLUPS_PATH}/totals']
+    if day:
+        paths.append(f'{ROLLUPS_PATH}/daily/{day}')
+        paths.append(f'{ROLLUPS_PATH}/monthly/{day[:7]}')
+    return paths
+
+
+def _add_counters(current, delta, sign=1):
+    result = empty_rollup()
+    result.update(current or {})
+    for field in COUNTER_FIELDS:
+        value = result.get(field, 0) + sign * delta.get(field, 0)
+        result[field] = round(value, 2) if field in MONEY_FIELDS else int(value)
+    return result
+
+
+def _apply_delta(path, delta, sign=1):
+    # Daily nodes also carry a version that changes on every write, even when no counter does
+    bump_version = path.startswith(f'{ROLLUPS_PATH}/daily/')
+    if not bump_version and not any(delta.get(field) for field in COUNTER_FIELDS):
+        return
+
+    def update(current):
+        result = _add_counters(current, delta, sign)
+        if bump_version:
+            result['version'] = int((current or {}).get('version', 0)) + 1
+        return result
+    db.reference(path).transaction(update)
+
+
+def record_job_write(before, after):
+    """
+    Adjusts the rollups for a job write.
+    Args:
+        before (dict or None): The job as it was stored before the write (None for a new job).
+        after (dict or None): The job as it is stored after the write (None for a deletion).
+    """
+    before_day, after_day = job_day(before), job_day(after)
+    before_counts, after_counts = job_contribution(before), job_contribution(after)
+    if before_day == after_day:
+        delta = {field: after_counts[field] - before_counts[field] for field in COUNTER_FIELDS}
+        for path in _bucket_paths(after_day):
+            _apply_delta(path, delta)
+        return
+    # The job moved to another day: take it out of the old buckets and add it to the new ones
+    for path in _bucket_paths(before_day):
+        _apply_delta(path, before_counts, sign=-1)
+    for path in _bucket_paths(after_day):
+        _apply_delta(path, after_counts)
+
+
+def _read(path):
+    return mirror.get_or_fetch(path, db.reference(path).get)
+
+
+def get_totals():
+    return _add_counters(_read(f'{ROLLUPS_PATH}/totals'), {})
+
+
+def get_daily(day):
+    return _add_counters(_read(f'{ROLLUPS_PATH}/daily/{day}'), {})
+
+
+def get_monthly(month):
+    return _add_counters(_read(f'{ROLLUPS_PATH}/monthly/{month}'), {})
+
+
+def get_daily_range(start_day=None, end_day=None):
+    """Returns {day: counters} for the days between start_day and end_day (inclusive)."""
+    source = mirror.get_mirror(ROLLUPS_PATH)
+    if source is not None:
+        days = {
+            day: counters for day, counters in (source.read('daily') or {}).items()
+            if (not start_day or day >= start_day) and (not end_day or day <= end_day)
+        }
+    else:
+        query = db.reference(f'{ROLLUPS_PATH}/daily').order_by_key()
+        if start_day:
+            query = query.start_at(start_day)
+        if end_day:
+            query = query.end_at(end_day)
+        days = query.get() or {}
+    return {day: _add_counters(counters, {}) for day, counters in sorted(days.items())}
+
+
+def data_version(start_day, end_day):
+    """
+    Returns a fingerprint of every job write between start_day and end_day (inclusive).
+    It changes whenever a job created in that range is written, so it can key caches of derived data.
+    """
+    days = get_daily_range(start_day, end_day)
+    payload = json.dumps(sorted(days.items()), sort_keys=True)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def rebuild_rollups():
+    """
+    Recomputes every rollup node from a full scan of ``print_jobs`` and the archive.
+    Used to backfill existing history and to repair drift; the hot paths never call it.
+    Day versions are bumped rather than reset, so fingerprints taken before the rebuild stay stale.
+    """
+    import analytics  # both import this module
+    import archive
+
+    all_jobs = db.reference('print_jobs').get() or {}
+    # Archived jobs still count towards the rollups; hot copies win over archived ones
+    for segment in archive.load_index():
+        for job_id, job in archive.read_segment(segment['file']):
+            all_jobs.setdefault(job_id, job)
+    old_daily = db.reference(f'{ROLLUPS_PATH}/daily').get() or {}
+    columns = analytics.JobColumns.from_jobs(all_jobs.values())
+    del all_jobs
+    daily, monthly, totals = analytics.by_day(columns), analytics.by_month(columns), analytics.counters(columns)
+    for day, counters in daily.items():
+        counters['version'] = int(old_daily.get(day, {}).get('version', 0)) + 1
+    db.reference(ROLLUPS_PATH).set({'daily': daily, 'monthly': monthly, 'totals': totals})
+    return totals
+
+
+if __name__ == '__main__':
+    # Backfill: python rollups.py (the Firebase app is initialized by firebase_config)
+    print(rebuild_rollups())
@@ -0,0 +1,61 @@
+"""
+Shared setup for the tests.
+
+They run on the in-process fake database (PRINTECH_FIREBASE=fake, see
+fake_rtdb.py) with the in-memory mirror off, so every read takes the path
+that talks to Firebase. Each test starts from an empty database and its own
+archive directory.
+"""
+import os
+import sys
+from collections import OrderedDict
+
+os.environ['PRINTECH_FIREBASE'] = 'fake'
+os.environ['FIREBASE_MIRROR'] = '0'
+os.environ.pop('PRINTECH_FAKE_DB_SEED', None)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+import archive
+import current_values
+import firebase_config
+import repository
+
+
+@pytest.fixture(autouse=True)
+def empty_database(tmp_path, monkeypatch):
+    firebase_config.fake_db.load({})
+    current_values.invalidate()
+    monkeypatch.setattr(archive, 'ARCHIVE_DIR', str(tmp_path / 'archive'))
+    monkeypatch.setattr(archive, 'ARCHIVE_DURABLE', True)
+    monkeypatch.setattr(archive, '_segment_cache', OrderedDict())
+    monkeypatch.setattr(archive, '_segment_cache_bytes', 0)
+    monkeypatch.setattr(archive, '_search_index', {'files': None, 'keys': [], 'segments': []})
+    yield firebase_config.fake_db
+
+
+@pytest.fixture
+def db():
+    return firebase_config.db
+
+
+@pytest.fixture
+def firebase_repo():
+    return repository.FirebaseRepository()
+
+
+@pytest.fixture
+def sqlite_repo(tmp_path):
+    return repository.SQLiteRepository(str(tmp_path / 'printech.db'))
+
+
+def make_job(created_at, file_name='Report.pdf', details=None):
+    """A job as the admin upload stores it, with one completed black-and-white detail by default."""
+    if details is None:
+        details = [{
+            'file_name': file_name, 'status': 'complete', 'color_mode': 'bw',
+            'pages_to_print': 2, 'total_price': 6.0, 'inserted_amount': 10.0,
+        }]
+    return {'created_at': created_at, 'file_name': file_name, 'details': details}
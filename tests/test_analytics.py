@@ -0,0 +1,74 @@
+import random
+import re
+
+import analytics
+import rollups
+from conftest import make_job
+
+_DAY = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+
+def _random_jobs(count, seed=11):
+    rng = random.Random(seed)
+    jobs = []
+    for _ in range(count):
+        created_at = rng.choice([
+            f'2024-{rng.randint(1, 3):02d}-{rng.randint(1, 28):02d} 10:00:00',
+            1709632800.0 + rng.randint(0, 60) * 86400,  # kiosk jobs store an epoch float
+            'N/A',
+            '',
+        ])
+        details = [
+            {
+                'status': rng.choice(['complete', 'cancelled', 'pending', None]),
+                'color_mode': rng.choice(['colored', 'bw', 'sepia']),
+                'total_price': rng.choice([rng.randint(1, 40) / 4, '3.5', None]),
+                'pages_to_print': rng.choice([rng.randint(1, 20), '2', None]),
+            }
+            for _ in range(rng.randint(0, 3))
+        ]
+        jobs.append(make_job(created_at, details=rng.choice([details, details, 'corrupt', ['corrupt']])))
+    return jobs
+
+
+def _expected(jobs, key):
+    """Per-key sums of rollups.job_contribution, the reference the columns must agree with."""
+    expected = {}
+    for job in jobs:
+        day = rollups.job_day(job)
+        if key is None:
+            bucket = 'totals'
+        elif _DAY.match(day):
+            bucket = key(day)
+        else:
+            continue
+        expected[bucket] = rollups._add_counters(expected.get(bucket), rollups.job_contribution(job))
+    return expected
+
+
+def test_counters_match_the_rollups():
+    jobs = _random_jobs(300)
+    columns = analytics.JobColumns.from_jobs(jobs)
+    [totals] = _expected(jobs, None).values()
+    assert analytics.counters(columns) == totals
+
+
+def test_days_and_months_match_the_rollups():
+    jobs = _random_jobs(300)
+    columns = analytics.JobColumns.from_jobs(jobs)
+    assert analytics.by_day(columns) == _expected(jobs, lambda day: day)
+    assert analytics.by_month(columns) == _expected(jobs, lambda day: day[:7])
+
+
+def test_days_that_are_not_dates_count_in_no_day_or_month():
+    columns = analytics.JobColumns.from_jobs([make_job('N/A'), make_job('2024-13-45 10:00:00'), None])
+    assert analytics.counters(columns)['jobs'] == 2
+    assert analytics.by_day(columns) == {}
+    assert analytics.by_month(columns) == {}
+
+
+def test_loose_details_count_no_jobs():
+    rows = [{'color_mode': 'colored', 'total_price': 4.0}, {'color_mode': 'bw', 'total_price': 1.5}]
+    counters = analytics.counters(analytics.JobColumns.from_details(rows, status='complete'))
+    assert counters['jobs'] == 0
+    assert (counters['completed'], counters['revenue'], counters['color_revenue'], counters['bw_revenue']) == (2, 5.5, 4.0, 1.5)
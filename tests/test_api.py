@@ -0,0 +1,71 @@
+import json
+
+import api
+import msgpack
+import pytest
+from flask import Flask
+
+PAYLOAD = {'jobs': 3, 'revenue': 18.5, 'months': ['2024-03']}
+
+
+@pytest.fixture
+def flask_app():
+    return Flask(__name__)
+
+
+def _respond(flask_app, payload=PAYLOAD, status=200, **request_args):
+    with flask_app.test_request_context('/api/stats', **request_args):
+        return api.api_response(payload, status)
+
+
+def test_json_by_default_with_an_etag_of_the_body(flask_app):
+    response = _respond(flask_app)
+    assert response.status_code == 200
+    assert response.mimetype == 'application/json'
+    assert json.loads(response.get_data()) == PAYLOAD
+    assert response.headers['ETag'] == api.make_etag(response.get_data())
+    assert response.headers['Cache-Control'] == 'private, no-cache'
+
+
+def test_matching_if_none_match_gets_an_empty_304(flask_app):
+    etag = _respond(flask_app).headers['ETag']
+    for header in (etag, f'"other", W/{etag}', '*'):
+        response = _respond(flask_app, headers={'If-None-Match': header})
+        assert response.status_code == 304
+        assert response.get_data() == b''
+        assert response.headers['ETag'] == etag
+
+
+def test_changed_payload_gets_a_full_response(flask_app):
+    etag = _respond(flask_app).headers['ETag']
+    response = _respond(flask_app, dict(PAYLOAD, jobs=4), headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_errors_are_never_answered_with_304(flask_app):
+    error = {'error': 'Invalid cursor'}
+    etag = _respond(flask_app, error, 400).headers['ETag']
+    assert _respond(flask_app, error, 400, headers={'If-None-Match': etag}).status_code == 400
+
+
+@pytest.mark.parametrize('request_args', [
+    {'headers': {'Accept': 'application/msgpack'}},
+    {'headers': {'Accept': 'application/x-msgpack, application/json;q=0.5'}},
+    {'query_string': {'format': 'msgpack'}},
+])
+def test_msgpack_when_asked_for(flask_app, request_args):
+    response = _respond(flask_app, **request_args)
+    assert response.mimetype == 'application/msgpack'
+    assert msgpack.unpackb(response.get_data(), raw=False) == PAYLOAD
+    assert response.headers['ETag'] != _respond(flask_app).headers['ETag']
+    assert 'Accept' in response.headers['Vary']
+
+
+def test_json_preferred_over_msgpack(flask_app):
+    response = _respond(flask_app, headers={'Accept': 'application/json, application/msgpack;q=0.5'})
+    assert response.mimetype == 'application/json'
+
+
+def test_job_payload_hides_the_file_contents():
+    assert api.job_payload('job1', {'file_name': 'a.pdf', 'file_data': 'QUJD'}) == {'file_name': 'a.pdf', 'id': 'job1'}
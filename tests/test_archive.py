@@ -0,0 +1,105 @@
+from datetime import datetime, timedelta
+
+import archive
+import job_indexes
+import pagination
+import partitions
+import pytest
+import rollups
+from conftest import make_job
+
+
+def _add_jobs(repo, ages_in_days):
+    now = datetime.now().replace(hour=12, minute=0, second=0, microsecond=0)
+    jobs = {}
+    for number, age in enumerate(ages_in_days):
+        created = now - timedelta(days=age)
+        job_id = repo.add_job(make_job(created.strftime('%Y-%m-%d %H:%M:%S'), file_name=f'Thesis {number}.pdf'))
+        jobs[job_id] = created
+    return jobs
+
+
+def test_compaction_moves_old_jobs_out_of_the_hot_store(db, firebase_repo):
+    jobs = _add_jobs(firebase_repo, [400, 390, 200, 10, 1])
+    old = [job_id for job_id, created in jobs.items() if created < datetime.now() - timedelta(days=180)]
+
+    assert archive.compact(180) == 3
+
+    hot = db.reference('print_jobs').get()
+    assert set(hot) == set(jobs) - set(old)
+    for job_id in old:
+        day = jobs[job_id].strftime('%Y-%m-%d')
+        assert db.reference(f'{partitions.PARTITIONS_PATH}/{day}/{job_id}').get() is None
+    assert not any(job_id in old for job_id, _ in job_indexes.fetch_page(10, filters={'status': 'complete'})[0])
+    archived = archive.fetch_range('2000-01-01', datetime.now().strftime('%Y-%m-%d'))
+    assert [job_id for job_id, _ in archived] == sorted(old, key=lambda job_id: jobs[job_id])
+    # Rollups are left alone, so the stats still count the archived jobs
+    assert rollups.get_totals()['jobs'] == 5
+
+
+def test_compaction_refuses_to_delete_into_storage_not_declared_durable(db, firebase_repo, monkeypatch):
+    monkeypatch.setattr(archive, 'ARCHIVE_DURABLE', False)
+    jobs = _add_jobs(firebase_repo, [400, 1])
+
+    with pytest.raises(RuntimeError):
+        archive.compact(180)
+
+    assert set(db.reference('print_jobs').get()) == set(jobs)
+    assert archive.load_index() == []
+
+
+def test_compaction_without_old_jobs_writes_nothing(firebase_repo):
+    _add_jobs(firebase_repo, [3, 2])
+    assert archive.compact(180) == 0
+    assert archive.load_index() == []
+    assert archive.archive_horizon() is None
+
+
+def test_jobs_table_pages_through_archived_months(firebase_repo):
+    jobs = _add_jobs(firebase_repo, [400 - day for day in range(0, 12)] + [5, 4])
+    archive.compact(180)
+    month = jobs[next(iter(jobs))].strftime('%Y-%m')
+    expected = sorted((job_id for job_id, created in jobs.items() if created.strftime('%Y-%m') == month),
+                      key=lambda job_id: jobs[job_id])
+
+    seen, cursor = [], None
+    while True:
+        rows, _, next_token, _ = firebase_repo.jobs_page(3, cursor, *partitions.month_days(month))
+        seen += [job_id for job_id, _ in rows]
+        if not next_token:
+            break
+        cursor = pagination.decode_cursor(next_token)
+
+    assert seen == expected
+
+
+def test_unbounded_pages_list_archived_then_hot_jobs(firebase_repo):
+    jobs = _add_jobs(firebase_repo, [300, 250, 200, 20, 10])
+    archive.compact(180)
+
+    rows, _, next_token, _ = firebase_repo.jobs_page(10)
+
+    assert [job_id for job_id, _ in rows] == sorted(jobs, key=lambda job_id: jobs[job_id])
+    assert next_token is None
+
+
+def test_search_finds_archived_jobs(firebase_repo):
+    _add_jobs(firebase_repo, [300, 5])
+    archive.compact(180)
+
+    rows, _, _, _ = firebase_repo.search_jobs('thesis', 10)
+
+    assert [job['file_name'] for _, job in rows] == ['Thesis 0.pdf', 'Thesis 1.pdf']
+
+
+def test_segment_cache_is_bounded_by_decoded_size(monkeypatch):
+    monkeypatch.setattr(archive, 'SEGMENT_CACHE_BYTES', 4000)
+    for month in ('2024-01', '2024-02', '2024-03'):
+        archive.write_segment(month, [
+            (f'{month}-{number}', make_job(f'{month}-10 10:00:00', file_name='x' * 40)) for number in range(10)
+        ])
+    for segment in archive.load_index():
+        assert len(archive.read_segment(segment['file'])) == 10
+
+    assert 0 < archive._segment_cache_bytes <= 4000
+    assert len(archive._segment_cache) < 3
@@ -0,0 +1,56 @@
+import current_values
+
+
+def test_prices_default_until_one_is_set():
+    assert current_values.get_prices()['black_price'] == current_values.DEFAULT_PRICES['black_price']
+    current_values.set_prices(4, 7, '2024-03-05 10:00:00')
+    assert current_values.get_prices() == {'black_price': 4, 'color_price': 7, 'updated_at': '2024-03-05 10:00:00'}
+
+
+def test_pointers_fall_back_to_the_histories(db):
+    # Written before the current/ pointers existed
+    db.reference('print_prices').push({'black_price': 2, 'color_price': 9, 'updated_at': '2024-01-01 00:00:00'})
+    db.reference('printer_status').push({'remaining_paper': 300, 'updated_at': '2024-01-01 00:00:00', 'refill': True})
+    db.reference('printer_status').push({'remaining_paper': 250, 'updated_at': '2024-01-02 00:00:00'})
+
+    assert db.reference('current').get() is None
+    assert current_values.get_prices()['color_price'] == 9
+    assert current_values.get_paper()['remaining_paper'] == 250
+    assert current_values.get_last_refill()['remaining_paper'] == 300
+
+    current_values.rebuild_current()
+    assert db.reference('current/paper').get() == {'remaining_paper': 250, 'updated_at': '2024-01-02 00:00:00'}
+    assert db.reference('current/last_refill').get() == {'remaining_paper': 300, 'updated_at': '2024-01-01 00:00:00'}
+
+
+def test_writes_drop_the_cached_pointer():
+    current_values.record_paper(100, 1.0, refill=True)
+    assert current_values.get_paper()['remaining_paper'] == 100
+    current_values.record_paper(80, 2.0)
+    assert current_values.get_paper()['remaining_paper'] == 80
+    assert current_values.get_last_refill()['remaining_paper'] == 100
+
+
+def test_use_paper_starts_from_the_stored_count_not_the_cache(db):
+    current_values.record_paper(100, 1.0, refill=True)
+    assert current_values.get_paper()['remaining_paper'] == 100
+    # A refill written by another process; this process still caches 100
+    db.reference('current/paper').set({'remaining_paper': 500, 'updated_at': 2.0})
+
+    assert current_values.use_paper(10, 3.0) == (500, 490)
+    assert db.reference('current/paper').get()['remaining_paper'] == 490
+    assert current_values.get_paper()['remaining_paper'] == 490
+
+
+def test_use_paper_refuses_more_pages_than_are_left(db):
+    current_values.record_paper(5, 1.0)
+    assert current_values.use_paper(6, 2.0) == (5, None)
+    assert db.reference('current/paper').get()['remaining_paper'] == 5
+    assert len(db.reference('printer_status').get()) == 1
+
+
+def test_use_paper_falls_back_to_the_history(db):
+    assert current_values.use_paper(1, 1.0) is None
+    db.reference('printer_status').push({'remaining_paper': 40, 'updated_at': 1.0})
+    assert current_values.use_paper(4, 2.0) == (40, 36)
+    assert db.reference('current/paper').get() == {'remaining_paper': 36, 'updated_at': 2.0}
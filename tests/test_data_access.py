@@ -0,0 +1,162 @@
+import threading
+import time
+
+import data_access
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    monkeypatch.setattr(data_access, '_breakers', {})
+    monkeypatch.setattr(data_access, '_snapshots', data_access.OrderedDict())
+
+
+def _breaker(node, reset_seconds=30):
+    data_access._breakers[node] = data_access.CircuitBreaker(node, failures=2, reset_seconds=reset_seconds)
+    return data_access._breakers[node]
+
+
+class Upstream:
+    """A read whose answer (a value or an exception to raise) can be switched between calls."""
+
+    def __init__(self, value):
+        self.value = value
+        self.calls = 0
+
+    def read(self):
+        self.calls += 1
+        if isinstance(self.value, BaseException):
+            raise self.value
+        return self.value
+
+
+def _read(upstream, node='rollups/totals', timeout=None):
+    return data_access.gather({'totals': data_access.call(upstream.read, node=node, timeout=timeout)})
+
+
+def test_results_keep_the_order_of_the_calls():
+    results = data_access.gather({
+        'slow': data_access.call(time.sleep, 0.05),
+        'fast': lambda: 'fast',
+    })
+    assert list(results) == ['slow', 'fast']
+    assert results['fast'] == 'fast'
+    assert results.stale == {}
+
+
+def test_transport_failures_fall_back_to_the_last_snapshot():
+    upstream = Upstream({'jobs': 1})
+    assert _read(upstream)['totals'] == {'jobs': 1}
+
+    upstream.value = ConnectionError('reset by peer')
+    results = _read(upstream)
+
+    assert results['totals'] == {'jobs': 1}
+    assert 'totals' in results.stale
+    assert results.stale_since is not None
+
+
+def test_transport_failure_without_a_snapshot_raises():
+    with pytest.raises(ConnectionError):
+        _read(Upstream(ConnectionError('down')))
+
+
+def test_breaker_opens_after_repeated_failures_and_serves_the_snapshot():
+    node_breaker = _breaker('rollups/totals')
+    upstream = Upstream({'jobs': 1})
+    _read(upstream)
+    upstream.value = ConnectionError('down')
+    _read(upstream)
+    _read(upstream)
+    assert node_breaker.state == 'open'
+
+    calls = upstream.calls
+    results = _read(upstream)
+    assert results['totals'] == {'jobs': 1}
+    assert upstream.calls == calls  # no read goes out while the breaker is open
+
+
+def test_open_breaker_without_a_snapshot_raises_circuit_open():
+    _breaker('rollups/totals')
+    upstream = Upstream(ConnectionError('down'))
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            _read(upstream)
+    with pytest.raises(data_access.CircuitOpen):
+        _read(upstream)
+
+
+def test_half_open_breaker_probes_in_the_background_and_closes():
+    node_breaker = _breaker('rollups/totals', reset_seconds=0.05)
+    upstream = Upstream({'jobs': 1})
+    _read(upstream)
+    upstream.value = ConnectionError('down')
+    _read(upstream)
+    _read(upstream)
+    time.sleep(0.06)
+    assert node_breaker.state == 'half_open'
+
+    upstream.value = {'jobs': 2}
+    results = _read(upstream)
+    assert results['totals'] == {'jobs': 1}  # served from the snapshot while the probe runs
+    deadline = time.monotonic() + 2
+    while node_breaker.state != 'closed' and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert node_breaker.state == 'closed'
+    assert _read(upstream)['totals'] == {'jobs': 2}
+
+
+def test_other_exceptions_are_raised_and_do_not_trip_the_breaker():
+    node_breaker = _breaker('rollups/totals')
+    upstream = Upstream({'jobs': 1})
+    _read(upstream)
+
+    upstream.value = KeyError('bad argument')
+    for _ in range(3):
+        with pytest.raises(KeyError):
+            _read(upstream)
+
+    assert node_breaker.state == 'closed'
+    assert node_breaker.failures == 0
+
+
+def test_failed_probe_with_a_bug_lets_the_next_read_probe():
+    node_breaker = _breaker('rollups/totals', reset_seconds=0.05)
+    upstream = Upstream(ConnectionError('down'))
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            _read(upstream)
+    time.sleep(0.06)
+    upstream.value = TypeError('bug')
+    with pytest.raises(TypeError):
+        _read(upstream)
+    assert not node_breaker.probing
+    assert node_breaker.allow()
+
+
+def test_a_read_over_its_timeout_raises_read_timeout():
+    with pytest.raises(data_access.ReadTimeout) as raised:
+        data_access.gather({'slow': data_access.call(time.sleep, 0.5, timeout=0.05), 'fast': lambda: 1})
+    assert raised.value.name == 'slow'
+
+
+def test_timeouts_count_from_when_each_read_starts(monkeypatch):
+    # More reads than workers: the later ones queue, but each still gets its whole timeout once running
+    pool = data_access.ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr(data_access, '_pool', pool)
+    try:
+        results = data_access.map_reads(lambda n: (time.sleep(0.05), n)[1], range(8), timeout=0.08)
+    finally:
+        pool.shutdown()
+    assert results == list(range(8))
+
+
+def test_nested_gathers_run_inline():
+    threads = []
+
+    def inner():
+        threads.append(threading.current_thread().name)
+        return data_access.gather({'a': lambda: threading.current_thread().name, 'b': lambda: 2})
+
+    outer = data_access.gather({'inner': inner, 'other': lambda: 0})
+    assert outer['inner']['a'] == threads[0]
@@ -0,0 +1,61 @@
+import csv
+import io
+import json
+
+import exports
+import pytest
+from conftest import make_job
+
+
+@pytest.mark.parametrize('value', [
+    '=HYPERLINK("http://evil.example","x")', '+1+1', '-2+3', '@SUM(A1)', '\t=1', '\r=1',
+])
+def test_formula_like_text_is_quoted(value):
+    assert exports._csv_cell('file_name', value) == "'" + value
+
+
+@pytest.mark.parametrize('field, value', [
+    ('file_name', 'Thesis.pdf'),
+    ('file_name', 'a=b.pdf'),
+    ('total_price', -6.0),
+    ('job_id', '-NqX1a2b3c4d5e6f7g8h'),
+])
+def test_other_cells_are_written_as_is(field, value):
+    assert exports._csv_cell(field, value) == value
+
+
+def _row(**fields):
+    row = dict.fromkeys(exports.EXPORT_FIELDS, '')
+    row.update(fields)
+    return row
+
+
+def test_csv_stream_escapes_cells_and_flushes_in_chunks():
+    rows = [_row(job_id=f'-N{number}', file_name='=cmd|calc' if number == 2 else f'{number}.pdf') for number in range(5)]
+
+    chunks = list(exports.stream_csv(rows, flush_every=2))
+
+    assert len(chunks) == 3
+    parsed = list(csv.DictReader(io.StringIO(''.join(chunks))))
+    assert [row['job_id'] for row in parsed] == [f'-N{number}' for number in range(5)]
+    assert parsed[2]['file_name'] == "'=cmd|calc"
+
+
+def test_ndjson_stream_keeps_values_unescaped():
+    rows = [_row(file_name='=1+1')]
+    assert [json.loads(line) for line in ''.join(exports.stream_ndjson(rows)).splitlines()] == rows
+
+
+def test_rows_cover_each_detail_in_the_range(firebase_repo):
+    firebase_repo.add_job(make_job('2024-03-05 10:00:00', file_name='a.pdf'))
+    firebase_repo.add_job(make_job('2024-03-09 10:00:00', details=[
+        {'file_name': 'b.pdf', 'status': 'complete', 'total_price': 4},
+        {'file_name': 'c.pdf', 'status': 'cancelled'},
+    ]))
+    firebase_repo.add_job(make_job('2024-04-01 10:00:00'))
+
+    rows = list(exports.iter_job_rows('2024-03-01', '2024-03-31', status='complete'))
+
+    assert [(row['created_at'][:10], row['file_name'], row['total_price']) for row in rows] == [
+        ('2024-03-05', 'a.pdf', 6.0), ('2024-03-09', 'b.pdf', 4.0),
+    ]
@@ -0,0 +1,75 @@
+import json
+
+import firebase_metrics
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def empty_metrics():
+    firebase_metrics.reset()
+    yield
+    firebase_metrics.reset()
+
+
+def _lines(text, prefix):
+    return [line for line in text.splitlines() if line.startswith(prefix)]
+
+
+@pytest.mark.parametrize('path, normalized', [
+    ('print_jobs/-NqX1a2b3c4d5e6f7g8h/details/0', 'print_jobs/{id}/details/{n}'),
+    ('/rollups/daily/2024-03-05', 'rollups/daily/{day}'),
+    ('rollups/monthly/2024-03/', 'rollups/monthly/{month}'),
+    ('', '/'),
+])
+def test_paths_are_collapsed(path, normalized):
+    assert firebase_metrics.normalize_path(path) == normalized
+
+
+def test_calls_are_rendered_per_route_path_and_operation(db):
+    with firebase_metrics.route_label('dashboard'):
+        job_ref = db.reference('print_jobs').push({'file_name': 'a.pdf'})
+        job_ref.get()
+        job_ref.get()
+    firebase_metrics.record_page_view('dashboard')
+
+    text = firebase_metrics.render_metrics()
+
+    assert 'firebase_calls_total{route="dashboard",path="print_jobs/{id}",op="get"} 2' in text
+    assert 'firebase_calls_total{route="dashboard",path="print_jobs",op="push"} 1' in text
+    assert 'page_views_total{route="dashboard"} 1' in text
+    assert firebase_metrics.call_counts() == {'dashboard': 3}
+
+
+def test_errors_and_latency_buckets():
+    firebase_metrics.record('rollups/totals', 'get', 0.03, {'jobs': 1}, route='api')
+    firebase_metrics.record('rollups/totals', 'get', 20.0, error=True, route='api')
+
+    text = firebase_metrics.render_metrics()
+    labels = 'route="api",path="rollups/totals",op="get"'
+
+    assert f'firebase_call_errors_total{{{labels}}} 1' in text
+    buckets = _lines(text, f'firebase_call_duration_seconds_bucket{{{labels}')
+    counts = [int(line.rsplit(' ', 1)[1]) for line in buckets]
+    # Cumulative: the 0.03 s call from the 0.05 bucket on, the 20 s one only in +Inf
+    assert counts == [0, 0, 0, 1, 1, 1, 1, 1, 1, 1, 1, 2]
+    assert f'firebase_call_duration_seconds_sum{{{labels}}} 20.030000' in text
+
+
+def test_label_values_are_escaped():
+    firebase_metrics.record('x', 'get', 0.0, route='say "hi"\\')
+    assert 'route="say \\"hi\\"\\\\"' in firebase_metrics.render_metrics()
+
+
+@pytest.mark.parametrize('payload', [
+    {'jobs': 3, 'revenue': 18.5, 'name': 'a', 'none': None, 'flag': True, 'rows': [1, 2, 3]},
+    [{'file_name': f'file {number}.pdf', 'pages': number} for number in range(10)],
+    {'current': {'paper': {'remaining_paper': 150, 'updated_at': '2024-03-05 10:00:00'}}},
+])
+def test_small_payload_sizes_are_exact(payload):
+    assert firebase_metrics._payload_bytes(payload) == len(json.dumps(payload, separators=(',', ':')))
+
+
+def test_large_payload_sizes_are_estimated_from_a_sample():
+    payload = {f'-N{number:018d}': {'file_name': 'Report.pdf', 'pages': 12} for number in range(5000)}
+    exact = len(json.dumps(payload, separators=(',', ':')))
+    assert abs(firebase_metrics._payload_bytes(payload) - exact) / exact < 0.01
@@ -0,0 +1,92 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import firebase_session
+
+
+class Credentials:
+    """Stands in for google.auth credentials: refresh() issues a token valid for ``lifetime`` seconds."""
+
+    def __init__(self, expires_in=None, lifetime=3600, fail=0):
+        self.token = 'token' if expires_in is not None else None
+        self.expiry = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(seconds=expires_in) if expires_in is not None else None
+        self.lifetime = lifetime
+        self.fail = fail
+        self.refreshed = threading.Event()
+
+    def refresh(self, request):
+        if self.fail:
+            self.fail -= 1
+            raise OSError('token endpoint unreachable')
+        self.token = 'renewed'
+        self.expiry = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(seconds=self.lifetime)
+        self.refreshed.set()
+
+
+def _refresher(credentials, **kwargs):
+    refresher = firebase_session.TokenRefresher(credentials, **kwargs)
+    refresher._token_request = object()  # no HTTP session needed by the stand-in credentials
+    return refresher
+
+
+def test_seconds_to_expiry():
+    assert firebase_session.seconds_to_expiry(Credentials()) == 0.0
+    assert 590 < firebase_session.seconds_to_expiry(Credentials(expires_in=600)) <= 600
+    aware = Credentials(expires_in=600)
+    aware.expiry = datetime.now(timezone.utc) + timedelta(seconds=300)
+    assert 290 < firebase_session.seconds_to_expiry(aware) <= 300
+
+
+def test_tokens_are_renewed_only_within_the_margin():
+    fresh = _refresher(Credentials(expires_in=3000), margin=600)
+    assert not fresh.refresh_if_due()
+    assert fresh.refreshes == 0
+
+    due = _refresher(Credentials(expires_in=300), margin=600)
+    assert due.refresh_if_due()
+    assert due.credentials.token == 'renewed'
+    assert due.refreshes == 1
+    assert not due.refresh_if_due()
+
+
+def test_the_thread_fetches_the_first_token_then_runs_on_ready():
+    credentials = Credentials()
+    order = []
+    credentials.refresh = _recording(credentials.refresh, order, 'refresh')
+    ready = threading.Event()
+    refresher = _refresher(credentials, on_ready=lambda: (order.append('ready'), ready.set())).start()
+    try:
+        assert ready.wait(2)
+        assert order == ['refresh', 'ready']
+        assert refresher.health()['expires_in'] > 3500
+        assert refresher.start() is refresher  # a second start() keeps the one thread
+    finally:
+        refresher.stop()
+
+
+def _recording(refresh, order, label):
+    def recorded(request):
+        order.append(label)
+        return refresh(request)
+    return recorded
+
+
+def test_failed_refreshes_are_retried_after_the_interval(monkeypatch):
+    monkeypatch.setattr(firebase_session, 'print', lambda *args: None, raising=False)
+    credentials = Credentials(fail=1, lifetime=3600)
+    refresher = _refresher(credentials, interval=0.05).start()
+    try:
+        assert credentials.refreshed.wait(3)
+        deadline = time.monotonic() + 2
+        while refresher.last_error is not None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert refresher.last_error is None
+        assert refresher.refreshes == 1
+    finally:
+        refresher.stop()
+
+
+def test_the_fake_database_has_no_session_to_keep_warm(db):
+    assert firebase_session.database_session(db) is None
+    assert firebase_session.start(db, warm=True) is None
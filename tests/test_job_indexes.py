@@ -0,0 +1,85 @@
+from datetime import datetime
+
+import job_indexes
+import pagination
+from conftest import make_job
+
+
+def _detail(status, color_mode='bw'):
+    return {'file_name': 'a.pdf', 'status': status, 'color_mode': color_mode, 'pages_to_print': 1, 'total_price': 3}
+
+
+def test_index_updates_move_only_the_entries_that_changed():
+    before = make_job('2024-03-05 10:00:00', details=[_detail('pending')])
+    after = make_job('2024-03-05 10:00:00', details=[_detail('complete')])
+    epoch = datetime(2024, 3, 5, 10).timestamp()
+
+    assert job_indexes.index_updates('job1', None, before) == {
+        'job_indexes/status/pending/job1': epoch,
+        'job_indexes/color_mode/bw/job1': epoch,
+        'job_indexes/month/2024-03/job1': epoch,
+    }
+    assert job_indexes.index_updates('job1', before, after) == {
+        'job_indexes/status/pending/job1': None,
+        'job_indexes/status/complete/job1': epoch,
+    }
+    assert job_indexes.index_updates('job1', after, after) == {}
+    assert set(job_indexes.index_updates('job1', after, None).values()) == {None}
+
+
+def test_index_values_normalise_details():
+    job = make_job('2024-03-05 10:00:00', details={'0': _detail('complete', 'colored'), '3': 'corrupt'})
+    assert job_indexes.index_values(job) == {'status': {'complete'}, 'color_mode': {'colored'}, 'month': {'2024-03'}}
+    # Kiosk jobs have no details: their job-level status is indexed
+    assert job_indexes.index_values({'created_at': 1709632800.0, 'status': 'Completed'})['status'] == {'Completed'}
+
+
+def _add(repo, minute, status, color_mode='bw'):
+    return repo.add_job(make_job(f'2024-03-05 10:{minute:02d}:00', details=[_detail(status, color_mode)]))
+
+
+def _pages(page_size, filters):
+    forward, cursor, prev_token = [], None, None
+    while True:
+        rows, page, next_token, prev_token = job_indexes.fetch_page(page_size, cursor, filters)
+        forward.append([job_id for job_id, _ in rows])
+        if not next_token:
+            break
+        cursor = pagination.decode_cursor(next_token)
+    backward = []
+    while prev_token:
+        rows, _, _, prev_token = job_indexes.fetch_page(page_size, pagination.decode_cursor(prev_token), filters)
+        backward.insert(0, [job_id for job_id, _ in rows])
+    return forward, backward
+
+
+def test_filtered_pages_walk_both_ways(firebase_repo):
+    complete = [_add(firebase_repo, minute, 'complete' if minute % 3 else 'cancelled') for minute in range(20)]
+    complete = [job_id for minute, job_id in enumerate(complete) if minute % 3]
+
+    forward, backward = _pages(4, {'status': 'complete'})
+
+    assert [job_id for page in forward for job_id in page] == complete
+    assert all(len(page) == 4 for page in forward[:-1])
+    assert backward == forward[:-1]
+
+
+def test_pages_check_the_other_filters_on_the_jobs_read(firebase_repo):
+    wanted = []
+    for minute in range(12):
+        color_mode = 'colored' if minute % 4 == 0 else 'bw'
+        job_id = _add(firebase_repo, minute, 'complete', color_mode)
+        if color_mode == 'colored':
+            wanted.append(job_id)
+
+    forward, _ = _pages(2, {'status': 'complete', 'color_mode': 'colored'})
+
+    assert [job_id for page in forward for job_id in page] == wanted
+
+
+def test_updated_jobs_leave_their_old_index(db, firebase_repo):
+    job_id = _add(firebase_repo, 0, 'pending')
+    firebase_repo.update_job(job_id, {'details': [_detail('complete')]})
+
+    assert job_indexes.fetch_page(10, filters={'status': 'pending'})[0] == []
+    assert [row[0] for row in job_indexes.fetch_page(10, filters={'status': 'complete'})[0]] == [job_id]
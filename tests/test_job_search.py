@@ -0,0 +1,58 @@
+import job_search
+import pagination
+import pytest
+from conftest import make_job
+
+
+@pytest.mark.parametrize('name, normalized', [
+    ('Résumé_Final (2).PDF', 'resume final 2 pdf'),
+    ('  THESIS--draft  ', 'thesis draft'),
+    ('文件.pdf', 'pdf'),
+    ('', ''),
+    (None, ''),
+])
+def test_normalize(name, normalized):
+    assert job_search.normalize(name) == normalized
+
+
+def test_kiosk_jobs_are_indexed_by_document_name():
+    assert job_search.search_key('job1', {'document_name': 'Scan 01.pdf'}) == 'scan 01 pdf|job1'
+    assert job_search.search_key('job1', {'created_at': 1.0}) is None
+    assert job_search.key_job_id('scan 01 pdf|job1') == 'job1'
+
+
+def test_renaming_a_job_moves_its_entry():
+    before = make_job('2024-03-05 10:00:00', file_name='Old.pdf')
+    after = dict(before, file_name='New.pdf')
+    updates = job_search.index_updates('job1', before, after)
+    assert updates['job_search/old pdf|job1'] is None
+    assert updates['job_search/new pdf|job1'] > 0
+    assert job_search.index_updates('job1', before, dict(before, status='complete')) == {}
+
+
+def _search_all(prefix, page_size):
+    found, cursor = [], None
+    while True:
+        rows, _, next_token, _ = job_search.search(prefix, page_size, cursor)
+        found.append([job['file_name'] for _, job in rows])
+        if not next_token:
+            return found
+        cursor = pagination.decode_cursor(next_token)
+
+
+def test_search_pages_through_matches_by_file_name(firebase_repo):
+    for minute, name in enumerate(['Thesis B.pdf', 'thesis a.pdf', 'Résumé.pdf', 'Thesis C.docx', 'Notes.txt', 'THESIS-D.pdf']):
+        firebase_repo.add_job(make_job(f'2024-03-05 10:{minute:02d}:00', file_name=name))
+
+    assert _search_all('thesis', 2) == [['thesis a.pdf', 'Thesis B.pdf'], ['Thesis C.docx', 'THESIS-D.pdf']]
+    assert _search_all('resume', 10) == [['Résumé.pdf']]
+    assert _search_all('thesis c', 10) == [['Thesis C.docx']]
+    assert job_search.search('   ', 10) == ([], 1, None, None)
+
+
+def test_search_follows_renames(firebase_repo):
+    job_id = firebase_repo.add_job(make_job('2024-03-05 10:00:00', file_name='Draft.pdf'))
+    firebase_repo.update_job(job_id, {'file_name': 'Final.pdf'})
+
+    assert job_search.search('draft', 10)[0] == []
+    assert [row[0] for row in job_search.search('final', 10)[0]] == [job_id]
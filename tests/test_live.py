@@ -0,0 +1,74 @@
+from datetime import datetime, timedelta
+
+import live
+import pytest
+from conftest import make_job
+from fake_rtdb import Event
+
+
+@pytest.fixture(params=['firebase', 'sqlite'])
+def repo(request, firebase_repo, sqlite_repo):
+    return firebase_repo if request.param == 'firebase' else sqlite_repo
+
+
+def _now():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _names(events):
+    return [event for event, _ in events]
+
+
+def test_the_first_refresh_only_primes_the_feed(repo):
+    repo.add_job(make_job(_now()))
+    assert live.ChangeFeed(None, repo).refresh() == []
+
+
+def test_new_and_changed_jobs_of_today_are_sent(repo):
+    feed = live.ChangeFeed(None, repo)
+    feed.refresh()
+
+    job_id = repo.add_job(make_job(_now(), file_name='a.pdf'))
+    events = dict(feed.refresh())
+    assert events['job_added']['job_id'] == job_id
+    assert [row['file_name'] for row in events['job_added']['rows']] == ['a.pdf']
+    assert events['today_totals']['jobs'] == 1
+
+    details = [dict(make_job(_now())['details'][0], status='cancelled')]
+    repo.update_job(job_id, {'details': details})
+    events = dict(feed.refresh())
+    assert events['job_status']['rows'][0]['status'] == 'cancelled'
+    assert 'job_added' not in events
+
+    assert feed.refresh() == []
+
+
+def test_other_days_jobs_send_nothing(repo):
+    feed = live.ChangeFeed(None, repo)
+    feed.refresh()
+    yesterday = datetime.now() - timedelta(days=1)
+    repo.add_job(make_job(yesterday.strftime('%Y-%m-%d %H:%M:%S')))
+    assert feed.refresh() == []
+
+
+def test_price_and_paper_changes_are_sent(repo):
+    feed = live.ChangeFeed(None, repo)
+    feed.refresh()
+
+    repo.add_prices(3.0, 12.0, _now())
+    repo.record_paper(150, _now(), refill=True)
+    events = dict(feed.refresh())
+
+    assert events['prices'] == {'black_price': 3.0, 'color_price': 12.0}
+    assert events['paper']['remaining_paper'] == 150
+    assert _names(feed.refresh()) == []
+
+
+def test_listeners_ignore_other_days_rollups(firebase_repo):
+    feed = live.ChangeFeed(None, firebase_repo)
+    on_daily = feed._listener('rollups/daily')
+
+    on_daily(Event('patch', '/2001-01-01', {'jobs': 1}))
+    assert not feed._wake.is_set()
+    on_daily(Event('patch', '/' + datetime.now().strftime('%Y-%m-%d'), {'jobs': 1}))
+    assert feed._wake.is_set()
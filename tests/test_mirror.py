@@ -0,0 +1,68 @@
+import random
+
+import mirror
+from fake_rtdb import Event
+
+
+def _mirror(data):
+    node = mirror.NodeMirror('print_jobs')
+    node._on_event(Event('put', '/', data))
+    return node
+
+
+def _sorted_items(snapshot, child):
+    return sorted((snapshot or {}).items(), key=lambda item: mirror.sort_key(item[1].get(child), item[0]))
+
+
+def test_file_contents_are_not_kept_in_memory():
+    node = _mirror({'a': {'file_name': 'a.pdf', 'file_data': 'QUJD', 'created_at_ts': 1}})
+    node._on_event(Event('put', '/b', {'file_name': 'b.pdf', 'file_data': 'REVG', 'created_at_ts': 2}))
+    node._on_event(Event('patch', '/', {'c': {'file_data': 'R0hJ', 'created_at_ts': 3}, 'a/file_data': 'SktM'}))
+    node._on_event(Event('put', '/b/file_data', 'TU5P'))
+    node._on_event(Event('patch', '/b', {'file_data': 'UFFS', 'status': 'Completed'}))
+
+    assert node.snapshot() == {
+        'a': {'file_name': 'a.pdf', 'created_at_ts': 1},
+        'b': {'file_name': 'b.pdf', 'created_at_ts': 2, 'status': 'Completed'},
+        'c': {'created_at_ts': 3},
+    }
+
+
+def test_other_nodes_keep_every_field():
+    node = mirror.NodeMirror('rollups')
+    node._on_event(Event('put', '/', {'totals': {'file_data': 1}}))
+    assert node.read('totals/file_data') == 1
+
+
+def test_order_is_patched_in_step_with_the_writes():
+    rng = random.Random(7)
+    node = _mirror({f'job{i:03d}': {'created_at_ts': rng.randint(0, 50)} for i in range(200)})
+    node.ordered_items('created_at_ts')
+    for _ in range(300):
+        key = f'job{rng.randint(0, 220):03d}'
+        choice = rng.random()
+        if choice < 0.2:
+            node._on_event(Event('put', f'/{key}', None))
+        elif choice < 0.6:
+            node._on_event(Event('put', f'/{key}/created_at_ts', rng.randint(0, 50)))
+        else:
+            node._on_event(Event('patch', '/', {key: {'created_at_ts': rng.choice([None, 'x', 7])}}))
+        if rng.random() < 0.3:
+            items, sort_keys = node.ordered_items('created_at_ts')
+            assert items == _sorted_items(node.snapshot(), 'created_at_ts')
+            assert sort_keys == sorted(sort_keys)
+    items, _ = node.ordered_items('created_at_ts')
+    assert items == _sorted_items(node.snapshot(), 'created_at_ts')
+
+
+def test_earlier_orders_stay_unchanged_for_their_readers():
+    node = _mirror({'a': {'created_at_ts': 1}, 'b': {'created_at_ts': 2}})
+    items, _ = node.ordered_items('created_at_ts')
+    node._on_event(Event('put', '/c', {'created_at_ts': 0}))
+    assert [key for key, _ in items] == ['a', 'b']
+    assert [key for key, _ in node.ordered_items('created_at_ts')[0]] == ['c', 'a', 'b']
+
+
+def test_range_reads_between_bounds():
+    node = _mirror({'a': {'created_at_ts': 1}, 'b': {'created_at_ts': 5}, 'c': {'created_at_ts': 9}})
+    assert [key for key, _ in node.range('created_at_ts', 2, 9)] == ['b', 'c']
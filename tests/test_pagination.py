@@ -0,0 +1,78 @@
+import base64
+import json
+
+import pagination
+import pytest
+from conftest import make_job
+
+
+def test_cursor_round_trip():
+    token = pagination.encode_cursor('after', 1709600000.5, '-Nabc', 3)
+    assert pagination.decode_cursor(token) == {'d': 'after', 'c': 1709600000.5, 'k': '-Nabc', 'p': 3}
+    assert '=' not in token
+
+
+def _token(payload):
+    return base64.urlsafe_b64encode(json.dumps(payload).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+@pytest.mark.parametrize('token', [
+    None,
+    '',
+    'not base64 !',
+    _token([1, 2]),
+    _token({'d': 'sideways', 'c': 1, 'k': 'a', 'p': 1}),
+    _token({'d': 'after', 'c': 1, 'p': 1}),
+    _token({'d': 'after', 'c': 1, 'k': 'a', 'p': 0}),
+    _token({'d': 'after', 'c': 1, 'k': 'a', 'p': '2'}),
+    _token({'d': 'after', 'c': 1, 'k': 'a', 'p': True}),
+    _token({'d': 'after', 'c': 1, 'k': 7, 'p': 1}),
+    _token({'d': 'after', 'c': [1], 'k': 'a', 'p': 1}),
+    _token({'d': 'after', 'c': False, 'k': 'a', 'p': 1}),
+])
+def test_malformed_cursors_are_rejected(token):
+    assert pagination.decode_cursor(token) is None
+
+
+def _walk(repo, page_size, **bounds):
+    """Job ids page by page forwards, then the pages again walking back from the last one."""
+    forward, pages, cursor = [], [], None
+    while True:
+        rows, page, next_token, prev_token = repo.jobs_page(page_size, cursor, **bounds)
+        pages.append(page)
+        forward.append([job_id for job_id, _ in rows])
+        if not next_token:
+            break
+        cursor = pagination.decode_cursor(next_token)
+    backward = []
+    while prev_token:
+        rows, page, next_token, prev_token = repo.jobs_page(page_size, pagination.decode_cursor(prev_token), **bounds)
+        backward.insert(0, [job_id for job_id, _ in rows])
+    return forward, backward, pages
+
+
+def test_pages_cover_every_job_once_in_creation_order(firebase_repo):
+    from datetime import datetime
+    job_ids = []
+    for minute in range(23):
+        created = datetime(2024, 3, 5, 10, minute)
+        # Admin uploads store a formatted string, kiosk uploads an epoch float
+        job_ids.append(firebase_repo.add_job(
+            make_job(created.timestamp() if minute % 2 else created.strftime('%Y-%m-%d %H:%M:%S'))
+        ))
+
+    forward, backward, pages = _walk(firebase_repo, 5)
+
+    assert [job_id for page in forward for job_id in page] == job_ids
+    assert backward == forward[:-1]
+    assert pages == [1, 2, 3, 4, 5]
+
+
+def test_day_bounds_limit_the_pages(firebase_repo):
+    inside = [firebase_repo.add_job(make_job(f'2024-03-0{day} 12:00:00')) for day in (5, 6)]
+    firebase_repo.add_job(make_job('2024-03-04 23:59:59'))
+    firebase_repo.add_job(make_job('2024-03-07 00:00:00'))
+
+    forward, _, _ = _walk(firebase_repo, 10, start='2024-03-05', end='2024-03-06')
+
+    assert forward == [inside]
@@ -0,0 +1,34 @@
+import partitions
+from conftest import make_job
+
+
+def test_new_jobs_are_copied_into_their_day_without_file_contents(db, firebase_repo):
+    job = dict(make_job('2024-03-05 10:00:00'), file_data='QUJD')
+    job_id = firebase_repo.add_job(job)
+
+    entry = partitions.fetch_day('2024-03-05')[job_id]
+    assert 'file_data' not in entry
+    assert entry['created_at_ts'] == partitions.job_epoch(job)
+
+
+def test_changing_created_at_moves_the_job_to_its_new_day(db, firebase_repo):
+    job_id = firebase_repo.add_job(make_job('2024-03-05 10:00:00'))
+
+    firebase_repo.update_job(job_id, {'created_at': '2024-03-07 09:00:00'})
+
+    assert partitions.fetch_day('2024-03-05') == {}
+    assert list(partitions.fetch_day('2024-03-07')) == [job_id]
+    assert [job_id for job_id, _ in partitions.fetch_range('2024-03-01', '2024-03-31')] == [job_id]
+
+
+def test_updates_within_the_same_day_refresh_the_copy(db, firebase_repo):
+    job_id = firebase_repo.add_job(make_job('2024-03-05 10:00:00'))
+
+    firebase_repo.update_job(job_id, {'status': 'Completed'})
+
+    assert partitions.fetch_day('2024-03-05')[job_id]['status'] == 'Completed'
+
+
+def test_deleting_a_job_removes_its_copy():
+    updates = partitions.index_updates('job1', make_job('2024-03-05 10:00:00'), None)
+    assert updates == {f'{partitions.PARTITIONS_PATH}/2024-03-05/job1': None}
@@ -0,0 +1,68 @@
+import threading
+import time
+
+import profiler
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def profiles_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiler, 'PROFILES_DIR', str(tmp_path / 'profiles'))
+
+
+def _busy(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def test_a_request_shorter_than_the_interval_still_gets_a_sample():
+    sampler = profiler.Sampler('short', interval=10)
+    sampler.add_thread(threading.get_ident())
+    sampler.start().stop()
+    assert sampler.samples >= 1
+    assert sum(sampler.stacks.values()) >= 1
+
+
+def test_samples_show_where_the_thread_spent_its_time():
+    sampler = profiler.start('busy')
+    _busy(0.1)
+    profile = profiler.load_profile(profiler.finish(sampler, method='GET', url='/busy'))
+
+    assert profile['route'] == 'busy' and profile['url'] == '/busy'
+    assert profile['samples'] > 1
+    assert any('_busy (test_profiler.py' in stack for stack in profile['stacks'])
+    assert profiler.current() is None
+    top = {row['function']: row for row in profiler.top_functions(profile)}
+    busy = next(row for function, row in top.items() if function.startswith('_busy'))
+    assert busy['total_pct'] > 50
+
+
+def test_pool_threads_are_sampled_while_attached():
+    sampler = profiler.start('fan-out')
+    worker = threading.Thread(target=lambda: _attached(sampler))
+    worker.start()
+    worker.join()
+    profile = profiler.load_profile(profiler.finish(sampler))
+    assert any('_attached (test_profiler.py' in stack for stack in profile['stacks'])
+
+
+def _attached(sampler):
+    with profiler.attach(sampler):
+        _busy(0.05)
+
+
+def test_folded_output():
+    assert profiler.folded({'stacks': {'a;b': 3, 'a': 1}}) == 'a;b 3\na 1\n'
+    assert profiler.folded({'stacks': {}}) == 'no samples captured\n'
+
+
+def test_captures_are_listed_newest_first_and_pruned(monkeypatch):
+    monkeypatch.setattr(profiler, 'MAX_PROFILES', 2)
+    ids = []
+    for route in ('one', 'two', 'three'):
+        ids.append(profiler.finish(profiler.start(route)))
+        time.sleep(0.01)
+    assert [profile['route'] for profile in profiler.list_profiles()] == ['three', 'two']
+    assert profiler.load_profile(ids[0]) is None
+    assert profiler.load_profile('../etc/passwd') is None
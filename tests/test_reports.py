@@ -0,0 +1,31 @@
+import reports
+from conftest import make_job
+
+
+def _detail(file_name, status='complete', total_price=6.0):
+    return {'file_name': file_name, 'status': status, 'color_mode': 'bw', 'total_price': total_price}
+
+
+def test_sections_are_grouped_by_month(firebase_repo):
+    firebase_repo.add_job(make_job('2024-03-05 10:00:00', file_name='a.pdf'))
+    firebase_repo.add_job(make_job('2024-04-01 10:00:00', file_name='b.pdf'))
+
+    sections = list(reports.iter_report_sections('2024-03-01', '2024-04-30'))
+
+    assert [(month, [row['file_name'] for row in rows]) for month, rows in sections] == [
+        ('2024-03', ['a.pdf']), ('2024-04', ['b.pdf']),
+    ]
+
+
+def test_details_stored_as_a_dict_or_malformed_do_not_break_the_report(firebase_repo):
+    # A Firebase array with a gap comes back as a dict keyed by index
+    firebase_repo.add_job(make_job('2024-03-05 10:00:00', details={'0': _detail('a.pdf'), '2': _detail('b.pdf')}))
+    firebase_repo.add_job(make_job('2024-03-05 11:00:00', details='corrupt'))
+    firebase_repo.add_job(make_job('2024-03-05 12:00:00', details=[
+        'corrupt', _detail('c.pdf', total_price=None), _detail('d.pdf', status='cancelled'),
+    ]))
+
+    [(month, rows)] = reports.iter_report_sections('2024-03-01', '2024-03-31')
+
+    assert month == '2024-03'
+    assert [(row['file_name'], row['total_price']) for row in rows] == [('a.pdf', 6.0), ('b.pdf', 6.0), ('c.pdf', 0.0)]
@@ -0,0 +1,86 @@
+import rollups
+from conftest import make_job
+
+
+def test_new_jobs_are_added_to_day_month_and_totals(firebase_repo):
+    firebase_repo.add_job(make_job('2024-03-05 10:00:00'))
+    firebase_repo.add_job(make_job('2024-03-06 11:00:00', details=[
+        {'status': 'complete', 'color_mode': 'colored', 'pages_to_print': 1, 'total_price': 5.0},
+        {'status': 'cancelled', 'color_mode': 'bw', 'pages_to_print': 4, 'total_price': 12.0},
+    ]))
+
+    totals = rollups.get_totals()
+    assert totals['jobs'] == 2
+    assert totals['details'] == 3
+    assert totals['completed'] == 2
+    assert totals['cancelled'] == 1
+    assert totals['revenue'] == 11.0
+    assert totals['color_revenue'] == 5.0
+    assert totals['bw_revenue'] == 6.0
+    assert totals['pages'] == 3
+    assert rollups.get_daily('2024-03-05')['jobs'] == 1
+    assert rollups.get_monthly('2024-03')['jobs'] == 2
+
+
+def test_status_change_moves_revenue(firebase_repo):
+    job_id = firebase_repo.add_job(make_job('2024-03-05 10:00:00'))
+    job = firebase_repo.get_job(job_id)
+    details = [dict(job['details'][0], status='cancelled')]
+    firebase_repo.update_job(job_id, {'details': details})
+
+    daily = rollups.get_daily('2024-03-05')
+    assert daily['completed'] == 0
+    assert daily['cancelled'] == 1
+    assert daily['revenue'] == 0
+    assert rollups.get_totals()['revenue'] == 0
+
+
+def test_every_write_bumps_the_day_version(firebase_repo):
+    job_id = firebase_repo.add_job(make_job('2024-03-05 10:00:00'))
+    before = rollups.data_version('2024-03-05', '2024-03-05')
+    firebase_repo.update_job(job_id, {'file_name': 'Renamed.pdf'})
+    assert rollups.data_version('2024-03-05', '2024-03-05') != before
+
+
+def test_kiosk_epoch_created_at_counts_on_its_local_day(firebase_repo):
+    from datetime import datetime
+    created = datetime(2024, 3, 5, 23, 30)
+    firebase_repo.add_job(make_job(created.timestamp()))
+    assert rollups.get_daily('2024-03-05')['jobs'] == 1
+
+
+def test_concurrent_writes_are_not_lost(firebase_repo):
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda n: firebase_repo.add_job(make_job('2024-03-05 10:00:00')), range(40)))
+    assert rollups.get_daily('2024-03-05')['jobs'] == 40
+    assert rollups.get_totals()['revenue'] == 240.0
+
+
+def _without_versions(daily):
+    return {day: {field: value for field, value in counters.items() if field != 'version'}
+            for day, counters in daily.items()}
+
+
+def test_rebuild_matches_the_incremental_rollups(firebase_repo):
+    for day in ('2024-03-05', '2024-03-06', '2024-04-01'):
+        firebase_repo.add_job(make_job(f'{day} 09:00:00'))
+    totals, daily = rollups.get_totals(), rollups.get_daily_range()
+
+    rollups.rebuild_rollups()
+
+    assert rollups.get_totals() == totals
+    assert _without_versions(rollups.get_daily_range()) == _without_versions(daily)
+    assert all(counters['version'] == 2 for counters in rollups.get_daily_range().values())
+
+
+def test_rebuild_skips_jobs_with_an_invalid_created_at(db, firebase_repo):
+    firebase_repo.add_job(make_job('2024-03-05 09:00:00'))
+    db.reference('print_jobs').push(make_job('N/A'))
+
+    totals = rollups.rebuild_rollups()
+
+    assert totals['jobs'] == 2
+    assert list(rollups.get_daily_range()) == ['2024-03-05']
+    assert rollups.get_monthly('2024-03')['jobs'] == 1
@@ -0,0 +1,133 @@
+"""The SQLite backend, checked against the behavior of the Firebase one where they must agree."""
+from datetime import datetime
+from threading import Thread
+
+import pagination
+import pytest
+import repository
+from conftest import make_job
+
+
+@pytest.fixture(params=['sqlite', 'firebase'])
+def repo(request):
+    return request.getfixturevalue(f'{request.param}_repo')
+
+
+def _add_month(repo):
+    job_ids = []
+    for day, file_name, status, color_mode in [
+        (1, 'Thesis Final.pdf', 'complete', 'bw'),
+        (1, 'thesis draft.docx', 'cancelled', 'colored'),
+        (2, 'Invoice.pdf', 'complete', 'colored'),
+        (15, 'Résumé.pdf', 'pending', 'bw'),
+    ]:
+        created = datetime(2024, 3, day, 9, len(job_ids))
+        job_ids.append(repo.add_job(make_job(created.strftime('%Y-%m-%d %H:%M:%S'), file_name, details=[{
+            'file_name': file_name, 'status': status, 'color_mode': color_mode,
+            'pages_to_print': 3, 'total_price': 9.0 if color_mode == 'bw' else 15.0,
+        }])))
+    # A kiosk upload: epoch created_at and document_name
+    job_ids.append(repo.add_job({
+        'created_at': datetime(2024, 4, 1, 8, 0).timestamp(), 'document_name': 'scan.pdf', 'details': [],
+    }))
+    return job_ids
+
+
+def test_jobs_round_trip(repo):
+    job_id = repo.add_job(make_job('2024-03-05 10:00:00'))
+    job = repo.get_job(job_id)
+    assert job['file_name'] == 'Report.pdf'
+    assert job['details'][0]['total_price'] == 6.0
+
+    repo.update_job(job_id, {'file_name': 'Renamed.pdf'})
+    assert repo.get_job(job_id)['file_name'] == 'Renamed.pdf'
+    assert repo.get_job('missing') is None
+
+
+def test_counters(repo):
+    _add_month(repo)
+    totals = repo.totals()
+    assert totals['jobs'] == 5
+    assert totals['details'] == 4
+    assert totals['completed'] == 2
+    assert totals['cancelled'] == 1
+    assert totals['revenue'] == 24.0
+    assert totals['color_revenue'] == 15.0
+    assert repo.monthly('2024-03')['jobs'] == 4
+    assert repo.daily('2024-03-01')['details'] == 2
+    assert list(repo.daily_range('2024-03-01', '2024-03-31')) == ['2024-03-01', '2024-03-02', '2024-03-15']
+
+
+def test_pages_in_creation_order(repo):
+    job_ids = _add_month(repo)
+    seen, cursor = [], None
+    while True:
+        rows, page, next_token, _ = repo.jobs_page(2, cursor)
+        seen += [job_id for job_id, _ in rows]
+        if not next_token:
+            break
+        cursor = pagination.decode_cursor(next_token)
+    assert seen == job_ids
+    assert page == 3
+
+    rows, _, _, _ = repo.jobs_page(10, None, '2024-04-01', '2024-04-30')
+    assert [job_id for job_id, _ in rows] == job_ids[4:]
+
+
+def test_filters(repo):
+    job_ids = _add_month(repo)
+    rows, _, _, _ = repo.jobs_page(10, filters={'status': 'complete'})
+    assert [job_id for job_id, _ in rows] == [job_ids[0], job_ids[2]]
+    rows, _, _, _ = repo.jobs_page(10, filters={'status': 'complete', 'color_mode': 'colored'})
+    assert [job_id for job_id, _ in rows] == [job_ids[2]]
+
+
+def test_search_by_file_name_prefix(repo):
+    job_ids = _add_month(repo)
+    rows, _, _, _ = repo.search_jobs('THESIS', 10)
+    assert [job_id for job_id, _ in rows] == [job_ids[1], job_ids[0]]  # 'thesis draft' < 'thesis final'
+    rows, _, _, _ = repo.search_jobs('resume', 10)
+    assert [job_id for job_id, _ in rows] == [job_ids[3]]
+    assert repo.search_jobs('   ', 10) == ([], 1, None, None)
+
+
+def test_iter_jobs_covers_the_range(repo):
+    job_ids = _add_month(repo)
+    assert [job_id for job_id, _ in repo.iter_jobs('2024-03-02', '2024-04-01')] == job_ids[2:]
+
+
+def test_prices_and_paper(repo):
+    repo.add_prices(4, 8, '2024-03-01 00:00:00')
+    assert repo.latest_prices()['color_price'] == 8
+    repo.record_paper(50, '2024-03-01 00:00:00', refill=True)
+    repo.record_paper(45, '2024-03-02 00:00:00')
+    assert repo.latest_paper()['remaining_paper'] == 45
+    assert repo.last_refill()['remaining_paper'] == 50
+    assert repo.use_paper(5, '2024-03-03 00:00:00') == (45, 40)
+    assert repo.use_paper(41, '2024-03-04 00:00:00') == (40, None)
+    assert repo.latest_paper()['remaining_paper'] == 40
+
+
+def test_admins(repo):
+    admin_id = repo.add_admin('admin', 'admin@example.com', 'hash')
+    found_id, admin = repo.find_admin('admin@example.com')
+    assert found_id == admin_id
+    assert admin['username'] == 'admin'
+    assert repo.find_admin('nobody@example.com') == (None, None)
+
+
+def test_sqlite_data_survives_a_new_connection(sqlite_repo):
+    job_id = sqlite_repo.add_job(make_job('2024-03-05 10:00:00'))
+    reopened = repository.SQLiteRepository(sqlite_repo.path)
+    assert reopened.get_job(job_id)['file_name'] == 'Report.pdf'
+    assert reopened.totals()['jobs'] == 1
+
+
+def test_sqlite_paper_decrements_do_not_race(sqlite_repo):
+    sqlite_repo.record_paper(100, 0.0, refill=True)
+    threads = [Thread(target=sqlite_repo.use_paper, args=(1, float(n))) for n in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sqlite_repo.latest_paper()['remaining_paper'] == 80